@@ -6,7 +6,8 @@ from apscheduler.schedulers.blocking import BlockingScheduler
 sched = BlockingScheduler({
     'apscheduler.executors.default': {
         'class': 'apscheduler.executors.pool:ThreadPoolExecutor',
-        'max_workers': '1'
+        # one for refreshing data sources, one for import jobs
+        'max_workers': '2'
     },
     'apscheduler.job_defaults.coalesce': 'false',
     'apscheduler.job_defaults.max_instances': '1',
@@ -14,8 +15,7 @@ sched = BlockingScheduler({
 })
 
 
-@sched.scheduled_job('interval', minutes=15)
-def refresh_data_sources():
+def run_command(*args):
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'collaborative.settings')
     try:
         from django.core.management import execute_from_command_line
@@ -25,8 +25,20 @@ def refresh_data_sources():
             "available on your PYTHONPATH environment variable? Did you "
             "forget to activate a virtual environment?"
         ) from exc
-    argv = ['./manage.py', 'refresh_data_sources']
+    argv = ['./manage.py'] + list(args)
     execute_from_command_line(argv)
 
 
+# each source has its own refresh schedule (see utils.schedule), here
+# we only check which ones are due
+@sched.scheduled_job('interval', minutes=1)
+def refresh_data_sources():
+    run_command('refresh_data_sources', '--due')
+
+
+@sched.scheduled_job('interval', seconds=10)
+def process_import_jobs():
+    run_command('process_import_jobs')
+
+
 sched.start()
@@ -1,3 +1,4 @@
+from functools import lru_cache
 import logging
 import re
 
@@ -9,14 +10,20 @@ from django.contrib.admin import AdminSite
 from django.contrib.admin.models import LogEntry
 from django.contrib.admin.views.main import ChangeList
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import FieldError, FieldDoesNotExist
+from django.core.exceptions import (
+    FieldError, FieldDoesNotExist, PermissionDenied
+)
 from django.db import connection
 from django.db.models.functions import Lower
 from django.db.utils import OperationalError
 from django.forms import modelform_factory
+from django.http import StreamingHttpResponse
 from django.utils.html import mark_safe, format_html
 from django.views.decorators.cache import never_cache
 from import_export.admin import ExportMixin
+from import_export.formats import base_formats
+from import_export.forms import ExportForm
+from import_export.signals import post_export
 from social_django.models import Association, Nonce, UserSocialAuth
 from taggit.models import Tag
 from taggit.apps import TaggitAppConfig
@@ -49,15 +56,32 @@ class NewUserAdmin(UserAdmin):
         return super().add_view(request, *args, **kwargs)
 
 
-def widget_for_object_field(obj, field_name):
-    FieldForm = modelform_factory(
-        obj.source_dynmodel().get_model(),
-        fields=(field_name,)
-    )
+@lru_cache(maxsize=256)
+def widget_for_model_field(Model, field_name):
+    """
+    Build the form widget for a model's field. This gets called for
+    every cell in the admin list view, so we only build one per
+    model and field.
+    """
+    FieldForm = modelform_factory(Model, fields=(field_name,))
     widget = FieldForm().fields[field_name].widget
     return widget
 
 
+def widget_for_object_field(obj, field_name):
+    return widget_for_model_field(type(obj), field_name)
+
+
+def first_related(obj, rel_name):
+    """
+    Get the first (lowest ID) reverse related object. Unlike .first(),
+    this uses the prefetched objects, if there are any, instead of
+    doing a query.
+    """
+    related = getattr(obj, rel_name).all()
+    return min(related, key=lambda r: r.pk, default=None)
+
+
 def make_getter(rel_name, attr_name, getter_name, field=None):
     """
     Build a reverse lookup getter, to be attached to the custom
@@ -67,7 +91,7 @@ def make_getter(rel_name, attr_name, getter_name, field=None):
         if not hasattr(self, rel_name):
             return None
 
-        rel = getattr(self, rel_name).first()
+        rel = first_related(self, rel_name)
         if not rel:
             return None
         fieldname = "%s__%s" % (rel_name, attr_name)
@@ -127,6 +151,38 @@ class ReimportMixin(ExportMixin):
     """
     change_list_template = 'django_models_from_csv/change_list_dynmodel.html'
 
+    def export_action(self, request, *args, **kwargs):
+        """
+        Stream CSV exports to the user as they're built, instead of
+        building the whole file in memory first. Other formats are
+        handled by import_export, as usual.
+        """
+        if not self.has_export_permission(request):
+            raise PermissionDenied
+
+        formats = self.get_export_formats()
+        form = ExportForm(formats, request.POST or None)
+        if not form.is_valid():
+            return super().export_action(request, *args, **kwargs)
+
+        file_format = formats[int(form.cleaned_data['file_format'])]()
+        resource_class = self.get_export_resource_class()
+        if not isinstance(file_format, base_formats.CSV) or \
+           not hasattr(resource_class, "export_csv"):
+            return super().export_action(request, *args, **kwargs)
+
+        queryset = self.get_export_queryset(request)
+        resource = resource_class(**self.get_export_resource_kwargs(request))
+        response = StreamingHttpResponse(
+            resource.export_csv(queryset),
+            content_type=file_format.get_content_type(),
+        )
+        response['Content-Disposition'] = 'attachment; filename=%s' % (
+            self.get_export_filename(file_format),
+        )
+        post_export.send(sender=None, model=self.model)
+        return response
+
 
 class CaseInsensitiveChangeList(ChangeList):
     """
@@ -167,6 +223,8 @@ class ReverseFKAdmin(admin.ModelAdmin):
         """
         super().__init__(*args, **kwargs)
         Model, site = args
+        # getter name => related lookup it needs prefetched
+        self.getter_prefetches = {}
         if "DynamicModel" == Model._meta.object_name:
             return
         # setup reverse related attr getters so we can do things like
@@ -198,12 +256,33 @@ class ReverseFKAdmin(admin.ModelAdmin):
                 getter = make_getter(
                     rel_name, attr_name, getter_name, field=rel_field
                 )
+                self.getter_prefetches[getter_name] = rel_name
+                if attr_name == "tags":
+                    self.getter_prefetches[getter_name] = "%s__tags" % (
+                        rel_name
+                    )
                 setattr(self, getter_name, getter)
                 getattr(self, getter_name).short_description = short_desc
                 getattr(
                     self, getter_name
                 ).admin_order_field = "%s__%s" % (rel_name, attr_name)
 
+    def get_queryset(self, request):
+        """
+        Prefetch the reverse related objects (and their tags) used by
+        the list view columns, so the list view does a constant number
+        of queries instead of a few per row.
+        """
+        queryset = super().get_queryset(request)
+        prefetches = set()
+        for name in self.get_list_display(request):
+            lookup = self.getter_prefetches.get(name)
+            if lookup:
+                prefetches.add(lookup)
+        if not prefetches:
+            return queryset
+        return queryset.prefetch_related(*sorted(prefetches))
+
     def get_view_label(self, obj):
         return "View"
 
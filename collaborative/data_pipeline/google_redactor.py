@@ -1,11 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import json
-import tempfile
 
 from django.conf import settings
+from google.oauth2 import service_account
 import google.cloud.dlp
 
 from django_models_from_csv.models import CredentialStore
+from django_models_from_csv.utils.common import chunked
 
 
 logger = logging.getLogger(__name__)
@@ -16,33 +18,25 @@ COLLAB_PIPE_GOOGLE_DLP_PII_FILTERS = getattr(
     ["EMAIL_ADDRESS", "FIRST_NAME", "LAST_NAME", "PHONE_NUMBER"]
 )
 
+# Maximum number of values sent to DLP in a single request
+COLLAB_PIPE_GOOGLE_DLP_BATCH_SIZE = getattr(
+    settings, "COLLAB_PIPE_GOOGLE_DLP_BATCH_SIZE", 500
+)
 
-def deidentify_with_mask(project, string, info_types, masking_character=None,
-                         number_to_mask=0, dlp=None):
-    """Uses the Data Loss Prevention API to deidentify sensitive data in a
-    string by masking it with a character.
-    Args:
-        project: The Google Cloud project id to use as a parent resource.
-        item: The string to deidentify (will be treated as text).
-        masking_character: The character to mask matching sensitive data with.
-        number_to_mask: The maximum number of sensitive characters to mask in
-            a match. If omitted or set to zero, the API will default to no
-            maximum.
-    Returns:
-        None; the response from the API is printed to the terminal.
-    """
-
+# Maximum number of DLP requests running at once
+COLLAB_PIPE_GOOGLE_DLP_MAX_WORKERS = getattr(
+    settings, "COLLAB_PIPE_GOOGLE_DLP_MAX_WORKERS", 4
+)
 
-    # Convert the project id into a full resource id.
-    parent = dlp.project_path(project)
 
-    # Construct inspect configuration dictionary
-    inspect_config = {
+def get_inspect_config(info_types):
+    return {
         'info_types': [{'name': info_type} for info_type in info_types]
     }
 
-    # Construct deidentify configuration dictionary
-    deidentify_config = {
+
+def get_mask_config(masking_character=None, number_to_mask=0):
+    return {
         'info_type_transformations': {
             'transformations': [
                 {
@@ -57,55 +51,188 @@ def deidentify_with_mask(project, string, info_types, masking_character=None,
         }
     }
 
+
+def deidentify_with_mask(project, string, info_types, masking_character=None,
+                         number_to_mask=0, dlp=None):
+    """Uses the Data Loss Prevention API to deidentify sensitive data in a
+    string by masking it with a character.
+    Args:
+        project: The Google Cloud project id to use as a parent resource.
+        item: The string to deidentify (will be treated as text).
+        masking_character: The character to mask matching sensitive data with.
+        number_to_mask: The maximum number of sensitive characters to mask in
+            a match. If omitted or set to zero, the API will default to no
+            maximum.
+    Returns:
+        The deidentified string.
+    """
+
+
+    # Convert the project id into a full resource id.
+    parent = dlp.project_path(project)
+
     # Construct item
     item = {'value': string}
 
     # Call the API
     response = dlp.deidentify_content(
-        parent, inspect_config=inspect_config,
-        deidentify_config=deidentify_config, item=item)
+        parent, inspect_config=get_inspect_config(info_types),
+        deidentify_config=get_mask_config(
+            masking_character=masking_character,
+            number_to_mask=number_to_mask,
+        ),
+        item=item)
 
     return response.item.value
 
 
-def run(row, columns=None):
-    try:
-        dlp_cred = CredentialStore.objects.get(
-            name="google_dlp_credentials"
-        )
-    except CredentialStore.DoesNotExist:
-        return
+def deidentify_table_with_mask(project, strings, info_types,
+                               masking_character=None, number_to_mask=0,
+                               dlp=None):
+    """
+    Same as deidentify_with_mask, but deidentifies a list of strings
+    in a single API call by sending them as a one column table.
+    Returns the deidentified strings, in the same order.
+    """
+    parent = dlp.project_path(project)
 
-    account_json = json.loads(dlp_cred.credentials)
+    item = {
+        'table': {
+            'headers': [{'name': 'value'}],
+            'rows': [
+                {'values': [{'string_value': string}]}
+                for string in strings
+            ],
+        }
+    }
+
+    response = dlp.deidentify_content(
+        parent, inspect_config=get_inspect_config(info_types),
+        deidentify_config=get_mask_config(
+            masking_character=masking_character,
+            number_to_mask=number_to_mask,
+        ),
+        item=item)
+
+    return [row.values[0].string_value for row in response.item.table.rows]
+
+
+class Redactor:
+    """
+    Redacts the values of columns marked for redaction using Google
+    DLP. The DLP client is built once, so a single Redactor should be
+    used for a whole import.
 
-    with tempfile.NamedTemporaryFile(mode='w', delete=False) as f_in:
-        f_in.write(dlp_cred.credentials)
-        f_in.flush()
+    Values are redacted in batches: identical values are only sent
+    once and many values are sent per request, with a limited number
+    of requests running at once.
+    """
+    def __init__(self, credentials, dlp=None, batch_size=None,
+                 max_workers=None):
+        account_json = json.loads(credentials)
+        self.project = account_json.get("project_id")
+        if dlp is None:
+            creds = service_account.Credentials.from_service_account_info(
+                account_json
+            )
+            dlp = google.cloud.dlp.DlpServiceClient(credentials=creds)
+        self.dlp = dlp
+        self.batch_size = batch_size or COLLAB_PIPE_GOOGLE_DLP_BATCH_SIZE
+        self.max_workers = max_workers or COLLAB_PIPE_GOOGLE_DLP_MAX_WORKERS
+
+    def deidentify(self, strings):
         try:
-            # We have to close this in Windows
-            f_in.close()
+            redacted = deidentify_table_with_mask(
+                self.project,
+                strings,
+                COLLAB_PIPE_GOOGLE_DLP_PII_FILTERS,
+                dlp=self.dlp,
+            )
         except Exception as e:
-            pass # this means we're on a unix env
-
-        dlp = google.cloud.dlp.DlpServiceClient.from_service_account_json(
-            f_in.name
-        )
-        project = account_json.get("project_id")
-
-        redact_column_names = []
-        for column in columns:
-            if not column.get("redact"):
-                continue
-            redact_column_names.append(column.get("name"))
-        for header in row:
-            if header not in redact_column_names:
-                continue
-            try:
-                row[header] = deidentify_with_mask(
-                    project,
-                    row[header],
-                    COLLAB_PIPE_GOOGLE_DLP_PII_FILTERS,
-                    dlp=dlp,
-                )
-            except Exception as e:
-                logger.warning("Google DLP error: %s" % (e))
+            logger.warning("Google DLP error: %s" % (e))
+            return {}
+        return dict(zip(strings, redacted))
+
+    def redact_values(self, values):
+        """
+        Return a lookup of value => redacted value for the given values.
+        Values that couldn't be redacted are left out.
+        """
+        unique = list(dict.fromkeys(
+            v for v in values if isinstance(v, str) and v
+        ))
+        redactions = {}
+        if not unique:
+            return redactions
+        batches = list(chunked(unique, self.batch_size))
+        if len(batches) == 1:
+            redactions.update(self.deidentify(batches[0]))
+            return redactions
+        n_workers = min(self.max_workers, len(batches))
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            for result in executor.map(self.deidentify, batches):
+                redactions.update(result)
+        return redactions
+
+    def redact_rows(self, rows, columns):
+        """
+        Redact the columns marked for redaction, in place, in a list
+        of rows. Returns the positions of the rows with values that
+        couldn't be redacted (e.g., DLP returned an error).
+        """
+        redact_column_names = [
+            column.get("name") for column in columns or []
+            if column.get("redact")
+        ]
+        if not redact_column_names:
+            return []
+        values = []
+        for row in rows:
+            for header in redact_column_names:
+                if header in row:
+                    values.append(row[header])
+        redactions = self.redact_values(values)
+        failed = []
+        for ix, row in enumerate(rows):
+            for header in redact_column_names:
+                value = row.get(header)
+                if not isinstance(value, str) or not value:
+                    continue
+                if value in redactions:
+                    row[header] = redactions[value]
+                elif not failed or failed[-1] != ix:
+                    failed.append(ix)
+        return failed
+
+
+# Redactors by credentials, so we only build one client for a set of
+# credentials, even when called row by row
+REDACTORS = {}
+
+
+def get_redactor():
+    """
+    Get a Redactor for the stored DLP credentials, or None if
+    there aren't any.
+    """
+    dlp_cred = CredentialStore.objects.filter(
+        name="google_dlp_credentials"
+    ).first()
+    if not dlp_cred or not dlp_cred.credentials:
+        return None
+    credentials = dlp_cred.credentials
+    if credentials not in REDACTORS:
+        REDACTORS.clear()
+        REDACTORS[credentials] = Redactor(credentials)
+    return REDACTORS[credentials]
+
+
+def run_batch(rows, columns=None):
+    redactor = get_redactor()
+    if not redactor:
+        return
+    return redactor.redact_rows(rows, columns)
+
+
+def run(row, columns=None):
+    return not run_batch([row], columns=columns)
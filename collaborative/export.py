@@ -1,9 +1,23 @@
+import csv
+
+from django.db.models import prefetch_related_objects
 from django.db.models.query import QuerySet
 from import_export.resources import (
     ModelResource, ModelDeclarativeMetaclass
 )
 import tablib
 
+from django_models_from_csv.utils.common import chunked, get_setting
+
+
+class Echo:
+    """
+    A file-like object that returns what's written to it instead of
+    storing it, so we can use csv.writer to stream rows.
+    """
+    def write(self, value):
+        return value
+
 
 class CollaborativeModelResource(ModelResource):
     def get_fk_fields(self):
@@ -25,46 +39,73 @@ class CollaborativeModelResource(ModelResource):
                     continue
                 yield field, rel_field, related_model
 
-    def add_reverse_fk_headers(self, headers):
+    def get_fk_plan(self):
+        """
+        Work out the reverse FK columns once per export: the relation
+        and field to read, and the display values of the field's
+        choices (if it has any).
+        """
+        if getattr(self, "_fk_plan", None) is not None:
+            return self._fk_plan
+        self._fk_plan = []
         for field, rel_field, related_model in self.get_fk_fields():
-            header_value = "%s__%s" % (field.name, rel_field.name)
+            choices = getattr(
+                related_model, "%s_CHOICES" % rel_field.name.upper(), []
+            )
+            self._fk_plan.append((field.name, rel_field.name, dict(choices)))
+        return self._fk_plan
+
+    def get_fk_prefetches(self):
+        """
+        Lookups needed to fetch all the reverse FK values in bulk.
+        """
+        lookups = []
+        for rel_name, attr_name, choices in self.get_fk_plan():
+            lookup = rel_name
+            if attr_name == "tags":
+                lookup = "%s__tags" % rel_name
+            if lookup not in lookups:
+                lookups.append(lookup)
+        return lookups
+
+    def add_reverse_fk_headers(self, headers):
+        for rel_name, attr_name, choices in self.get_fk_plan():
+            header_value = "%s__%s" % (rel_name, attr_name)
             if header_value in headers:
                 continue
             headers.append(header_value)
 
     def add_reverse_fk_values(self, export_resource, obj):
-        for field, rel_field, related_model in self.get_fk_fields():
-
-            if not hasattr(obj, field.name):
+        related_objs = {}
+        for rel_name, attr_name, choices in self.get_fk_plan():
+            if rel_name not in related_objs:
+                related_manager = getattr(obj, rel_name, None)
+                related_obj = None
+                if hasattr(related_manager, "all"):
+                    # read the first related object from the prefetched
+                    # objects, if there are any (first() always queries)
+                    related_obj = min(
+                        related_manager.all(), key=lambda r: r.pk,
+                        default=None,
+                    )
+                related_objs[rel_name] = related_obj
+            related_obj = related_objs[rel_name]
+
+            if related_obj is None:
                 export_resource.append("")
                 continue
 
-            related_manager = getattr(obj, field.name)
-
-            if not hasattr(related_manager, "first"):
-                export_resource.append("")
-                continue
-
-            related_obj = related_manager.first()
-
-            if rel_field.name == "tags":
+            if attr_name == "tags":
                 tags = ", ".join([t.name for t in related_obj.tags.all()])
                 export_resource.append(tags)
                 continue
 
-            if not hasattr(related_obj, rel_field.name):
+            if not hasattr(related_obj, attr_name):
                 export_resource.append("")
                 continue
 
-            rel_value = getattr(related_obj, rel_field.name)
-
-            choices = getattr(
-                related_obj, "%s_CHOICES" % rel_field.name.upper(), []
-            )
-            for pk, txt in choices:
-                if pk == rel_value:
-                    rel_value = txt
-                    break
+            rel_value = getattr(related_obj, attr_name)
+            rel_value = choices.get(rel_value, rel_value)
 
             # Prevent "None" from ending up in the spreadsheet
             if not rel_value:
@@ -72,6 +113,31 @@ class CollaborativeModelResource(ModelResource):
 
             export_resource.append(rel_value)
 
+    def iter_export_rows(self, queryset, chunk_size=None):
+        """
+        Yield export rows, including the reverse FK values. Records
+        are read in chunks, fetching the metadata and tags for each
+        chunk in bulk, so we don't hold the whole export in memory
+        or do queries per row.
+        """
+        chunk_size = chunk_size or get_setting(
+            "CSV_MODELS_EXPORT_CHUNK_SIZE", 1000
+        )
+        lookups = self.get_fk_prefetches()
+        if isinstance(queryset, QuerySet):
+            # Iterate without the queryset cache, to avoid wasting memory when
+            # exporting large datasets.
+            iterable = queryset.iterator()
+        else:
+            iterable = queryset
+        for chunk in chunked(iterable, chunk_size):
+            if lookups:
+                prefetch_related_objects(chunk, *lookups)
+            for obj in chunk:
+                export_resource = self.export_resource(obj)
+                self.add_reverse_fk_values(export_resource, obj)
+                yield export_resource
+
     def export(self, queryset=None, *args, **kwargs):
         """
         Exports a resource and handles reverse FK relationships.
@@ -85,21 +151,30 @@ class CollaborativeModelResource(ModelResource):
         self.add_reverse_fk_headers(headers)
         data = tablib.Dataset(headers=headers)
 
-        if isinstance(queryset, QuerySet):
-            # Iterate without the queryset cache, to avoid wasting memory when
-            # exporting large datasets.
-            iterable = queryset.iterator()
-        else:
-            iterable = queryset
-        for obj in iterable:
-            export_resource = self.export_resource(obj)
-            self.add_reverse_fk_values(export_resource, obj)
+        for export_resource in self.iter_export_rows(queryset):
             data.append(export_resource)
 
         self.after_export(queryset, data, *args, **kwargs)
 
         return data
 
+    def export_csv(self, queryset=None, *args, **kwargs):
+        """
+        Same as export, but yields the CSV lines as they are built,
+        for use in a StreamingHttpResponse.
+        """
+        self.before_export(queryset, *args, **kwargs)
+
+        if queryset is None:
+            queryset = self.get_queryset()
+        headers = self.get_export_headers()
+        self.add_reverse_fk_headers(headers)
+
+        writer = csv.writer(Echo())
+        yield writer.writerow(headers)
+        for export_resource in self.iter_export_rows(queryset):
+            yield writer.writerow(export_resource)
+
 
 def collaborative_modelresource_factory(
         model, resource_class=CollaborativeModelResource, meta_attrs=None
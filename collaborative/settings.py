@@ -112,7 +112,6 @@ FORM_RENDERER = 'django.forms.renderers.TemplatesSetting'
 
 WSGI_APPLICATION = 'collaborative.wsgi.application'
 
-CSV_MODELS_TEMP_DB = "schemabuilding"
 CSV_MODELS_WIZARD_REDIRECT_TO = "/setup-credentials?postsave=True"
 CSV_MODELS_AUTO_REGISTER_ADMIN = False
 
@@ -130,18 +129,13 @@ APP_ORDER = [
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
 # Set up the database connection dynamically from the DATABASE_URL
-# environment variable. Don't change the second database as it's a
-# critical part of data source importing.
+# environment variable.
 db_from_env = dj_database_url.config()
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     },
-    CSV_MODELS_TEMP_DB: {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': ':memory:',
-    }
 }
 DATABASES['default'].update(db_from_env)
 
@@ -178,9 +172,10 @@ LOGIN_REDIRECT_URL = "/setup-check/"
 LOGIN_URL = "/admin"
 
 # You can pass each row imported from a spreadsheet through a custom
-# data pipeline function.  Every row gets passed into these functions in
-# turn, modifying the data to suit your needs.  For more information,
-# please see the documentation at http://TKTKTK.
+# data pipeline function.  Every batch of rows gets passed into these
+# functions in turn, modifying the data to suit your needs.  For more
+# information, please see the documentation at http://TKTKTK, and the
+# uppercase example below.
 DATA_PIPELINE = [
     # To have the app automatically redact personally identifiable
     # information from a spreadsheet, setup the credentials in the
@@ -192,6 +187,10 @@ DATA_PIPELINE = [
     # 'collaborative.data_pipeline.uppercase',
 ]
 
+# Number of workers used by data pipeline processors which run in a
+# thread or process pool (see collaborative.data_pipeline.uppercase)
+DATA_PIPELINE_WORKERS = 4
+
 # Types of private information to filter out, here are some example
 # options. A full list can be found here:
 #     https://cloud.google.com/dlp/docs/infotypes-reference
@@ -200,6 +199,11 @@ DATA_PIPELINE = [
 #     "STREET_ADDRESS",
 # ]
 
+# Values are sent to Google DLP in batches of this many (identical
+# values are only sent once), with up to this many requests at a time.
+# COLLAB_PIPE_GOOGLE_DLP_BATCH_SIZE = 500
+# COLLAB_PIPE_GOOGLE_DLP_MAX_WORKERS = 4
+
 # Eliminate social auth trailing slashes because Google OAuth
 # explodes if you tell it to call back to a slash-ending URL
 SOCIAL_AUTH_TRAILING_SLASH = False
@@ -309,6 +313,79 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # You can set this to None to disable timeouts
 MAX_IMPORT_RECORDS = 750
 
+# Number of rows written to the database at a time during imports.
+# Each batch is inserted/updated in bulk inside a single transaction.
+CSV_MODELS_IMPORT_BATCH_SIZE = 500
+
+# First imports into an empty table skip the ORM and write rows
+# directly (with COPY on PostgreSQL), in batches of this size.
+CSV_MODELS_BULK_LOAD = True
+CSV_MODELS_BULK_LOAD_BATCH_SIZE = 10000
+
+# Source data larger than this (in bytes) gets spooled to a temporary
+# file during import, instead of being kept in memory.
+CSV_MODELS_SPOOL_MAX_SIZE = 5 * 1024 * 1024
+
+# Fetching data sources over HTTP: connect and read timeouts (in
+# seconds), how many times failed requests (connection errors,
+# timeouts, 429 and 5xx responses) are retried, and the base and
+# maximum of the randomized exponential backoff between retries.
+CSV_MODELS_HTTP_CONNECT_TIMEOUT = 10
+CSV_MODELS_HTTP_READ_TIMEOUT = 60
+CSV_MODELS_HTTP_RETRIES = 3
+CSV_MODELS_HTTP_BACKOFF = 1
+CSV_MODELS_HTTP_MAX_BACKOFF = 60
+
+# Number of pages of Screendoor responses fetched at the same time.
+CSV_MODELS_SCREENDOOR_WORKERS = 4
+
+# Column types of a new data source are inferred from its first rows
+# plus a random sample of the rows after those, looking at no more
+# than MAX_ROWS rows (0 reads everything). For URL, Google Sheet and
+# Screendoor sources, all the rows are then checked in a queued job
+# and any values that contradict the inferred types are shown in the
+# wizard.
+CSV_MODELS_INFERENCE_SAMPLE_SIZE = 1000
+CSV_MODELS_INFERENCE_RESERVOIR_SIZE = 1000
+CSV_MODELS_INFERENCE_MAX_ROWS = 100000
+
+# Only one process imports a data source at a time. On databases
+# other than PostgreSQL this is done with a lease (in seconds), which
+# others can take over if its holder stops renewing it.
+CSV_MODELS_IMPORT_LOCK_LEASE = 60 * 60
+
+# Run wizard imports of URL, Google Sheet and Screendoor sources as
+# queued jobs, processed by the clock process (or `manage.py
+# process_import_jobs`), instead of inside the web request. Background
+# imports have no MAX_IMPORT_RECORDS limit. Uploaded CSVs are always
+# imported inside the request, since the clock process can't read
+# files uploaded to the web process (e.g., on separate Heroku dynos).
+CSV_MODELS_BACKGROUND_IMPORTS = False
+
+# Number of data sources refresh_data_sources refreshes at the same
+# time (each in its own process), and the number of seconds after
+# which a source's refresh gets stopped so it can't hold up the rest.
+CSV_MODELS_REFRESH_WORKERS = 4
+CSV_MODELS_REFRESH_TIMEOUT = 600
+
+# Each data source is refreshed on its own schedule. Sources start
+# out being refreshed every REFRESH_INTERVAL seconds, which halves
+# every time a refresh finds changes and doubles every time it finds
+# none (or fails), staying between the MIN and MAX intervals.
+CSV_MODELS_REFRESH_INTERVAL = 15 * 60
+CSV_MODELS_REFRESH_MIN_INTERVAL = 5 * 60
+CSV_MODELS_REFRESH_MAX_INTERVAL = 24 * 60 * 60
+
+# Number of refreshes in a row a data source can fail before it's
+# marked dead and no longer refreshed, until an import of it succeeds
+# again (e.g., from the refine page). Set to 0 to keep retrying.
+CSV_MODELS_REFRESH_MAX_FAILURES = 10
+
+# How often (in seconds) each process checks whether data sources
+# have changed and its models/admins need rebuilding. Set to 0 to
+# check on every request.
+CSV_MODELS_SCHEMA_CHECK_INTERVAL = 2
+
 try:
     from collaborative.settings_dev import *
 except ModuleNotFoundError:
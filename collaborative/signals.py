@@ -1,7 +1,10 @@
+from contextlib import contextmanager
 from copy import copy
 import logging
+import threading
 
 from django.contrib.auth.models import User
+from django.db import connection
 from django.db.models.signals import post_save
 from django.db.utils import OperationalError
 from django.dispatch import receiver
@@ -13,10 +16,14 @@ from collaborative.models import (
 from collaborative.user import set_staff_status
 from django_models_from_csv import models
 from django_models_from_csv.permissions import build_tag_permission_group
+from django_models_from_csv.utils.common import chunked
 
 
 logger = logging.getLogger(__name__)
 
+# per-thread state of the metadata signal (see suppress_meta_signals)
+_meta_signal_state = threading.local()
+
 
 @receiver(post_save, sender=User)
 def ensure_staff(sender, **kwargs):
@@ -125,6 +132,21 @@ def build_and_link_metadata_fk(dynmodel):
         post_save.connect(attach_blank_meta_to_record, sender=Model)
 
 
+@contextmanager
+def suppress_meta_signals():
+    """
+    Skip attach_blank_meta_to_record while this is active (in this
+    thread). Bulk imports use this, attaching metadata to the records
+    they wrote a batch at a time with attach_blank_meta_to_records.
+    """
+    depth = getattr(_meta_signal_state, "suppressed", 0)
+    _meta_signal_state.suppressed = depth + 1
+    try:
+        yield
+    finally:
+        _meta_signal_state.suppressed = depth
+
+
 def attach_blank_meta_to_record(sender, instance, **kwargs):
     """
     This signal gets ran when a new CSV-backed form response record
@@ -136,7 +158,7 @@ def attach_blank_meta_to_record(sender, instance, **kwargs):
     managed).
     """
     # logger.debug("attach_blank_meta_to_record: %s" % (instance))
-    if not instance:
+    if not instance or getattr(_meta_signal_state, "suppressed", 0):
         return
 
     meta_model_name = "%smetadata" % instance._meta.object_name
@@ -165,6 +187,78 @@ def attach_blank_meta_to_record(sender, instance, **kwargs):
     )
 
 
+def attach_blank_meta_to_records(Model, pks=None):
+    """
+    Set-based version of attach_blank_meta_to_record, for after a bulk
+    write (which doesn't send post_save signals): creates blank metadata
+    records for the records of Model that don't have one, using a
+    single INSERT ... SELECT statement. If given, only the records with
+    the primary keys in `pks` are looked at (in chunks, so we stay under
+    the database's query parameter limits).
+    """
+    meta_model_name = "%smetadata" % Model._meta.object_name
+    meta_model_desc = models.DynamicModel.objects.filter(
+        name=meta_model_name
+    ).first()
+    MetaModel = meta_model_desc and meta_model_desc.get_model()
+    if not MetaModel:
+        logger.debug("No metadata model for: %s" % Model._meta.object_name)
+        return
+
+    qn = connection.ops.quote_name
+    fk_field = MetaModel._meta.get_field("metadata")
+    # the blank record's values come from the field defaults
+    blank = MetaModel()
+    columns = []
+    values = []
+    params = []
+    for field in MetaModel._meta.concrete_fields:
+        if field.primary_key or field is fk_field:
+            continue
+        columns.append(qn(field.column))
+        # postgres can't infer the type of a bare NULL in a SELECT
+        if connection.vendor == "postgresql":
+            values.append("CAST(%%s AS %s)" % field.db_type(connection))
+        else:
+            values.append("%s")
+        params.append(field.get_db_prep_save(
+            getattr(blank, field.attname), connection
+        ))
+    sql = (
+        "INSERT INTO {meta} ({columns}) "
+        "SELECT {values} r.{pk} FROM {table} r "
+        "WHERE NOT EXISTS ("
+        "SELECT 1 FROM {meta} m WHERE m.{fk} = r.{pk}"
+        ")"
+    ).format(
+        meta=qn(MetaModel._meta.db_table),
+        columns=", ".join(columns + [qn(fk_field.column)]),
+        values="".join("%s, " % v for v in values),
+        pk=qn(Model._meta.pk.column),
+        table=qn(Model._meta.db_table),
+        fk=qn(fk_field.column),
+    )
+
+    if pks is None:
+        batches = [None]
+    else:
+        batches = chunked(pks, 500)
+    created = 0
+    with connection.cursor() as cursor:
+        for batch in batches:
+            if batch is None:
+                cursor.execute(sql, params)
+            else:
+                cursor.execute("%s AND r.%s IN (%s)" % (
+                    sql, qn(Model._meta.pk.column),
+                    ", ".join(["%s"] * len(batch))
+                ), params + list(batch))
+            created += max(cursor.rowcount, 0)
+    logger.debug("Created %s blank metadata records for %s" % (
+        created, Model._meta.object_name
+    ))
+
+
 def setup_dynmodel_signals():
     """
     Attach signals to our dynamically generated models. Here, we
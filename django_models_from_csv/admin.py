@@ -56,6 +56,7 @@ class AdminAutoRegistration:
                 str(Model)
             ))
 
+    def reload_urls(self):
         # If we don't do this, our module will show up in admin but
         # it will show up as an unclickable thing with on add/change
         importlib.reload(import_module(settings.ROOT_URLCONF))
@@ -117,17 +118,25 @@ class AdminAutoRegistration:
             return False
         return self.include in str(Model)
 
-    def register(self):
+    def register(self, names=None):
+        """
+        Build and register admins for our models. If a list of model
+        names is given, only the admins for those models are rebuilt.
+        The URLconf is reloaded once, after all admins are registered.
+        """
         try:
             create_models()
         except Exception:
             pass
         for Model in apps.get_models():
+            if names is not None and Model._meta.object_name not in names:
+                continue
             if not self.should_register_admin(Model):
                 continue
 
             ModelAdmin = self.create_admin(Model)
             self.attempt_register(Model, ModelAdmin)
+        self.reload_urls()
 
 
 if get_setting("CSV_MODELS_AUTO_REGISTER_ADMIN", True):
@@ -5,30 +5,109 @@ from django.apps import apps, AppConfig
 from django.contrib.admin import site
 from django.conf import settings
 from django.core.signals import request_started
+from django.urls.base import clear_url_caches
+
+from django_models_from_csv.utils.common import get_setting
 
 
 logger = logging.getLogger(__name__)
 
 
-def check_apps_need_reloading(sender, environ, **kwargs):
-    # don't run this on static asset request. since we're using
-    # whitenoise, this will happen (all assets go through as a
-    # django request, triggering this signal)
-    request = sender.request_class(environ)
-    path = request.path
-    static_url = getattr(settings, "STATIC_URL", "/static/")
-    if path.startswith(static_url):
-        return
+# What this process last built its dynamic models and admins from:
+# the schema generation, when we last checked it and the schema hash
+# of each data source (by model name)
+LOADED_SCHEMA = {
+    "generation": None,
+    "checked": 0,
+    "models": {},
+}
 
-    start = time.time()
-    ContentType = apps.get_model(
-        "contenttypes", "ContentType"
-    )
+
+def get_admin_names(names):
+    """
+    Given a list of changed model names, return the names of the models
+    whose admin needs to be rebuilt. Metadata models don't get their own
+    admin, they're inlines on their base model's admin.
+    """
+    conf = apps.get_app_config("django_models_from_csv")
+    admin_names = set(names)
+    for Model in conf.get_models():
+        name = Model._meta.object_name
+        for changed in names:
+            if changed != name and changed.startswith(name) and \
+               changed.endswith("metadata"):
+                admin_names.add(name)
+    return admin_names
+
+
+def reload_changed_models():
+    """
+    Bring this process' registry, admins and URLconf in line with the
+    DynamicModels in the database, only touching the models that were
+    added, removed or had their columns changed since our last build.
+    """
     DynamicModel = apps.get_model(
         "django_models_from_csv", "DynamicModel"
     )
+    current = dict(
+        DynamicModel.objects.values_list("name", "schema_hash")
+    )
+    loaded = LOADED_SCHEMA["models"]
+    changed = [
+        name for name, schema_hash in current.items()
+        if loaded.get(name) != schema_hash
+    ]
+    added = [name for name in changed if name not in loaded]
+    removed = [name for name in loaded if name not in current]
+    if not changed and not removed:
+        return
+
+    logger.info("Rebuilding changed models: %s, removed: %s" % (
+        changed, removed
+    ))
+    from django_models_from_csv.models import BUILT_SCHEMAS, create_models
+    conf = apps.get_app_config("django_models_from_csv")
+    these_models = apps.all_models["django_models_from_csv"]
+    for name in removed:
+        BUILT_SCHEMAS.pop(name, None)
+        Model = these_models.pop(name.lower(), None)
+        if Model is not None and site.is_registered(Model):
+            site.unregister(Model)
+
+    if changed:
+        # this only rebuilds the model classes whose schema differs
+        # from the one they were built with
+        create_models()
+    if added:
+        from django_models_from_csv.permissions import (
+            hydrate_models_and_permissions
+        )
+        hydrate_models_and_permissions(conf)
+
+    apps.clear_cache()
+    # re-register the changed admins. the goal here is to get the
+    # AdminSite's internal _registry to be updated with the new models.
+    # this also reloads the URLconf
+    from collaborative.admin import AdminMetaAutoRegistration
+    AdminMetaAutoRegistration(
+        include="django_models_from_csv.models"
+    ).register(names=get_admin_names(changed + removed))
+    clear_url_caches()
+    LOADED_SCHEMA["models"] = current
+
+
+def reload_models_if_changed():
+    """
+    Rebuild this process' changed models (see reload_changed_models)
+    if the schema generation moved on since we last loaded it. Besides
+    requests, the management commands working with the dynamic models
+    call this, as long-lived processes like the clock never serve any.
+    """
+    SchemaGeneration = apps.get_model(
+        "django_models_from_csv", "SchemaGeneration"
+    )
     try:
-        n_dynmodels = DynamicModel.objects.values("id").count()
+        generation = SchemaGeneration.current()
     except Exception as e:
         # migrations not ran
         logger.error("Not checking for data sources due to error: %s" % (
@@ -36,38 +115,34 @@ def check_apps_need_reloading(sender, environ, **kwargs):
         ))
         return
 
-    conf = apps.get_app_config("django_models_from_csv")
-    registered_models = list(conf.get_models())
-    n_registered = len(registered_models)
-
-    # subtract one for DynamicModel, one for CredentialStore which won't
-    # be in the DynamicModels count()
-    if n_dynmodels != (n_registered - 2):
-        last_model = DynamicModel.objects.last()
-        if last_model:
-            last_model.model_cleanup()
-
-    # figure out how many of our admins are registered
-    n_admins = 0
-    for model, admin in site._registry.items():
-        if model._meta.app_label != "django_models_from_csv":
-            continue
-        if model._meta.object_name == "DynamicModel":
-            continue
-        n_admins += 1
-
-    # since each data source has three models (source data, meta and
-    # contact), but we only build admins for the main data source
-    # model. so we divide by three because we only want to count base
-    # model admins and it's quicker to do a divide than to re-query,
-    # filtering by name
-    if True: # or (n_dynmodels / 3) > n_admins:
-        # re-register apps. the goal here is to get the AdminSite's
-        # internal _registry to be updated with the new app.
-        from collaborative.admin import AdminMetaAutoRegistration
-        AdminMetaAutoRegistration(
-            include="django_models_from_csv.models"
-        ).register()
+    if generation == LOADED_SCHEMA["generation"]:
+        return
+
+    start = time.time()
+    reload_changed_models()
+    LOADED_SCHEMA["generation"] = generation
+    logger.debug("Schema generation %s loaded in %.3fs" % (
+        generation, time.time() - start
+    ))
+
+
+def check_apps_need_reloading(sender, environ, **kwargs):
+    # don't run this on static asset request. since we're using
+    # whitenoise, this will happen (all assets go through as a
+    # django request, triggering this signal)
+    path = environ.get("PATH_INFO", "")
+    static_url = getattr(settings, "STATIC_URL", "/static/")
+    if path.startswith(static_url):
+        return
+
+    # only look at the schema generation every so often, since this
+    # runs on every request
+    now = time.time()
+    interval = get_setting("CSV_MODELS_SCHEMA_CHECK_INTERVAL", 0)
+    if now - LOADED_SCHEMA["checked"] < interval:
+        return
+    LOADED_SCHEMA["checked"] = now
+    reload_models_if_changed()
 
 
 class DjangoDynamicModelsConfig(AppConfig):
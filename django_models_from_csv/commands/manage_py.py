@@ -1,37 +1,6 @@
-from django.core.management.commands import (
-    makemigrations, migrate, inspectdb
-)
+from django.core.management.commands import makemigrations, migrate
 from django.db import DEFAULT_DB_ALIAS
 
-from django_models_from_csv.utils.common import get_setting
-
-
-def run_inspectdb(table_name=None):
-    """
-    Run inspectdb against our secondary in-memory database. Basically,
-    we're running the equivalent of this manage.py command:
-
-        ./manage.py inspectdb --database schemabuilding
-
-    Returns the generated models.py
-    """
-    cmd = inspectdb.Command()
-    options = {
-        'verbosity': 1,
-        'settings': None,
-        'pythonpath': None,
-        'traceback': False,
-        'no_color': False,
-        'force_color': False,
-        'table': [table_name] or [],
-        'database': get_setting("CSV_MODELS_TEMP_DB"),
-        'include_partitions': False,
-        'include_views': False
-    }
-    # This command returns a generator of models.py text lines
-    gen = cmd.handle_inspection(options)
-    return "\n".join(list(gen))
-
 
 def run_makemigrations(module):
     """
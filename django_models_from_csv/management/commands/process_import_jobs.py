@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from django_models_from_csv.apps import reload_models_if_changed
+from django_models_from_csv.models import ImportJob
+
+
+logger = logging.getLogger(__name__)
+syslog = logging.StreamHandler()
+logger.addHandler(syslog)
+logger.setLevel(logging.DEBUG)
+
+
+class Command(BaseCommand):
+    help = "Run queued data source imports and validations."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep waiting for new jobs instead of exiting once "
+                 "the queue is empty.",
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=5,
+            help="Seconds to wait between checks for new jobs (--loop).",
+        )
+
+    def run_queued(self):
+        # pick up sources added or refined by other processes
+        reload_models_if_changed()
+        n_jobs = 0
+        job = ImportJob.claim_next()
+        while job:
+            logger.info("Running job %s: %s" % (job.pk, job))
+            errors = job.run()
+            if errors:
+                for error in errors:
+                    logger.error("Import error: %s" % (error))
+            else:
+                logger.info("Job %s complete" % (job.pk))
+            n_jobs += 1
+            job = ImportJob.claim_next()
+        return n_jobs
+
+    def handle(self, *args, **options):
+        self.run_queued()
+        while options.get("loop"):
+            time.sleep(options["sleep"])
+            self.run_queued()
@@ -1,10 +1,19 @@
 #!/usr/bin/env python3
 import logging
+import subprocess
+import sys
+import time
 
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
 
 from collaborative.models import MODEL_TYPES
+from django_models_from_csv.apps import reload_models_if_changed
 from django_models_from_csv.models import DynamicModel
+from django_models_from_csv.utils.common import get_setting
+from django_models_from_csv.utils.importing import ImportReport
+from django_models_from_csv.utils.schedule import is_due, update_schedule
 
 
 logger = logging.getLogger(__name__)
@@ -13,12 +22,146 @@ logger.addHandler(syslog)
 logger.setLevel(logging.DEBUG)
 
 
+def refresh_source(dynmodel, replace=None, force=False):
+    """
+    Refresh a single data source. Returns its outcome: a dict with
+    the source's name, how long it took (in seconds), the row counts,
+    the list of errors and whether the whole refresh `failed` (e.g.,
+    the source couldn't be fetched), as opposed to some of its rows.
+    """
+    started = time.monotonic()
+    failed = False
+    try:
+        report = dynmodel.import_data(replace=replace, force=force)
+    except Exception as e:
+        logger.exception("Error refreshing %s" % dynmodel.name)
+        report = ImportReport([str(e)])
+        failed = True
+    return {
+        "name": dynmodel.name,
+        "duration": time.monotonic() - started,
+        "failed": failed,
+        "skipped": report.skipped,
+        "locked": report.locked,
+        "inserted": report.inserted,
+        "updated": report.updated,
+        "unchanged": report.unchanged,
+        "deleted": report.deleted,
+        "errors": [str(e) for e in report],
+    }
+
+
+def failed_outcome(name, duration, error):
+    return {
+        "name": name, "duration": duration, "failed": True,
+        "skipped": False, "locked": False,
+        "inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0,
+        "errors": [error],
+    }
+
+
+def refresh_command(dynmodel, replace=None, force=False):
+    """
+    The command line that refreshes a single source, in this same
+    project, when run as its own process.
+    """
+    args = [
+        sys.executable, "-m", "django", "refresh_data_sources",
+        "--settings=%s" % settings.SETTINGS_MODULE,
+        "--pk", str(dynmodel.pk), "--workers", "1", "--timeout", "0",
+    ]
+    if replace:
+        args.append("--replace")
+    if force:
+        args.append("--force")
+    return args
+
+
+def run_isolated(jobs, workers, timeout=None):
+    """
+    Run jobs, a list of (name, command line) tuples, each as its own
+    process with at most `workers` of them running at once. A job
+    still running after `timeout` seconds is killed. Yields a
+    (name, outcome) tuple for each job as it finishes: the outcome is
+    None if the job exited successfully (it reports its own outcome),
+    or a failed outcome (see refresh_source) if it timed out or
+    crashed.
+
+    These are new processes rather than forks, which would copy the
+    state of whichever threads (e.g. the clock's scheduler) hold
+    locks at the time.
+    """
+    pending = list(jobs)
+    running = []
+    while pending or running:
+        while pending and len(running) < workers:
+            name, args = pending.pop(0)
+            process = subprocess.Popen(args, cwd=settings.BASE_DIR)
+            running.append((name, process, time.monotonic()))
+
+        still_running = []
+        for name, process, started in running:
+            duration = time.monotonic() - started
+            returncode = process.poll()
+            if returncode == 0:
+                outcome = None
+            elif returncode is not None:
+                outcome = failed_outcome(
+                    name, duration, "Refresh process exited with code %s" % (
+                        returncode
+                    )
+                )
+            elif timeout and duration > timeout:
+                process.kill()
+                process.wait()
+                outcome = failed_outcome(
+                    name, duration, "Timed out after %s seconds" % timeout
+                )
+            else:
+                still_running.append((name, process, started))
+                continue
+            yield name, outcome
+        running = still_running
+        if running:
+            time.sleep(0.1)
+
+
 class Command(BaseCommand):
     help = "Refresh CSV models from source data."
 
     def add_arguments(self, parser):
         parser.add_argument('--name', action='append', type=str)
         parser.add_argument('--pk', action='append', type=int)
+        parser.add_argument(
+            '--replace', action='store_true', default=None,
+            help="Swap in a fresh copy of each source instead of "
+                 "updating records in place (see replace_records)",
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Re-import sources even if they look unchanged. "
+                 "Screendoor sources get a full resync instead of only "
+                 "fetching the responses changed since the last one.",
+        )
+        parser.add_argument(
+            '--due', action='store_true',
+            help="Only refresh the sources whose next scheduled refresh "
+                 "has come (see utils.schedule)",
+        )
+        parser.add_argument(
+            '--workers', type=int,
+            default=get_setting("CSV_MODELS_REFRESH_WORKERS", 1),
+            help="Number of sources to refresh at the same time, each "
+                 "in its own process.",
+        )
+        parser.add_argument(
+            '--timeout', type=float,
+            default=get_setting("CSV_MODELS_REFRESH_TIMEOUT", 600),
+            help="Seconds after which a source's refresh is stopped. "
+                 "0 means no limit, and with --workers 1 the sources "
+                 "are then refreshed one after the other in this "
+                 "process.",
+        )
 
     def get_dynmodel(self, name=None, pk=None):
         if name is not None:
@@ -28,11 +171,61 @@ class Command(BaseCommand):
             logger.info("Loading by id=%s" % (pk))
             return DynamicModel.objects.get(pk=pk)
 
+    def get_refreshable(self, models):
+        for model in models:
+            if model.attrs.get("type") != MODEL_TYPES.CSV:
+                continue
+            # Don't auto-update files, makes no sense as only
+            # user-requests can create the upload
+            if model.csv_file:
+                continue
+            # model import has been failing, skip
+            if model.attrs.get("dead"):
+                logger.info("Skipping failing import %s..." % (
+                    model.name
+                ))
+                continue
+            yield model
+
+    def report_outcome(self, outcome):
+        name = outcome["name"]
+        duration = outcome["duration"]
+        errors = outcome["errors"]
+        if not errors and outcome["skipped"]:
+            logger.info("%s: skipped, unchanged (%.1fs)" % (name, duration))
+            return
+        if outcome["locked"]:
+            logger.info("%s: skipped, already being imported" % name)
+            return
+        logger.info((
+            "%s: inserted: %s, updated: %s, unchanged: %s, deleted: %s, "
+            "errors: %s (%.1fs)"
+        ) % (
+            name, outcome["inserted"], outcome["updated"],
+            outcome["unchanged"], outcome["deleted"], len(errors), duration
+        ))
+        # TODO: on error, use the user messages framework
+        for error in errors:
+            logger.error("%s: import error: %s" % (name, error))
+
+    def schedule_next(self, model, outcome):
+        # whoever is importing the source will reschedule it
+        if outcome["locked"]:
+            return
+        update_schedule(model, outcome)
+
     def handle(self, *args, **options):
         logger.info("Loading models...")
+        # pick up sources added or refined by other processes
+        reload_models_if_changed()
 
         names = options.get("name") or []
         pks = options.get("pk") or []
+        replace = options.get("replace")
+        force = options.get("force", False)
+        workers = options["workers"]
+        if workers < 1:
+            raise CommandError("--workers needs to be at least 1")
 
         models = []
         for name in names:
@@ -42,31 +235,35 @@ class Command(BaseCommand):
             model = self.get_dynmodel(pk=pk)
             models.append(model)
 
-        if not names or not pks:
+        if not names and not pks:
             models = DynamicModel.objects.all()
 
-        for model in models:
-            if model.attrs.get("type") != MODEL_TYPES.CSV:
-                continue
-            # Don't auto-update files, makes no sense as only
-            # user-requests can create the upload
-            if model.csv_file:
-                continue
-            # model import has been failing, skip
-            if model.attrs.get("dead"):
-                logger.info("Skipping failing import %s..." % (
-                    model.name
-                ))
-                continue
-            logger.info("Refreshing %s" % model)
-            try:
-                errors = model.import_data()
-            except Exception as e:
-                errors = [str(e)]
-            if not errors:
-                logger.info("Success!")
-                continue
+        sources = list(self.get_refreshable(models))
+        if options.get("due"):
+            now = timezone.now()
+            sources = [m for m in sources if is_due(m, now=now)]
 
-            # TODO: on error, use the user messages framework
-            for error in errors:
-                logger.error("Import error: %s" % (error))
+        timeout = options.get("timeout")
+        if workers == 1 and not timeout:
+            for model in sources:
+                logger.info("Refreshing %s" % model)
+                outcome = refresh_source(model, replace=replace, force=force)
+                self.report_outcome(outcome)
+                self.schedule_next(model, outcome)
+            return
+
+        logger.info("Refreshing %s sources with %s workers" % (
+            len(sources), workers
+        ))
+        by_name = {model.name: model for model in sources}
+        jobs = [
+            (model.name, refresh_command(model, replace=replace, force=force))
+            for model in sources
+        ]
+        for name, outcome in run_isolated(jobs, workers, timeout):
+            # the sources that finished have reported and rescheduled
+            # themselves, we only hear about the ones that didn't
+            if outcome is None:
+                continue
+            self.report_outcome(outcome)
+            self.schedule_next(by_name[name], outcome)
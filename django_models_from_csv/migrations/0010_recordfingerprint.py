@@ -0,0 +1,26 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_models_from_csv', '0009_auto_20190905_2106'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordFingerprint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_id', models.CharField(max_length=255)),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('dynmodel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='django_models_from_csv.DynamicModel')),
+            ],
+            options={
+                'unique_together': {('dynmodel', 'record_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import jsonfield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_models_from_csv', '0010_recordfingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='queued', max_length=16)),
+                ('stage', models.CharField(blank=True, default='', max_length=64)),
+                ('rows_processed', models.IntegerField(default=0)),
+                ('errors', jsonfield.fields.JSONField(blank=True, default=list)),
+                ('csv_file', models.FileField(blank=True, upload_to='csv_uploads/jobs/')),
+                ('force', models.BooleanField(default=False)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('dynmodel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='django_models_from_csv.DynamicModel')),
+            ],
+            options={
+                'ordering': ('created',),
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_models_from_csv', '0011_importjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchemaGeneration',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
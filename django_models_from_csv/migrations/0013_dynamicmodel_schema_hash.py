@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_models_from_csv', '0012_schemageneration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dynamicmodel',
+            name='schema_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=40),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_models_from_csv', '0013_dynamicmodel_schema_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='kind',
+            field=models.CharField(choices=[('import', 'Import'), ('validate', 'Validate')], default='import', max_length=16),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_models_from_csv', '0014_importjob_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceLock',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('holder', models.CharField(max_length=64)),
+                ('expires', models.DateTimeField()),
+                ('dynmodel', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='source_lock', to='django_models_from_csv.DynamicModel')),
+            ],
+        ),
+    ]
@@ -1,3 +1,5 @@
+from datetime import timedelta
+import hashlib
 import importlib
 import json
 import logging
@@ -5,12 +7,15 @@ import re
 import sys
 
 from django.apps import apps
+from django.apps.registry import Apps
 from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.core.validators import MinLengthValidator
 from django.db import models
+from django.db.models import F, Q
 from django.urls.base import clear_url_caches
+from django.utils import timezone
 from django.utils.module_loading import import_module
 from django.utils.translation import gettext_lazy as _
 from jsonfield.fields import JSONField
@@ -21,10 +26,17 @@ from django_models_from_csv.permissions import (
     hydrate_models_and_permissions, wipe_models_and_permissions,
 )
 from django_models_from_csv.schema import ModelSchemaEditor, FieldSchemaEditor
-from django_models_from_csv.utils.common import slugify
-from django_models_from_csv.utils.csv import fetch_csv
+from django_models_from_csv.utils.common import get_setting, slugify
+from django_models_from_csv.utils.csv import (
+    fetch_csv_if_changed, SpooledCSV, CHUNK_SIZE,
+)
 from django_models_from_csv.utils.google_sheets import PrivateSheetImporter
-from django_models_from_csv.utils.importing import import_records
+from django_models_from_csv.utils.inference import find_contradicted_columns
+from django_models_from_csv.utils.locking import ImportLock
+from django_models_from_csv.utils.importing import (
+    import_records, preview_records, replace_records, columns_fingerprint,
+    ImportReport,
+)
 from django_models_from_csv.utils.screendoor import ScreendoorImporter
 
 
@@ -156,8 +168,25 @@ class DynamicModel(models.Model):
     # type  int    Model type (1=Base model, 2=Metadata, 3=Contact log)
     # dead  bool   If True, this model has been failing auto update and
     #              will be skipped until a manual successful import succeeds
+    # source dict  What we knew about the source data at the last
+    #              successful import (digest, HTTP validators, the
+    #              latest Screendoor response update seen, etc)
+    # validation   Columns whose type is contradicted by the source
+    #        dict  data, found by a validation job (see ImportJob)
+    # refresh_mode How re-imports write records: "upsert" (the default)
+    #        str   updates them in place, "replace" swaps in a freshly
+    #              loaded copy of the source (see replace_records)
+    # schedule     Refresh interval, next refresh time and failure
+    #        dict  count of this source (see utils.schedule)
     attrs = JSONField(max_length=255, editable=True)
 
+    # hash of the name and columns this model was last saved with. each
+    # process compares these against the model classes it has built to
+    # find the ones it needs to rebuild
+    schema_hash = models.CharField(
+        max_length=40, blank=True, default="", db_index=True,
+    )
+
     # This is a bit of a hack, but since Django calls post_save
     # migrations inside of save(), and we have to do our manual
     # migrations *after* save, there is a .middle state when using
@@ -235,50 +264,261 @@ class DynamicModel(models.Model):
         except LookupError as e:
             return None
 
-    def import_data(self, max_import_records=None, csv_file=None):
+    def get_schema_hash(self):
+        """
+        Hash everything that goes into building this model's class.
+        """
+        schema = json.dumps({
+            "name": self.name,
+            "columns": self.columns,
+        }, sort_keys=True)
+        return hashlib.sha1(schema.encode("utf-8")).hexdigest()
+
+    def save_attrs(self):
+        """
+        Persist changes to the attrs field only. Unlike save(), this
+        doesn't trigger migrations and model/admin rebuilding.
+        """
+        DynamicModel.objects.filter(pk=self.pk).update(attrs=self.attrs)
+
+    def import_data(self, max_import_records=None, csv_file=None,
+                    force=False, progress=None, dry_run=False, replace=None):
+        """
+        Import the source's data (see do_import for the arguments),
+        unless another process is already importing it. Imports hold
+        a per-source lock (see utils.locking), when it's taken we don't
+        wait for it and return a report with `locked` set instead.
+        Dry runs don't write anything, so they don't need the lock.
+        """
+        kwargs = dict(
+            max_import_records=max_import_records, csv_file=csv_file,
+            force=force, dry_run=dry_run, replace=replace,
+        )
+        if dry_run:
+            return self.do_import(progress=progress, **kwargs)
+
+        lock = ImportLock(self)
+        if not lock.acquire():
+            report = ImportReport([
+                "This data source is already being imported. Try again "
+                "once that import has finished."
+            ])
+            report.locked = True
+            return report
+        try:
+            return self.do_import(progress=lock.renewing(progress), **kwargs)
+        finally:
+            lock.release()
+
+    def do_import(self, max_import_records=None, csv_file=None,
+                  force=False, progress=None, dry_run=False, replace=None):
         """
         Perform a (re)import on a previously loaded model. This takes
         the loaded columns into account, ignoring any new columns that
         may exist in the spreadsheet.
+
+        Unless `force` is set, we first check whether the source has
+        changed since the last successful import (using HTTP ETag/
+        Last-Modified validators, the sheet's Drive modified time and
+        a digest of the fetched data, which are kept in the "source"
+        attr) and skip the import entirely if it hasn't.
+
+        Screendoor sources are synced incrementally: the "source" attr
+        also keeps the latest response update seen, and only responses
+        created or updated after it are fetched and upserted. A sync
+        cut short by `max_import_records` is picked up by the next ones
+        (see ScreendoorImporter.next_mark). `force` (or a replace) does
+        a full resync.
+
+        If given, `progress` is called with the current stage of the
+        import and the number of rows processed so far.
+
+        With `dry_run`, the source is always fetched and compared
+        against the existing records, but nothing is written (see
+        preview_records). The columns don't need to be saved for this,
+        so changes to them can be previewed before they're applied.
+
+        With `replace` (which defaults to whether the "refresh_mode" attr
+        is "replace") the source is loaded into a staging table which,
+        if the whole source loaded fine, is then swapped in for the
+        model's records in a single transaction (see replace_records).
+
+        Returns an ImportReport: a list of errors along with the counts
+        of inserted, updated and unchanged rows.
         """
         if not self.columns:
             logger.warn("Attempted to import source without columns. Baililng")
-            return [
+            return ImportReport([
                 "Data source hasn't been configured. Re-import this source " \
                 "using the confiruation wizard."
-            ]
+            ])
+
+        # what we knew about the source at the last successful import.
+        # a change to the columns/pipeline means we need to re-import
+        last_source = self.get_attr("source") or {}
+        config = columns_fingerprint(self)
+        if last_source.get("config") != config:
+            last_source = {}
+        if force or dry_run:
+            last_source = {}
+        source = {"config": config}
 
         creds_model = CredentialStore.objects.filter(
             name="csv_google_credentials"
         ).first()
 
+        if progress:
+            progress("fetching", 0)
+
         csv = None
         if self.csv_url and creds_model:
-            csv = PrivateSheetImporter(
-                creds_model.credentials
-            ).get_csv_from_url(
-                self.csv_url
-            )
+            importer = PrivateSheetImporter(creds_model.credentials)
+            modified = importer.get_modified_time(self.csv_url)
+            if modified and modified == last_source.get("modified"):
+                return self.skip_unchanged_import()
+            source["modified"] = modified
+            csv = SpooledCSV([importer.get_csv_from_url(self.csv_url)])
         elif self.csv_url:
             # NOTE: InvalidDimensions
-            csv = fetch_csv(self.csv_url)
+            csv, validators = fetch_csv_if_changed(
+                self.csv_url, validators=last_source.get("validators")
+            )
+            if csv is None:
+                return self.skip_unchanged_import()
+            source["validators"] = validators
         elif self.sd_api_key:
+            if replace is None:
+                replace = self.get_attr("refresh_mode") == "replace"
+            # only fetch the responses changed since the last sync, unless
+            # we're swapping in a full copy of the source
+            since = None
+            if not replace and not dry_run:
+                since = last_source.get("screendoor")
             importer = ScreendoorImporter(
                 api_key=self.sd_api_key,
                 max_import_records=max_import_records,
             )
-            csv = importer.build_csv(
-                self.sd_project_id, form_id=self.sd_form_id
-            )
+            csv = SpooledCSV([importer.build_csv(
+                self.sd_project_id, form_id=self.sd_form_id, since=since
+            )])
+            mark = importer.next_mark(since)
+            if mark:
+                source["screendoor"] = mark
         elif csv_file:
-            csv = csv_file.read().decode("utf-8")
+            csv = SpooledCSV(csv_file.chunks(chunk_size=CHUNK_SIZE))
         elif self.csv_file:
-            csv = self.csv_file.read().decode("utf-8")
+            self.csv_file.open("rb")
+            try:
+                csv = SpooledCSV(self.csv_file.chunks(chunk_size=CHUNK_SIZE))
+            finally:
+                self.csv_file.close()
         else:
             raise NotImplementedError("Invalid data source for %s" % self)
 
-        return import_records(csv, self.get_model(), self)
-
+        try:
+            source["digest"] = csv.digest
+            if source["digest"] == last_source.get("digest"):
+                return self.skip_unchanged_import()
+            if replace is None:
+                replace = self.get_attr("refresh_mode") == "replace"
+            if dry_run:
+                report = preview_records(
+                    csv, self.get_model(), self, progress=progress,
+                    PreviewModel=construct_preview_model(self),
+                )
+            elif replace:
+                report = replace_records(
+                    csv, self.get_model(), construct_staging_model(self),
+                    self, progress=progress
+                )
+            else:
+                report = import_records(
+                    csv, self.get_model(), self, progress=progress
+                )
+        finally:
+            csv.close()
+
+        if not dry_run:
+            self.attrs = self.attrs or {}
+            # rows the data pipeline failed on (e.g. redaction) have to
+            # go through it again, so the source can't look unchanged
+            if not report and not report.pipeline_failures:
+                self.attrs["source"] = source
+            # the source could be imported (errors in some rows aside),
+            # which brings a failing source back
+            self.attrs.pop("dead", None)
+            if self.attrs.get("schedule"):
+                self.attrs["schedule"]["failures"] = 0
+            self.save_attrs()
+        return report
+
+    def fetch_source_csv(self):
+        """
+        Fetch the current data of this source, as a SpooledCSV.
+        Unlike import_data, this always fetches the data.
+        """
+        creds_model = CredentialStore.objects.filter(
+            name="csv_google_credentials"
+        ).first()
+        if self.csv_url and creds_model:
+            importer = PrivateSheetImporter(creds_model.credentials)
+            return SpooledCSV([importer.get_csv_from_url(self.csv_url)])
+        elif self.csv_url:
+            csv, _ = fetch_csv_if_changed(self.csv_url)
+            return csv
+        elif self.sd_api_key:
+            importer = ScreendoorImporter(api_key=self.sd_api_key)
+            return SpooledCSV([importer.build_csv(
+                self.sd_project_id, form_id=self.sd_form_id
+            )])
+        elif self.csv_file:
+            self.csv_file.open("rb")
+            try:
+                return SpooledCSV(self.csv_file.chunks(chunk_size=CHUNK_SIZE))
+            finally:
+                self.csv_file.close()
+        raise NotImplementedError("Invalid data source for %s" % self)
+
+    def validate_source(self, progress=None):
+        """
+        Check all of the source data against the column types (which
+        are inferred from a sample of it when the source is added) and
+        store the contradicted columns in the "validation" attr. See
+        find_contradicted_columns for the format. Returns the list of
+        contradicted columns.
+        """
+        csv = self.fetch_source_csv()
+        try:
+            contradicted = find_contradicted_columns(
+                csv, self.columns, progress=progress
+            )
+        finally:
+            csv.close()
+        self.attrs = self.attrs or {}
+        self.attrs["validation"] = {
+            "schema_hash": self.schema_hash,
+            "columns": contradicted,
+        }
+        self.save_attrs()
+        return contradicted
+
+    def get_validation(self):
+        """
+        Return the contradicted columns found by the last validation
+        of this source, if it was done against the current columns.
+        """
+        validation = self.get_attr("validation") or {}
+        if validation.get("schema_hash") != self.schema_hash:
+            return []
+        return validation.get("columns", [])
+
+    def skip_unchanged_import(self):
+        logger.info("Source %s hasn't changed. Skipping import." % (
+            self.name
+        ))
+        report = ImportReport()
+        report.skipped = True
+        return report
 
     def make_token(self):
         return random_token(16)
@@ -307,12 +547,8 @@ class DynamicModel(models.Model):
         except LookupError:
             OldModel = None
 
-        # TODO: for some reason force_new=True (removed now, but forces re-
-        # creation of the model class) makes the model show up multiple
-        # times in the admin. but setting this to False makes the meta
-        # schema migrations not work properly w/o restarting the system.
-        # I need to fix this, along with custom meta in general, but for
-        # now we need to reinstate sane working defaults.
+        # this rebuilds the model class if the columns have changed
+        # (replacing the old class in the registry and admin)
         NewModel = construct_model(self)
         new_desc = self
         ModelSchemaEditor(OldModel).update_table(NewModel)
@@ -323,6 +559,9 @@ class DynamicModel(models.Model):
             old_field = self.find_old_field(OldModel, new_field)
             if old_field:
                 FieldSchemaEditor(old_field).update_column(NewModel, new_field)
+            elif OldModel:
+                # a column was added to an existing table
+                FieldSchemaEditor().update_column(NewModel, new_field)
 
     def model_cleanup(self):
         create_models()
@@ -334,9 +573,12 @@ class DynamicModel(models.Model):
 
     def save(self, **kwargs):
         self.name = slugify(self.name)
+        self.schema_hash = self.get_schema_hash()
         super().save(**kwargs)
         self.do_migrations()
         self.model_cleanup()
+        # let other processes know they need to rebuild
+        SchemaGeneration.bump()
         for fn in self._POST_SAVE_SIGNALS:
             fn(self)
 
@@ -352,6 +594,7 @@ class DynamicModel(models.Model):
 
         # finally kill the row
         super().delete(**kwargs)
+        BUILT_SCHEMAS.pop(self.name, None)
 
         # delete it from the django app registry
         try:
@@ -365,6 +608,279 @@ class DynamicModel(models.Model):
         except admin.sites.NotRegistered:
             pass
 
+        SchemaGeneration.bump()
+
+
+class SchemaGeneration(models.Model):
+    """
+    A single-row counter which gets bumped every time a DynamicModel
+    is saved or deleted. Each process compares this against the
+    generation it last built its models and admins from, so that
+    they only get rebuilt when something has actually changed (see
+    apps.check_apps_need_reloading).
+    """
+    generation = models.BigIntegerField(default=0)
+
+    @classmethod
+    def current(cls):
+        generation = cls.objects.filter(pk=1).values_list(
+            "generation", flat=True
+        ).first()
+        return generation or 0
+
+    @classmethod
+    def bump(cls):
+        updated = cls.objects.filter(pk=1).update(
+            generation=F("generation") + 1
+        )
+        if not updated:
+            cls.objects.get_or_create(pk=1, defaults={"generation": 1})
+
+
+class RecordFingerprint(models.Model):
+    """
+    A hash of the values a record had when it was last imported. We
+    use this to skip rows that haven't changed during re-imports.
+    """
+    dynmodel = models.ForeignKey(
+        DynamicModel, on_delete=models.CASCADE,
+        related_name="fingerprints",
+    )
+    # primary key of the imported record (as a string, so we
+    # don't depend on the type of the source ID)
+    record_id = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=40)
+
+    class Meta:
+        unique_together = (("dynmodel", "record_id"),)
+
+
+class SourceLock(models.Model):
+    """
+    A lease on importing a data source, so that only one process
+    imports it at a time. This is only used on databases without
+    advisory locks (see utils.locking).
+    """
+    dynmodel = models.OneToOneField(
+        DynamicModel, on_delete=models.CASCADE,
+        related_name="source_lock",
+    )
+    # random token identifying whoever holds the lock
+    holder = models.CharField(max_length=64)
+    # the lock can be taken over after this, in case its holder died
+    expires = models.DateTimeField()
+
+
+class ImportJob(models.Model):
+    """
+    A queued import of a data source. These are ran by the
+    process_import_jobs management command (which the clock process
+    runs) so that large imports don't need to fit inside, and time
+    out, a web request. The wizard polls the job for progress.
+
+    Jobs can also validate a new source's data against its inferred
+    column types, instead of importing it (see
+    DynamicModel.validate_source).
+    """
+    IMPORT = "import"
+    VALIDATE = "validate"
+    KINDS = (
+        (IMPORT, _("Import")),
+        (VALIDATE, _("Validate")),
+    )
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (QUEUED, _("Queued")),
+        (RUNNING, _("Running")),
+        (DONE, _("Done")),
+        (FAILED, _("Failed")),
+    )
+
+    dynmodel = models.ForeignKey(
+        DynamicModel, on_delete=models.CASCADE,
+        related_name="import_jobs",
+    )
+    kind = models.CharField(max_length=16, choices=KINDS, default=IMPORT)
+    status = models.CharField(
+        max_length=16, choices=STATUSES, default=QUEUED, db_index=True,
+    )
+    # what the import is currently doing (fetching, importing, etc)
+    stage = models.CharField(max_length=64, blank=True, default="")
+    rows_processed = models.IntegerField(default=0)
+    errors = JSONField(default=list, blank=True)
+    # a CSV uploaded to update a file-based data source
+    csv_file = models.FileField(upload_to="csv_uploads/jobs/", blank=True)
+    # passed along to DynamicModel.import_data
+    force = models.BooleanField(default=False)
+
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("created",)
+
+    def __str__(self):
+        return "%s of %s (%s)" % (
+            self.get_kind_display(), self.dynmodel.name, self.status
+        )
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    @classmethod
+    def lease_cutoff(cls):
+        """
+        Jobs still running since before this time (the import lock's
+        lease ago) are taken to have died with their worker, e.g. on a
+        dyno restart.
+        """
+        lease = get_setting("CSV_MODELS_IMPORT_LOCK_LEASE", 60 * 60)
+        return timezone.now() - timedelta(seconds=lease)
+
+    @classmethod
+    def find_active(cls, dynmodel, kind=IMPORT):
+        """
+        Return the source's queued or (not expired, see lease_cutoff)
+        running job of the given kind, if there is one.
+        """
+        return cls.objects.filter(
+            Q(status=cls.QUEUED) |
+            Q(status=cls.RUNNING, started__gt=cls.lease_cutoff()),
+            dynmodel=dynmodel, kind=kind,
+        ).order_by("created").first()
+
+    @classmethod
+    def enqueue(cls, dynmodel, csv_file=None, force=False, kind=IMPORT):
+        """
+        Queue up a job. If the source already has a queued or running
+        job of the same kind, that one is returned instead, so callers
+        can follow its progress (unless there's a new CSV to import).
+        """
+        if not csv_file:
+            job = cls.find_active(dynmodel, kind=kind)
+            if job:
+                return job
+        job = cls(dynmodel=dynmodel, force=force, kind=kind)
+        if csv_file:
+            job.csv_file.save(csv_file.name, csv_file, save=False)
+        job.save()
+        return job
+
+    @classmethod
+    def claim_next(cls):
+        """
+        Find the oldest queued job and mark it as running. Jobs of
+        sources that already have a job running (for less than the
+        import lock's lease) wait their turn, jobs running for longer
+        than that are marked as failed. Claiming is done with a
+        conditional update, so if multiple workers race for the same
+        job only one of them gets it. Returns None if there are no
+        jobs waiting.
+        """
+        cutoff = cls.lease_cutoff()
+        cls.objects.filter(
+            status=cls.RUNNING, started__lte=cutoff,
+        ).update(
+            status=cls.FAILED, stage="", finished=timezone.now(),
+            errors=["The import stopped without finishing"],
+        )
+        busy = cls.objects.filter(
+            status=cls.RUNNING, started__gt=cutoff,
+        ).values("dynmodel")
+        queued = cls.objects.filter(status=cls.QUEUED).exclude(
+            dynmodel__in=busy
+        )
+        for job in queued[:10]:
+            claimed = cls.objects.filter(
+                pk=job.pk, status=cls.QUEUED
+            ).update(status=cls.RUNNING, started=timezone.now())
+            if claimed:
+                job.refresh_from_db()
+                return job
+
+    def update_progress(self, stage, rows_processed):
+        self.stage = stage
+        self.rows_processed = rows_processed
+        ImportJob.objects.filter(pk=self.pk).update(
+            stage=stage, rows_processed=rows_processed,
+        )
+
+    def finish(self, errors):
+        """
+        Record the outcome of this job and delete its uploaded CSV,
+        if it had one. Returns the errors.
+        """
+        if self.csv_file:
+            self.csv_file.delete(save=False)
+        self.errors = [str(e) for e in errors]
+        self.status = self.FAILED if errors else self.DONE
+        self.stage = ""
+        self.finished = timezone.now()
+        self.save()
+        return errors
+
+    def run(self):
+        """
+        Run the import (or validation) and record the outcome on
+        this job. The source's model class is rebuilt first if it's
+        missing or out of date in this process.
+        """
+        # the process running jobs (e.g. the clock) only builds its
+        # model classes once, the source may have been added or
+        # refined since by another one
+        construct_model(self.dynmodel)
+        if self.kind == self.VALIDATE:
+            return self.run_validation()
+
+        dynmodel = self.dynmodel
+        csv_file = None
+        try:
+            if self.csv_file:
+                self.csv_file.open("rb")
+                csv_file = self.csv_file
+            errors = dynmodel.import_data(
+                csv_file=csv_file, force=self.force,
+                progress=self.update_progress,
+            )
+            if not errors:
+                # this will re-run the admin setup and build up
+                # the related fields properly
+                self.update_progress("finishing", self.rows_processed)
+                dynmodel.save()
+        except Exception as e:
+            logger.error("Import job %s failed: %s" % (self.pk, e))
+            errors = [getattr(e, "MESSAGE", None) or str(e)]
+        finally:
+            if csv_file:
+                csv_file.close()
+
+        return self.finish(errors)
+
+    def run_validation(self):
+        """
+        Check the source data against the inferred column types. Type
+        contradictions are stored on the data source, not treated as
+        errors of this job.
+        """
+        errors = []
+        try:
+            self.dynmodel.validate_source(progress=self.update_progress)
+        except Exception as e:
+            logger.error("Validation job %s failed: %s" % (self.pk, e))
+            errors = [getattr(e, "MESSAGE", None) or str(e)]
+
+        return self.finish(errors)
+
+
+# Schema hashes of the model classes this process has built, by name
+BUILT_SCHEMAS = {}
+
 
 def verbose_namer(name, make_friendly=False):
     """
@@ -432,7 +948,8 @@ def create_model_attrs(dynmodel):
         og_column_name = column.get("original_name")
         column_type = column.get("type")
         column_args = column.get("args", [])
-        column_attrs = column.get("attrs", {})
+        # copy, so building the model doesn't change the description
+        column_attrs = dict(column.get("attrs", {}))
 
         if not column_name or not column_type:
             continue
@@ -469,17 +986,41 @@ def create_model_attrs(dynmodel):
     return attrs
 
 
+def has_stale_relations(Model):
+    """
+    Check whether any of a model's foreign keys point at one of our
+    model classes that has since been rebuilt.
+    """
+    these_models = apps.all_models["django_models_from_csv"]
+    for field in Model._meta.fields:
+        Related = field.related_model
+        if not isinstance(Related, type):
+            continue
+        if Related._meta.app_label != "django_models_from_csv":
+            continue
+        current = these_models.get(Related._meta.model_name)
+        if current is not None and current is not Related:
+            return True
+    return False
+
+
 def construct_model(dynmodel):
     """
     This creates the model instance from a dynamic model description record.
+
+    Model classes are only rebuilt when the description has changed
+    since they were built (or a model they relate to has been rebuilt),
+    otherwise the currently registered class is returned.
     """
     model_name = dynmodel.name
     _model = dynmodel.get_model()
+    schema_hash = dynmodel.get_schema_hash()
 
     if not hasattr(sys.modules[__name__], model_name):
         setattr(sys.modules[__name__], model_name, _model)
 
-    if _model:
+    if _model and BUILT_SCHEMAS.get(model_name) == schema_hash and \
+       not has_stale_relations(_model):
         return _model
 
     attrs = create_model_attrs(dynmodel)
@@ -495,7 +1036,80 @@ def construct_model(dynmodel):
             "WARNING: skipping model: %s. not enough columns" % dynmodel.name)
         return
 
-    return type(model_name, (models.Model,), attrs)
+    if _model:
+        logger.info("Rebuilding model: %s" % model_name)
+        # take the old class out of the registry (and admin) so the new
+        # one can take its place, instead of showing up twice
+        try:
+            admin.site.unregister(_model)
+        except admin.sites.NotRegistered:
+            pass
+        del apps.all_models["django_models_from_csv"][_model._meta.model_name]
+        apps.clear_cache()
+
+    _model = type(model_name, (models.Model,), attrs)
+    setattr(sys.modules[__name__], model_name, _model)
+    BUILT_SCHEMAS[model_name] = schema_hash
+    return _model
+
+
+def construct_unregistered_model(dynmodel, model_name, db_table):
+    """
+    Build a model class from the dynamic model's (current, possibly
+    unsaved) columns, backed by the given table. The class is kept in
+    a registry of its own, not the app registry, so it can't take the
+    place of a source's model (or be seen by other threads). The models
+    its relations point to are looked up in the app registry.
+    """
+    attrs = create_model_attrs(dynmodel)
+    if not attrs:
+        return None
+    # don't add reverse relations to the models the relations point to,
+    # they'd take the place of the ones to this dynamic model's model
+    for field in attrs.values():
+        if isinstance(field, models.ForeignKey):
+            field.remote_field.related_name = "+"
+    registry = Apps()
+    attrs["__module__"] = "django_models_from_csv.models.%s" % model_name
+    attrs["Meta"] = type("Meta", (), dict(
+        managed=False,
+        db_table=db_table,
+        apps=registry,
+    ))
+    UnregisteredModel = type(model_name, (models.Model,), attrs)
+    # resolve the relations, which wait on their models being registered
+    while registry._pending_operations:
+        app_label, name = next(iter(registry._pending_operations))
+        registry.register_model(app_label, apps.get_model(app_label, name))
+    return UnregisteredModel
+
+
+def construct_staging_model(dynmodel):
+    """
+    Build a model class with the same fields as the dynamic model's,
+    backed by a separate staging table (the model's table name with
+    a "_staging" suffix), for loading a fresh copy of its source into.
+    The class isn't kept in the app registry.
+    """
+    Model = dynmodel.get_model()
+    return construct_unregistered_model(
+        dynmodel, "%sstaging" % dynmodel.name,
+        "%s_staging" % Model._meta.db_table,
+    )
+
+
+def construct_preview_model(dynmodel):
+    """
+    Build a model class with the fields the dynamic model's columns
+    describe, even if they haven't been saved (and the table altered)
+    yet, for previewing an import with them. It's backed by the
+    model's table but only its field definitions are meant to be used.
+    The class isn't kept in the app registry.
+    """
+    Model = dynmodel.get_model()
+    return construct_unregistered_model(
+        dynmodel, "%spreview" % dynmodel.name, Model._meta.db_table,
+    )
 
 
 def create_models():
@@ -503,7 +1117,9 @@ def create_models():
     Build & register models from the DynamicModel descriptions found
     in our database.
     """
-    for dynmodel in DynamicModel.objects.all():
+    # in creation order, so models get rebuilt before the models
+    # with foreign keys to them (e.g., metadata models)
+    for dynmodel in DynamicModel.objects.order_by("id"):
         model_name = dynmodel.name
         _model = construct_model(dynmodel)
         if not _model:
@@ -69,9 +69,11 @@ class FieldSchemaEditor:
 
     def has_changed(self, field):
         """
-        Check if the field schema has changed.
+        Check if the field schema has changed. Fields are compared by
+        their definitions, since the model class (and so the field
+        instances) get rebuilt when a model's columns change.
         """
-        return self.initial_field != field
+        return self.initial_field.deconstruct()[1:] != field.deconstruct()[1:]
 
     def add_column(self, model, field):
         """
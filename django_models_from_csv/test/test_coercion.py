@@ -0,0 +1,123 @@
+from timeit import repeat
+
+from django.test import SimpleTestCase
+
+from django_models_from_csv.models import DynamicModel
+from django_models_from_csv.utils.coercion import (
+    coerce_batch, get_column_coercers, number_coercer, to_float,
+)
+from django_models_from_csv.utils.common import chunked
+from django_models_from_csv.utils.importing import import_records
+
+
+class ColumnCoercionTestCase(SimpleTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.sheet = DynamicModel.objects.create(
+            name="CoercionSheet",
+            csv_url="fake.url/to/sheet",
+            columns=[{
+                "name": "amount",
+                "type": "number",
+                "attrs": {"blank": True, "null": True},
+            }, {
+                "name": "count",
+                "type": "integer",
+                "attrs": {"blank": True, "null": True},
+            }, {
+                "name": "when",
+                "type": "date",
+                "attrs": {"blank": True, "null": True},
+            }, {
+                "name": "what",
+                "type": "text",
+            }]
+        )
+        self.sheet.save()
+        self.headers = ["amount", "count", "when", "what"]
+
+    def tearDown(self):
+        self.sheet.get_model().objects.all().delete()
+        self.sheet.delete()
+
+    def test_can_coerce_batch_by_columns(self):
+        coercers, types = get_column_coercers(self.headers, self.sheet)
+        errors = []
+        rows = coerce_batch([
+            ["$1,200.50", "3", "4/8/2019", "one"],
+            ["", "1.0", "", "two"],
+            ["n/a", "2.5", "not a date", "three"],
+        ], self.headers, coercers, types, first_row_number=10, errors=errors)
+        self.assertEqual(rows[0], [1200.5, 3, "2019-04-08", "one"])
+        self.assertEqual(rows[1], [None, 1, None, "two"])
+        self.assertEqual(rows[2], [None, None, None, "three"])
+        self.assertEqual(
+            [(e.row, e.column, e.value) for e in errors],
+            [(12, "amount", "n/a"), (12, "count", "2.5"),
+             (12, "when", "not a date")]
+        )
+        self.assertEqual(
+            str(errors[0]), "Row: 12, Column: amount, Error converting "
+            "'n/a' to number"
+        )
+
+    def test_number_columns_with_odd_values(self):
+        coerce = number_coercer(to_float, float)
+        self.assertEqual(
+            coerce(["1", " ", "$2", "x", "3,000"]),
+            ([1.0, None, 2.0, None, 3000.0], [3])
+        )
+        # a value spanning lines can't be cleaned as part of the column
+        self.assertEqual(coerce(["$1\n", "2"]), ([1.0, 2.0], []))
+
+    def test_number_coercion_beats_cleaning_by_row(self):
+        # cleaning each value of a row with its column's converter is
+        # all the import used to do for number columns. converting
+        # whole columns has to be faster than that
+        rows = [
+            ["$%s,%03d.%02d" % (i, i % 1000, i % 100)] * 10
+            for i in range(10000)
+        ]
+        headers = ["amount"] * 10
+        coercers = [number_coercer(to_float, float) for _ in headers]
+
+        def to_number(val):
+            if not val.strip():
+                return None
+            return val.replace("$", "").replace(",", "").strip()
+        converters = [to_number] * len(headers)
+
+        def by_row():
+            for row in rows:
+                [convert(val) for convert, val in zip(converters, row)]
+
+        def by_column():
+            for batch in chunked(rows, 500):
+                coerce_batch(batch, headers, coercers, ["number"] * 10)
+
+        self.assertLess(
+            min(repeat(by_column, number=1, repeat=5)),
+            min(repeat(by_row, number=1, repeat=5)),
+        )
+
+    def test_import_warns_about_values_it_cant_convert(self):
+        csv = (
+            "amount,count,when,what\n"
+            "1,2,2019-01-01,ok\n"
+            "bad,2,2019-01-01,bad amount\n"
+            "3,4,bad,bad date\n"
+        )
+        Model = self.sheet.get_model()
+        report = import_records(csv, Model, self.sheet, batch_size=2)
+        self.assertEqual(
+            [(e.row, e.column) for e in report.warnings],
+            [(2, "amount"), (3, "when")]
+        )
+        self.assertEqual(report.failed_rows, 2)
+        # these don't fail the import
+        self.assertTrue(not report)
+        self.assertIn("warnings: 2", report.summary())
+        # the rest of the row is still imported
+        self.assertEqual(Model.objects.count(), 3)
+        self.assertIsNone(Model.objects.get(id=2).amount)
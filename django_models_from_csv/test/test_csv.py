@@ -1,7 +1,12 @@
+from unittest.mock import patch, Mock
+
 from django.test import TestCase
+import requests
 
+from django_models_from_csv.exceptions import BadCSVError
 from django_models_from_csv.utils.csv import (
-    extract_key_from_csv_url
+    SpooledCSV, decode_chunks, extract_key_from_csv_url,
+    fetch_csv_if_changed, fetch_csv_sample, iter_lines,
 )
 
 
@@ -12,3 +17,85 @@ class FetchCSVTestCase(TestCase):
     def test_can_extract_key_from_csv_url(self):
         key = extract_key_from_csv_url(self.csv_url)
         self.assertEqual(key, "18I8_so8_lCWEQLZ8LsBfOgz_SRRSIokZ06duc")
+
+    @patch.object(requests.Session, "get")
+    def test_conditional_fetch_returns_none_when_not_modified(self, mockget):
+        mockresponse = Mock()
+        mockresponse.status_code = 304
+        mockget.return_value = mockresponse
+        validators = {"etag": "\"abc\"", "last_modified": None}
+        csv, new_validators = fetch_csv_if_changed(
+            "https://fake.tld/data.csv", validators=validators
+        )
+        self.assertIsNone(csv)
+        self.assertEqual(new_validators, validators)
+        headers = mockget.call_args[1]["headers"]
+        self.assertEqual(headers["If-None-Match"], "\"abc\"")
+        self.assertTrue("If-Modified-Since" not in headers)
+
+    @patch.object(requests.Session, "get")
+    def test_conditional_fetch_returns_new_validators(self, mockget):
+        mockresponse = Mock()
+        mockresponse.status_code = 200
+        mockresponse.iter_content.return_value = [b"a,b\n", b"1,2\n"]
+        mockresponse.headers = {"ETag": "xyz"}
+        mockget.return_value = mockresponse
+        csv, validators = fetch_csv_if_changed("https://fake.tld/data.csv")
+        self.assertEqual(list(csv), ["a,b\n", "1,2\n"])
+        self.assertEqual(validators["etag"], "xyz")
+
+    @patch.object(requests.Session, "get")
+    def test_sample_fetch_stops_after_max_rows(self, mockget):
+        chunks = [b"a,\"b,\nc\"\r", b"\n1,\"two\nlines\"\r\n2,x\n"]
+        chunks += [b"%d,y\n" % i for i in range(3, 1000)]
+        mockresponse = Mock()
+        mockresponse.status_code = 200
+        mockresponse.iter_content.return_value = iter(chunks)
+        mockresponse.headers = {}
+        mockget.return_value = mockresponse
+        csv = fetch_csv_sample("https://fake.tld/data.csv", max_rows=2)
+        # headers are cleaned, multi-line values are kept whole
+        self.assertEqual(
+            "".join(csv), "a,bc\r\n1,\"two\nlines\"\r\n2,x\r\n"
+        )
+        # the rest of the response wasn't read
+        self.assertEqual(len(list(mockresponse.iter_content.return_value)),
+                         997)
+        mockresponse.close.assert_called_once_with()
+
+    def test_iter_lines_splits_across_chunks(self):
+        chunks = [b"a,b\r", b"\nc,\xc3", b"\xa9\rd", b",e"]
+        self.assertEqual(
+            list(iter_lines(chunks)), ["a,b\r\n", "c,\u00e9\r", "d,e"]
+        )
+
+    @patch.object(requests.Session, "get")
+    def test_fetch_raises_on_error_status(self, mockget):
+        mockresponse = Mock()
+        mockresponse.status_code = 404
+        mockresponse.iter_content.return_value = [b"<p>Not found</p>"]
+        mockget.return_value = mockresponse
+        with self.assertRaises(BadCSVError):
+            fetch_csv_if_changed("https://fake.tld/data.csv")
+        with self.assertRaises(BadCSVError):
+            fetch_csv_sample("https://fake.tld/data.csv")
+        self.assertFalse(mockresponse.iter_content.called)
+
+    @patch.object(requests.Session, "get")
+    def test_fetch_uses_declared_charset(self, mockget):
+        mockresponse = Mock()
+        mockresponse.status_code = 200
+        mockresponse.iter_content.return_value = [b"a,b\n\xe9,\xef\n"]
+        mockresponse.headers = {"Content-Type": "text/csv; charset=latin-1"}
+        mockget.return_value = mockresponse
+        csv, _ = fetch_csv_if_changed("https://fake.tld/data.csv")
+        self.assertEqual("".join(csv), "a,b\n\u00e9,\u00ef\n")
+
+    def test_undeclared_encoding_falls_back_from_utf8(self):
+        chunks = [b"a,\xc3", b"\xa9\n", b"caf\xe9\n"]
+        self.assertEqual(
+            "".join(decode_chunks(chunks)), "a,\u00e9\ncaf\u00e9\n"
+        )
+        # uploads are decoded the same way
+        csv = SpooledCSV([b"name\n", b"Fran\xe7ois\n"])
+        self.assertEqual("".join(csv), "name\nFran\u00e7ois\n")
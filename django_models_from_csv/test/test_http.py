@@ -0,0 +1,68 @@
+from unittest.mock import patch, Mock
+
+from django.test import SimpleTestCase
+import requests
+
+from django_models_from_csv.utils.http import (
+    fetch, get_session, iter_chunks, retry_delay,
+)
+
+
+def make_response(status_code, headers=None):
+    response = Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+
+@patch("django_models_from_csv.utils.http.time.sleep")
+@patch.object(requests.Session, "get")
+class FetchTestCase(SimpleTestCase):
+    def test_retries_server_errors(self, mockget, sleep):
+        ok = make_response(200)
+        mockget.side_effect = [
+            make_response(503), make_response(429), ok
+        ]
+        self.assertIs(fetch("https://fake.tld/data.csv"), ok)
+        self.assertEqual(mockget.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+        # every request has (connect, read) timeouts
+        self.assertEqual(len(mockget.call_args[1]["timeout"]), 2)
+
+    def test_gives_up_after_retries(self, mockget, sleep):
+        mockget.return_value = make_response(500)
+        response = fetch("https://fake.tld/data.csv", retries=2)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(mockget.call_count, 3)
+
+    def test_doesnt_retry_client_errors(self, mockget, sleep):
+        mockget.return_value = make_response(404)
+        self.assertEqual(fetch("https://fake.tld/data.csv").status_code, 404)
+        self.assertEqual(mockget.call_count, 1)
+        self.assertFalse(sleep.called)
+
+    def test_retries_connection_errors(self, mockget, sleep):
+        mockget.side_effect = requests.ConnectionError("nope")
+        with self.assertRaises(requests.ConnectionError):
+            fetch("https://fake.tld/data.csv", retries=1)
+        self.assertEqual(mockget.call_count, 2)
+
+    def test_backoff(self, mockget, sleep):
+        for attempt in range(5):
+            self.assertLessEqual(retry_delay(attempt), 2 ** attempt)
+        self.assertEqual(
+            retry_delay(0, response=make_response(429, {"Retry-After": "7"})),
+            7
+        )
+
+    def test_session_is_reused_and_streams(self, mockget, sleep):
+        self.assertIs(get_session(), get_session())
+        response = make_response(200)
+        response.iter_content.return_value = [b"a,b\n", b"1,2\n"]
+        mockget.return_value = response
+        chunks = iter_chunks(
+            fetch("https://fake.tld/data.csv", stream=True), 1024
+        )
+        self.assertEqual(list(chunks), [b"a,b\n", b"1,2\n"])
+        self.assertTrue(mockget.call_args[1]["stream"])
+        self.assertTrue(response.close.called)
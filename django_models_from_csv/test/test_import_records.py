@@ -1,10 +1,24 @@
+from datetime import timedelta
+import os
+from unittest.mock import patch
+
+from django.apps import apps
+from django.core.files.base import ContentFile
 from django.db import connection
 from django.test import SimpleTestCase
+from django.utils import timezone
 
-from django_models_from_csv.models import DynamicModel
+from django_models_from_csv.models import (
+    BUILT_SCHEMAS, DynamicModel, ImportJob, SourceLock,
+)
+from django_models_from_csv.utils.csv import SpooledCSV
+from django_models_from_csv.utils.coercion import (
+    DATETIME_FORMATS, make_datetime_converter,
+)
 from django_models_from_csv.utils.importing import (
-    import_records, import_records_list
+    import_records, import_records_list, iter_import_rows, preview_records
 )
+from django_models_from_csv.utils.locking import ImportLock
 
 
 class ImportRecordsTestCase(SimpleTestCase):
@@ -104,3 +118,362 @@ class ImportRecordsTestCase(SimpleTestCase):
         self.assertEqual(len(objects), 2)
         self.assertTrue(objects[0].where.endswith("2"))
         self.assertTrue(objects[1].where.endswith("2"))
+
+    def test_bad_row_doesnt_fail_whole_batch(self):
+        Model = self.sheet.get_model()
+        csv = """when,where
+2019-04-23 15:06:51 UTC,seattle
+,nowhere
+4/23/2019 3:06pm PST,olympia
+"""
+        errors = import_records(csv, Model, self.sheet, batch_size=2)
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith("Row: 2,"))
+        self.assertEqual(Model.objects.count(), 2)
+
+    def test_reimport_skips_unchanged_rows(self):
+        Model = self.sheet.get_model()
+        report = import_records(self.date_csv, Model, self.sheet)
+        self.assertEqual(report.inserted, 2)
+        self.assertEqual(report.unchanged, 0)
+        changed_csv = self.date_csv.replace("olympia2", "tacoma")
+        report = import_records(changed_csv, Model, self.sheet)
+        self.assertTrue(not report)
+        self.assertEqual(report.inserted, 0)
+        self.assertEqual(report.updated, 1)
+        self.assertEqual(report.unchanged, 1)
+        self.assertEqual(Model.objects.get(pk=2).where, "tacoma")
+
+    def test_reimport_restores_deleted_unchanged_rows(self):
+        Model = self.sheet.get_model()
+        import_records(self.date_csv, Model, self.sheet)
+        Model.objects.filter(pk=1).delete()
+        report = import_records(self.date_csv, Model, self.sheet)
+        self.assertEqual(report.inserted, 1)
+        self.assertEqual(report.unchanged, 1)
+        self.assertEqual(Model.objects.count(), 2)
+
+    @patch("django_models_from_csv.models.fetch_csv_if_changed")
+    def test_import_data_skips_unchanged_source(self, fetch_csv):
+        fetch_csv.return_value = (
+            SpooledCSV([self.date_csv]), {"etag": "abc"}
+        )
+        report = self.sheet.import_data()
+        self.assertFalse(report.skipped)
+        self.assertEqual(report.inserted, 2)
+        # same data, different (or missing) validators
+        fetch_csv.return_value = (SpooledCSV([self.date_csv]), {})
+        report = self.sheet.import_data()
+        self.assertTrue(report.skipped)
+        # the stored validators get sent along with the next fetch
+        self.assertEqual(
+            fetch_csv.call_args[1]["validators"], {"etag": "abc"}
+        )
+        # forced imports always run
+        fetch_csv.return_value = (SpooledCSV([self.date_csv]), {})
+        report = self.sheet.import_data(force=True)
+        self.assertFalse(report.skipped)
+        self.assertEqual(report.unchanged, 2)
+
+    @patch("collaborative.data_pipeline.google_redactor.get_redactor")
+    @patch("django_models_from_csv.models.fetch_csv_if_changed")
+    def test_rows_failing_redaction_are_retried(self, fetch_csv,
+                                                get_redactor):
+        # redaction failed on the first row
+        get_redactor.return_value.redact_rows.return_value = [0]
+        fetch_csv.return_value = (SpooledCSV([self.date_csv]), {})
+        report = self.sheet.import_data()
+        self.assertTrue(not report)
+        self.assertEqual(report.inserted, 2)
+        self.assertEqual(report.pipeline_failures, 1)
+        self.assertEqual(self.sheet.fingerprints.count(), 1)
+        self.sheet.refresh_from_db()
+        self.assertIsNone(self.sheet.get_attr("source"))
+        # so the next import doesn't skip the source or that row
+        get_redactor.return_value.redact_rows.return_value = []
+        fetch_csv.return_value = (SpooledCSV([self.date_csv]), {})
+        report = self.sheet.import_data()
+        self.assertFalse(report.skipped)
+        self.assertEqual(report.updated, 1)
+        self.assertEqual(report.unchanged, 1)
+        self.assertEqual(self.sheet.fingerprints.count(), 2)
+
+    @patch("django_models_from_csv.models.fetch_csv_if_changed")
+    def test_import_data_skips_not_modified_source(self, fetch_csv):
+        fetch_csv.return_value = (None, {"etag": "abc"})
+        report = self.sheet.import_data()
+        self.assertTrue(report.skipped)
+        self.assertEqual(self.sheet.get_model().objects.count(), 0)
+
+    @patch("django_models_from_csv.models.fetch_csv_if_changed")
+    def test_import_job_runs_and_reports_progress(self, fetch_csv):
+        fetch_csv.return_value = (SpooledCSV([self.date_csv]), {})
+        job = ImportJob.enqueue(self.sheet, force=True)
+        self.assertEqual(job.status, ImportJob.QUEUED)
+        claimed = ImportJob.claim_next()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, ImportJob.RUNNING)
+        # already claimed jobs can't be picked up by another worker
+        self.assertIsNone(ImportJob.claim_next())
+        errors = claimed.run()
+        self.assertTrue(not errors)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual(job.rows_processed, 2)
+        self.assertIsNotNone(job.finished)
+        self.assertEqual(self.sheet.get_model().objects.count(), 2)
+
+    @patch("django_models_from_csv.models.fetch_csv_if_changed")
+    def test_import_job_rebuilds_stale_model(self, fetch_csv):
+        OldModel = self.sheet.get_model()
+        old_hash = BUILT_SCHEMAS[self.sheet.name]
+        self.sheet.columns = self.sheet.columns + [{
+            "name": "who", "type": "text",
+        }]
+        self.sheet.save()
+        # as if this process built its classes before the change
+        apps.all_models["django_models_from_csv"][
+            OldModel._meta.model_name
+        ] = OldModel
+        BUILT_SCHEMAS[self.sheet.name] = old_hash
+        apps.clear_cache()
+        self.assertIs(self.sheet.get_model(), OldModel)
+
+        csv = "when,where,who\n2019-04-23 15:06:51,seattle,me\n"
+        fetch_csv.return_value = (SpooledCSV([csv]), {})
+        job = ImportJob.enqueue(self.sheet, force=True)
+        errors = ImportJob.objects.get(pk=job.pk).run()
+        self.assertTrue(not errors)
+        Model = self.sheet.get_model()
+        self.assertIsNot(Model, OldModel)
+        self.assertEqual(Model.objects.get().who, "me")
+
+    @patch("django_models_from_csv.models.fetch_csv_if_changed")
+    def test_import_job_deletes_its_upload(self, fetch_csv):
+        fetch_csv.return_value = (SpooledCSV([self.date_csv]), {})
+        upload = ContentFile(self.date_csv.encode("utf-8"), name="up.csv")
+        job = ImportJob.enqueue(self.sheet, csv_file=upload, force=True)
+        path = job.csv_file.path
+        self.assertTrue(os.path.exists(path))
+        errors = ImportJob.claim_next().run()
+        self.assertTrue(not errors)
+        job.refresh_from_db()
+        self.assertFalse(job.csv_file)
+        self.assertFalse(os.path.exists(path))
+
+    @patch("django_models_from_csv.models.fetch_csv_if_changed")
+    def test_validation_job_reports_contradicted_columns(self, fetch_csv):
+        csv = self.date_csv + "not a date,tacoma\n"
+        fetch_csv.return_value = (SpooledCSV([csv]), {})
+        job = ImportJob.enqueue(self.sheet, kind=ImportJob.VALIDATE)
+        errors = ImportJob.claim_next().run()
+        self.assertTrue(not errors)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual(job.rows_processed, 3)
+        # nothing gets imported by a validation
+        self.assertEqual(self.sheet.get_model().objects.count(), 0)
+        self.sheet.refresh_from_db()
+        contradicted = self.sheet.get_validation()
+        self.assertEqual(len(contradicted), 1)
+        self.assertEqual(contradicted[0]["name"], "when")
+        self.assertEqual(contradicted[0]["examples"], [{
+            "row": 3, "value": "not a date",
+        }])
+
+    @patch("django_models_from_csv.models.fetch_csv_if_changed")
+    def test_import_skips_source_being_imported(self, fetch_csv):
+        fetch_csv.return_value = (SpooledCSV([self.date_csv]), {})
+        lock = ImportLock(self.sheet)
+        self.assertTrue(lock.acquire())
+        self.assertFalse(ImportLock(self.sheet).acquire())
+        report = self.sheet.import_data()
+        self.assertTrue(report.locked)
+        self.assertEqual(len(report), 1)
+        self.assertFalse(fetch_csv.called)
+        lock.release()
+        report = self.sheet.import_data()
+        self.assertFalse(report.locked)
+        self.assertEqual(report.inserted, 2)
+        # the lock is released afterwards
+        self.assertFalse(SourceLock.objects.filter(
+            dynmodel=self.sheet
+        ).exists())
+
+    def test_expired_import_lock_can_be_taken_over(self):
+        lock = ImportLock(self.sheet, lease=60)
+        self.assertTrue(lock.acquire())
+        SourceLock.objects.filter(dynmodel=self.sheet).update(
+            expires=timezone.now() - timedelta(seconds=1)
+        )
+        other = ImportLock(self.sheet)
+        self.assertTrue(other.acquire())
+        # the old holder can't release the new holder's lock
+        lock.release()
+        self.assertFalse(ImportLock(self.sheet).acquire())
+        other.release()
+
+    def test_stale_running_job_is_failed(self):
+        job = ImportJob.enqueue(self.sheet)
+        self.assertEqual(ImportJob.claim_next().pk, job.pk)
+        # its worker died, longer than the lease ago
+        ImportJob.objects.filter(pk=job.pk).update(
+            started=timezone.now() - timedelta(hours=2)
+        )
+        self.assertIsNone(ImportJob.find_active(self.sheet))
+        new_job = ImportJob.enqueue(self.sheet)
+        self.assertNotEqual(new_job.pk, job.pk)
+        self.assertEqual(ImportJob.claim_next().pk, new_job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertEqual(job.errors, ["The import stopped without finishing"])
+
+    def test_enqueue_attaches_to_running_job(self):
+        job = ImportJob.enqueue(self.sheet)
+        self.assertEqual(ImportJob.enqueue(self.sheet).pk, job.pk)
+        claimed = ImportJob.claim_next()
+        self.assertEqual(ImportJob.enqueue(self.sheet).pk, claimed.pk)
+        # validations are separate, and wait for the import
+        validation = ImportJob.enqueue(self.sheet, kind=ImportJob.VALIDATE)
+        self.assertNotEqual(validation.pk, job.pk)
+        self.assertIsNone(ImportJob.claim_next())
+        claimed.finish([])
+        self.assertEqual(ImportJob.claim_next().pk, validation.pk)
+
+    def test_preview_reports_changes_without_writing(self):
+        Model = self.sheet.get_model()
+        import_records(self.date_csv, Model, self.sheet)
+        csv = """when,where
+2019-04-23 15:06:51 UTC,seattle2
+4/23/2019 3:06pm PST,everett
+2019-04-24 10:00:00,tacoma
+"""
+        report = preview_records(csv, Model, self.sheet)
+        self.assertTrue(report.dry_run)
+        self.assertTrue(not report)
+        self.assertEqual(report.inserted, 1)
+        self.assertEqual(report.updated, 1)
+        self.assertEqual(report.unchanged, 1)
+        self.assertEqual(report.column_changes, {"where": 1})
+        self.assertEqual(Model.objects.count(), 2)
+        self.assertEqual(Model.objects.get(id=2).where, "olympia2")
+
+    def test_preview_compares_values_without_fingerprints(self):
+        Model = self.sheet.get_model()
+        import_records(self.date_csv, Model, self.sheet)
+        self.sheet.fingerprints.all().delete()
+        report = preview_records(self.date_csv, Model, self.sheet)
+        self.assertEqual(report.unchanged, 2)
+        self.assertEqual(report.updated, 0)
+
+    @patch("django_models_from_csv.models.fetch_csv_if_changed")
+    def test_import_data_dry_run(self, fetch_csv):
+        fetch_csv.return_value = (SpooledCSV([self.date_csv]), {})
+        report = self.sheet.import_data(dry_run=True)
+        self.assertTrue(report.dry_run)
+        self.assertEqual(report.inserted, 2)
+        self.assertEqual(self.sheet.get_model().objects.count(), 0)
+        # nothing about the source is remembered either
+        self.sheet.refresh_from_db()
+        self.assertIsNone(self.sheet.get_attr("source"))
+
+    @patch("django_models_from_csv.models.fetch_csv_if_changed")
+    def test_dry_run_previews_unsaved_columns(self, fetch_csv):
+        Model = self.sheet.get_model()
+        import_records(self.date_csv, Model, self.sheet)
+        csv = self.date_csv.replace("where\n", "where,who\n") \
+            .replace("seattle2\n", "seattle2,me\n") \
+            .replace("olympia2\n", "olympia2,you\n")
+        fetch_csv.return_value = (SpooledCSV([csv]), {})
+        saved_columns = list(self.sheet.columns)
+        self.sheet.columns = saved_columns + [{
+            "name": "who",
+            "type": "text",
+        }]
+        report = self.sheet.import_data(dry_run=True)
+        self.assertTrue(not report)
+        self.assertEqual(report.updated, 2)
+        self.assertEqual(report.column_changes, {"who": 2})
+        # the columns weren't applied
+        self.sheet.refresh_from_db()
+        self.assertEqual(self.sheet.columns, saved_columns)
+        field_names = [f.name for f in self.sheet.get_model()._meta.fields]
+        self.assertNotIn("who", field_names)
+
+    def test_can_import_from_stream(self):
+        Model = self.sheet.get_model()
+        # small spool size forces the data out to a temp file
+        spooled = SpooledCSV(
+            [self.date_csv[:10].encode("utf-8"),
+             self.date_csv[10:].encode("utf-8")],
+            max_size=16,
+        )
+        errors = import_records(spooled, Model, self.sheet, batch_size=1)
+        spooled.close()
+        self.assertTrue(not errors)
+        self.assertEqual(Model.objects.count(), 2)
+
+    def test_import_rows_handle_multiline_values(self):
+        csv = 'when,where\n2019-04-23 15:06:51,"line one\nline two"\n'
+        rows = list(iter_import_rows(SpooledCSV([csv]), self.sheet))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["where"], "line one\nline two")
+
+    def test_date_converters_learn_column_format(self):
+        convert = make_datetime_converter(
+            "%Y-%m-%d %H:%M:%S", DATETIME_FORMATS, "datetime"
+        )
+        self.assertEqual(convert("4/8/2019 20:43:03"), "2019-04-08 20:43:03")
+        self.assertEqual(convert("4/9/2019 1:02:03"), "2019-04-09 01:02:03")
+        # the format was detected once and then reused
+        with patch("django_models_from_csv.utils.coercion.dt_parser") as dt:
+            convert("4/10/2019 20:43:03")
+            dt.parse.assert_not_called()
+        # unknown formats still go through dateutil
+        self.assertEqual(
+            convert("2019-04-23 15:06:51 UTC"), "2019-04-23 15:06:51"
+        )
+        self.assertIsNone(convert("not a date"))
+        self.assertIsNone(convert(""))
+        convert("4/8/2019 20:43:03")
+        self.assertGreaterEqual(convert.cache_info().hits, 1)
+
+    def test_import_data_syncs_screendoor_incrementally(self):
+        sd_source = DynamicModel.objects.create(
+            name="ImportRecordsScreendoor",
+            sd_api_key="KEY", sd_project_id=1, sd_form_id=2,
+            columns=[{"name": "where", "type": "text"}],
+        )
+        self.addCleanup(sd_source.delete)
+        Model = sd_source.get_model()
+        self.addCleanup(Model.objects.all().delete)
+        mark = {"updated_at": "2019-05-02T10:00:00.000Z", "id": 2}
+
+        def returning(csv):
+            def build_csv(importer, project_id, form_id=None, since=None):
+                importer.high_water = mark
+                return csv
+            return build_csv
+
+        with patch("django_models_from_csv.models.ScreendoorImporter"
+                   ".build_csv", autospec=True) as build_csv:
+            build_csv.side_effect = returning(
+                "id,where\n1,seattle\n2,olympia\n"
+            )
+            report = sd_source.import_data()
+            self.assertEqual(report.inserted, 2)
+            self.assertIsNone(build_csv.call_args[1]["since"])
+            sd_source.refresh_from_db()
+            self.assertEqual(sd_source.get_attr("source")["screendoor"], mark)
+
+            # the next refresh only asks for (and upserts) what changed
+            build_csv.side_effect = returning("id,where\n2,tacoma\n")
+            report = sd_source.import_data()
+            self.assertEqual(build_csv.call_args[1]["since"], mark)
+            self.assertEqual(report.updated, 1)
+            self.assertEqual(Model.objects.count(), 2)
+            self.assertEqual(Model.objects.get(pk=2).where, "tacoma")
+
+            # a forced import is a full resync
+            sd_source.import_data(force=True)
+            self.assertIsNone(build_csv.call_args[1]["since"])
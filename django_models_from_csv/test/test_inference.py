@@ -0,0 +1,128 @@
+import random
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+
+from django_models_from_csv.models import DynamicModel
+from django_models_from_csv.utils.dynmodel import from_csv, from_csv_file
+from django_models_from_csv.utils.inference import (
+    find_contradicted_columns, infer_columns, infer_column_type, sample_rows
+)
+
+
+class SchemaInferenceTestCase(SimpleTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        filepath = "django_models_from_csv/test/data/test_form_response.csv"
+        with open(filepath, "r") as f:
+            self.sheet = f.read()
+
+    def tearDown(self):
+        DynamicModel.objects.filter(name="InferenceTest").delete()
+
+    def test_can_infer_columns_from_csv(self):
+        columns = infer_columns(self.sheet)
+        self.assertEqual(len(columns), 13)
+        # same naming as the generated models.py would give us
+        by_name = {c["name"]: c for c in columns}
+        self.assertEqual(columns[0]["name"], "timestamp")
+        self.assertEqual(columns[0]["original_name"], "Timestamp")
+        self.assertEqual(columns[0]["type"], "datetime")
+        scale = by_name["field_numeric_linear_scale_field"]
+        self.assertEqual(scale["original_name"], " Numeric linear scale?")
+        self.assertEqual(scale["type"], "integer")
+        self.assertEqual(by_name["what_date_field"]["type"], "date")
+        self.assertEqual(by_name["what_time_field"]["type"], "time")
+        short = by_name["question_with_short_answer_field"]
+        self.assertEqual(short["type"], "text")
+        self.assertEqual(short["attrs"], {"blank": True, "null": True})
+        self.assertEqual(scale["attrs"], {"blank": True, "null": True})
+
+    def test_can_infer_column_types(self):
+        self.assertEqual(infer_column_type(["1", "-20", "3,000"])[0], "integer")
+        self.assertEqual(infer_column_type(["1", "$2.50"])[0], "number")
+        # codes with leading zeros stay text
+        self.assertEqual(infer_column_type(["02134", "90210"])[0], "text")
+        self.assertEqual(infer_column_type(["2019-01-02"])[0], "date")
+        self.assertEqual(
+            infer_column_type(["2019-01-02", "1/3/2019 10:00"])[0],
+            "datetime"
+        )
+        self.assertEqual(infer_column_type(["10:01:00 PM"])[0], "time")
+        self.assertEqual(infer_column_type([])[0], "text")
+
+    def test_confidence_threshold(self):
+        values = ["1", "2", "3", "n/a"]
+        self.assertEqual(infer_column_type(values)[0], "text")
+        column_type, confidence = infer_column_type(values, confidence=0.75)
+        self.assertEqual(column_type, "integer")
+        self.assertEqual(confidence, 0.75)
+
+    def test_skips_id_and_dedupes_names(self):
+        csv = "ID,Name,name?,Blank\n1,a,b,\n2,c,d,\n"
+        columns = infer_columns(csv)
+        names = [c["name"] for c in columns]
+        self.assertEqual(names, ["name", "name_field", "blank"])
+        self.assertEqual(columns[2]["type"], "text")
+        self.assertEqual(columns[2]["attrs"], {"blank": True, "null": True})
+
+    def test_can_build_dynmodel_from_csv(self):
+        dynmodel = from_csv("InferenceTest", self.sheet,
+            csv_url="https://fake.url"
+        )
+        self.assertEqual(dynmodel.csv_url, "https://fake.url")
+        self.assertEqual(len(dynmodel.columns), 13)
+        self.assertEqual(dynmodel.columns[-2]["type"], "date")
+
+    def test_can_build_dynmodel_from_csv_upload(self):
+        upload = SimpleUploadedFile(
+            "inference-upload.csv",
+            b'Name,"When, exactly"\nfirst,2019-01-01\nsecond,2019-01-02\n'
+        )
+        dynmodel = from_csv_file("inference-upload.csv", upload)
+        self.addCleanup(dynmodel.delete)
+        self.addCleanup(dynmodel.csv_file.delete, save=False)
+        self.assertEqual(
+            [c["original_name"] for c in dynmodel.columns],
+            ["Name", "When exactly"]
+        )
+        self.assertEqual(dynmodel.columns[1]["type"], "date")
+        # the stored CSV has the cleaned up headers
+        dynmodel.csv_file.open("r")
+        try:
+            stored = dynmodel.csv_file.read()
+        finally:
+            dynmodel.csv_file.close()
+        self.assertEqual(stored.splitlines()[0], "Name,When exactly")
+
+    def test_sample_rows_takes_head_and_reservoir(self):
+        rows = ([str(i)] for i in range(1000))
+        sample = sample_rows(
+            rows, head_size=10, reservoir_size=5, max_rows=0,
+            rng=random.Random(1)
+        )
+        self.assertEqual(len(sample), 15)
+        self.assertEqual(sample[:10], [[str(i)] for i in range(10)])
+        self.assertTrue(all(int(r[0]) >= 10 for r in sample[10:]))
+        # rows past max_rows aren't looked at
+        rows = ([str(i)] for i in range(1000))
+        sample = sample_rows(rows, head_size=10, reservoir_size=5,
+                             max_rows=20)
+        self.assertTrue(all(int(r[0]) < 20 for r in sample))
+
+    def test_sampled_inference_on_large_source(self):
+        lines = ["amount"] + [str(i) for i in range(1, 5000)]
+        lines[4000] = "n/a"
+        csv = "\n".join(lines) + "\n"
+        columns = infer_columns(
+            csv, head_size=100, reservoir_size=0, max_rows=0
+        )
+        self.assertEqual(columns[0]["type"], "integer")
+        contradicted = find_contradicted_columns(csv, columns)
+        self.assertEqual(len(contradicted), 1)
+        self.assertEqual(contradicted[0]["name"], "amount")
+        self.assertEqual(contradicted[0]["count"], 1)
+        self.assertEqual(contradicted[0]["examples"], [{
+            "row": 4000, "value": "n/a",
+        }])
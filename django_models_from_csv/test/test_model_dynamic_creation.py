@@ -1,7 +1,12 @@
-from django.test import SimpleTestCase
+from unittest.mock import patch
 
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from django_models_from_csv import apps as csv_apps
 from django_models_from_csv.models import (
-    DynamicModel, create_model_attrs, create_models
+    DynamicModel, SchemaGeneration, create_model_attrs, create_models
 )
 
 
@@ -51,3 +56,62 @@ class ModelDynamicCreationTestCase(SimpleTestCase):
             SomeGoogleSheet.HEADERS_LOOKUP["When did this happen"],
             self.dynmodel.columns[1]["name"]
         )
+
+    def test_save_and_delete_bump_schema_generation(self):
+        generation = SchemaGeneration.current()
+        self.dynmodel.save()
+        self.assertGreater(SchemaGeneration.current(), generation)
+        other = DynamicModel.objects.create(
+            name="OtherGoogleSheet", columns=self.dynmodel.columns,
+        )
+        generation = SchemaGeneration.current()
+        other.delete()
+        self.assertEqual(SchemaGeneration.current(), generation + 1)
+
+    @override_settings(CSV_MODELS_SCHEMA_CHECK_INTERVAL=0)
+    @patch("django_models_from_csv.apps.reload_changed_models")
+    def test_only_reloads_on_generation_change(self, reload_models):
+        environ = {"PATH_INFO": "/admin/"}
+        csv_apps.check_apps_need_reloading(None, environ)
+        reload_models.reset_mock()
+        csv_apps.check_apps_need_reloading(None, environ)
+        reload_models.assert_not_called()
+        SchemaGeneration.bump()
+        csv_apps.check_apps_need_reloading(None, environ)
+        reload_models.assert_called_once()
+        # static requests never check
+        reload_models.reset_mock()
+        SchemaGeneration.bump()
+        csv_apps.check_apps_need_reloading(None, {"PATH_INFO": "/static/x.css"})
+        reload_models.assert_not_called()
+
+    @patch("django_models_from_csv.management.commands."
+           "refresh_data_sources.refresh_source")
+    @patch("django_models_from_csv.apps.reload_changed_models")
+    def test_commands_reload_changed_models(self, reload_models, refresh):
+        csv_apps.reload_models_if_changed()
+        reload_models.reset_mock()
+        SchemaGeneration.bump()
+        call_command("process_import_jobs")
+        reload_models.assert_called_once()
+        SchemaGeneration.bump()
+        call_command("refresh_data_sources", name=[], workers=1, timeout=0)
+        self.assertEqual(reload_models.call_count, 2)
+
+    def test_column_changes_rebuild_model_class(self):
+        OldModel = self.dynmodel.get_model()
+        self.dynmodel.save()
+        # nothing changed, keep the same class
+        self.assertIs(self.dynmodel.get_model(), OldModel)
+        old_hash = self.dynmodel.schema_hash
+        self.dynmodel.columns = self.dynmodel.columns + [{
+            "name": "count",
+            "type": "integer",
+            "original_name": "How many",
+        }]
+        self.dynmodel.save()
+        self.assertNotEqual(self.dynmodel.schema_hash, old_hash)
+        NewModel = self.dynmodel.get_model()
+        self.assertIsNot(NewModel, OldModel)
+        NewModel.objects.create(name="test", when=timezone.now(), count=3)
+        self.assertEqual(NewModel.objects.filter(count=3).count(), 1)
@@ -0,0 +1,68 @@
+import sys
+from types import ModuleType
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from django_models_from_csv.utils.pipeline import Pipeline
+
+
+UPPERCASE = "collaborative.data_pipeline.uppercase"
+LEGACY = "django_models_from_csv.test.legacy_pipeline_step"
+FAILING = "django_models_from_csv.test.failing_pipeline_step"
+
+
+def legacy_run(row, columns=None):
+    legacy_run.calls += 1
+    row["seen"] = True
+    # rows with odd numbers couldn't be processed
+    return row["n"] % 2 == 0
+
+
+def failing_run_batch(rows, columns=None):
+    return [ix for ix, row in enumerate(rows) if row["n"] % 3 == 0]
+
+
+class PipelineTestCase(SimpleTestCase):
+    def setUp(self):
+        legacy = ModuleType(LEGACY)
+        legacy.run = legacy_run
+        legacy_run.calls = 0
+        sys.modules[LEGACY] = legacy
+        failing = ModuleType(FAILING)
+        failing.run_batch = failing_run_batch
+        failing.EXECUTOR = "thread"
+        sys.modules[FAILING] = failing
+        self.rows = [{"name": "row %s" % i, "n": i} for i in range(10)]
+
+    def tearDown(self):
+        del sys.modules[LEGACY]
+        del sys.modules[FAILING]
+
+    def test_legacy_modules_run_per_row(self):
+        with Pipeline([LEGACY]) as pipeline:
+            pipeline.run(self.rows)
+        self.assertEqual(legacy_run.calls, 10)
+        self.assertTrue(all(row["seen"] for row in self.rows))
+
+    def test_batch_module_runs_in_process_pool(self):
+        pipeline = Pipeline([UPPERCASE, LEGACY], workers=3)
+        uppercase = pipeline.stages[0][1]
+        with patch.object(uppercase, "EXECUTOR", "process", create=True):
+            with pipeline:
+                pipeline.run(self.rows)
+                self.assertIn("process", pipeline.pools)
+        self.assertEqual(self.rows[0], {"name": "ROW 0", "n": 0, "seen": True})
+        self.assertEqual(self.rows[9]["name"], "ROW 9")
+
+    def test_reports_rows_modules_failed_on(self):
+        with Pipeline([FAILING, LEGACY], workers=3) as pipeline:
+            failed = pipeline.run(self.rows)
+        self.assertEqual(failed, {0, 1, 3, 5, 6, 7, 9})
+
+    def test_modules_are_loaded_once(self):
+        pipeline = Pipeline([LEGACY])
+        # swapping out the module after loading has no effect
+        sys.modules[LEGACY] = ModuleType(LEGACY)
+        pipeline.run(self.rows)
+        self.assertEqual(legacy_run.calls, 10)
@@ -0,0 +1,81 @@
+import sys
+import time
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from django_models_from_csv.management.commands.refresh_data_sources import (
+    run_isolated,
+)
+from django_models_from_csv.models import DynamicModel
+from django_models_from_csv.utils.importing import ImportReport
+
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+
+class RefreshDataSourcesTestCase(SimpleTestCase):
+    databases = '__all__'
+
+    def test_isolated_jobs_dont_block_each_other(self):
+        started = time.monotonic()
+        outcomes = list(run_isolated([
+            ("hung", python("import time; time.sleep(60)")),
+            ("crashed", python("import os; os._exit(3)")),
+            ("fast", python("pass")),
+        ], workers=2, timeout=1))
+        self.assertLess(time.monotonic() - started, 10)
+        by_name = dict(outcomes)
+        self.assertEqual(set(by_name), {"hung", "crashed", "fast"})
+        self.assertIsNone(by_name["fast"])
+        self.assertEqual(
+            by_name["crashed"]["errors"],
+            ["Refresh process exited with code 3"]
+        )
+        self.assertEqual(
+            by_name["hung"]["errors"], ["Timed out after 1 seconds"]
+        )
+        # the hung job didn't hold up the ones after it
+        self.assertEqual(outcomes[-1][0], "hung")
+
+    def test_single_worker_still_times_out(self):
+        outcomes = list(run_isolated([
+            ("hung", python("import time; time.sleep(60)")),
+            ("fast", python("pass")),
+        ], workers=1, timeout=1))
+        self.assertEqual([name for name, _ in outcomes], ["hung", "fast"])
+        self.assertEqual(
+            outcomes[0][1]["errors"], ["Timed out after 1 seconds"]
+        )
+
+    @patch.object(DynamicModel, "import_data")
+    def test_sequential_refresh_reports_each_source(self, import_data):
+        dynmodel = DynamicModel.objects.create(
+            name="RefreshSheet",
+            csv_url="https://fake.url/refresh.csv",
+            attrs={"type": 1},
+            columns=[{"name": "name", "type": "text"}]
+        )
+        # cleanups run last-in first-out
+        for name in ("refreshsheet", "refreshsheetmetadata",
+                     "refreshsheetcontactmetadata"):
+            self.addCleanup(DynamicModel.objects.get(name=name).delete)
+        report = ImportReport(["Row: 1, Error creating: bad"])
+        report.inserted = 2
+        import_data.return_value = report
+        with self.assertLogs(
+                "django_models_from_csv.management.commands."
+                "refresh_data_sources") as logs:
+            call_command(
+                "refresh_data_sources", name=["refreshsheet"], workers=1,
+                timeout=0,
+            )
+        import_data.assert_called_once_with(replace=None, force=False)
+        self.assertTrue(any(
+            "refreshsheet: inserted: 2" in line for line in logs.output
+        ))
+        self.assertTrue(any(
+            "import error: Row: 1" in line for line in logs.output
+        ))
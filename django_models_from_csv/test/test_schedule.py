@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from django_models_from_csv.models import DynamicModel
+from django_models_from_csv.utils.csv import SpooledCSV
+from django_models_from_csv.utils.importing import ImportReport
+from django_models_from_csv.utils.schedule import (
+    get_schedule, is_due, next_interval, update_schedule,
+)
+
+
+@override_settings(
+    CSV_MODELS_REFRESH_INTERVAL=900,
+    CSV_MODELS_REFRESH_MIN_INTERVAL=300,
+    CSV_MODELS_REFRESH_MAX_INTERVAL=86400,
+)
+class RefreshScheduleTestCase(SimpleTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.dynmodel = DynamicModel.objects.create(
+            name="ScheduleSheet",
+            csv_url="https://fake.url/schedule.csv",
+            attrs={"type": 1},
+            columns=[{"name": "name", "type": "text"}]
+        )
+        self.now = datetime(2019, 6, 1, 12, 0)
+
+    def tearDown(self):
+        for name in ("schedulesheetcontactmetadata", "schedulesheetmetadata",
+                     "schedulesheet"):
+            DynamicModel.objects.get(name=name).delete()
+
+    def test_interval_adapts_to_changes(self):
+        self.assertEqual(next_interval(900, changed=True, failed=False), 450)
+        self.assertEqual(next_interval(400, changed=True, failed=False), 300)
+        self.assertEqual(next_interval(900, changed=False, failed=False), 1800)
+        self.assertEqual(next_interval(900, changed=True, failed=True), 1800)
+        self.assertEqual(
+            next_interval(80000, changed=False, failed=False), 86400
+        )
+
+    def test_update_schedule(self):
+        self.assertTrue(is_due(self.dynmodel, now=self.now))
+        unchanged = {"skipped": True, "errors": []}
+        schedule = update_schedule(self.dynmodel, unchanged, now=self.now)
+        self.assertEqual(schedule["interval"], 1800)
+        self.assertFalse(is_due(self.dynmodel, now=self.now))
+        self.assertTrue(is_due(
+            self.dynmodel, now=self.now + timedelta(seconds=1800)
+        ))
+
+        failed = {"errors": ["Timed out"], "failed": True}
+        update_schedule(self.dynmodel, failed, now=self.now)
+        update_schedule(self.dynmodel, failed, now=self.now)
+        stored = DynamicModel.objects.get(pk=self.dynmodel.pk)
+        self.assertEqual(get_schedule(stored)["interval"], 7200)
+        self.assertEqual(get_schedule(stored)["failures"], 2)
+
+        changed = {"inserted": 3, "errors": []}
+        schedule = update_schedule(self.dynmodel, changed, now=self.now)
+        self.assertEqual(schedule["interval"], 3600)
+        self.assertEqual(schedule["failures"], 0)
+
+    @override_settings(CSV_MODELS_REFRESH_MAX_FAILURES=3)
+    def test_failing_source_is_marked_dead(self):
+        failed = {"errors": ["Timed out"], "failed": True}
+        for _ in range(2):
+            update_schedule(self.dynmodel, failed, now=self.now)
+        self.assertFalse(self.dynmodel.get_attr("dead"))
+        update_schedule(self.dynmodel, failed, now=self.now)
+        stored = DynamicModel.objects.get(pk=self.dynmodel.pk)
+        self.assertTrue(stored.get_attr("dead"))
+        self.assertEqual(get_schedule(stored)["failures"], 3)
+
+    @override_settings(CSV_MODELS_REFRESH_MAX_FAILURES=2)
+    def test_row_errors_back_off_without_killing_source(self):
+        partial = {"inserted": 5, "errors": ["Row: 3, Error creating: bad"]}
+        for _ in range(3):
+            schedule = update_schedule(self.dynmodel, partial, now=self.now)
+        self.assertEqual(schedule["interval"], 7200)
+        self.assertEqual(schedule["failures"], 0)
+        stored = DynamicModel.objects.get(pk=self.dynmodel.pk)
+        self.assertFalse(stored.get_attr("dead"))
+
+    @patch("django_models_from_csv.models.fetch_csv_if_changed")
+    def test_successful_import_revives_dead_source(self, fetch_csv):
+        fetch_csv.return_value = (SpooledCSV(["name\nsomeone\n"]), {})
+        self.dynmodel.attrs.update({
+            "dead": True, "schedule": {"failures": 10},
+        })
+        self.dynmodel.save_attrs()
+        self.assertFalse(self.dynmodel.import_data(force=True))
+        stored = DynamicModel.objects.get(pk=self.dynmodel.pk)
+        self.assertFalse(stored.get_attr("dead"))
+        self.assertEqual(get_schedule(stored)["failures"], 0)
+
+    def test_update_keeps_other_attrs(self):
+        DynamicModel.objects.filter(pk=self.dynmodel.pk).update(
+            attrs={"type": 1, "source": {"digest": "abc"}}
+        )
+        update_schedule(self.dynmodel, {"errors": []}, now=self.now)
+        stored = DynamicModel.objects.get(pk=self.dynmodel.pk)
+        self.assertEqual(stored.attrs["source"], {"digest": "abc"})
+        self.assertIn("schedule", stored.attrs)
+
+    @patch.object(DynamicModel, "import_data")
+    def test_refresh_only_due_sources(self, import_data):
+        import_data.return_value = ImportReport()
+        call_command(
+            "refresh_data_sources", name=["schedulesheet"], workers=1,
+            timeout=0, due=True,
+        )
+        self.assertEqual(import_data.call_count, 1)
+        # the next refresh is scheduled in the future
+        call_command(
+            "refresh_data_sources", name=["schedulesheet"], workers=1,
+            timeout=0, due=True,
+        )
+        self.assertEqual(import_data.call_count, 1)
+        # without --due everything is refreshed
+        call_command(
+            "refresh_data_sources", name=["schedulesheet"], workers=1,
+            timeout=0,
+        )
+        self.assertEqual(import_data.call_count, 2)
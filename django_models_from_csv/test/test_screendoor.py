@@ -1,4 +1,5 @@
 from unittest.mock import patch, Mock
+from urllib.parse import parse_qsl, urlsplit
 
 from django.test import TestCase
 import requests
@@ -2182,7 +2183,7 @@ LIST_RESPONSES = [
 
 
 class ScreendoorTestCase(TestCase):
-    @patch.object(requests, "get")
+    @patch.object(requests.Session, "get")
     def test_can_fetch_form_without_form_id(self, mockget):
         mockresponse = Mock()
         mockget.return_value = mockresponse
@@ -2192,7 +2193,7 @@ class ScreendoorTestCase(TestCase):
         self.assertTrue("field_data" in data)
         self.assertEqual(len(data["field_data"]), 23)
 
-    @patch.object(requests, "get")
+    @patch.object(requests.Session, "get")
     def test_can_fetch_form_with_form_id(self, mockget):
         mockresponse = Mock()
         mockget.return_value = mockresponse
@@ -2202,7 +2203,7 @@ class ScreendoorTestCase(TestCase):
         self.assertTrue("field_data" in data)
         self.assertEqual(len(data["field_data"]), 23)
 
-    @patch.object(requests, "get")
+    @patch.object(requests.Session, "get")
     def test_can_build_pk_to_header_map(self, mockget):
         mockresponse = Mock()
         mockget.return_value = mockresponse
@@ -2216,7 +2217,7 @@ class ScreendoorTestCase(TestCase):
             maps["xyejrz01"], "What's your email address? (ID: xyejrz01)"
         )
 
-    @patch.object(requests, "get")
+    @patch.object(requests.Session, "get")
     def test_can_build_csv(self, mockget):
         importer = ScreendoorImporter(api_key="KEY", base_url="https://fake.tld")
         csv = importer.build_csv_from_data(LIST_FORMS[0], LIST_RESPONSES)
@@ -2226,7 +2227,7 @@ class ScreendoorTestCase(TestCase):
             "What's your email address? (ID: xyejrz01)" in parsed_csv.headers
         )
 
-    @patch.object(requests, "get")
+    @patch.object(requests.Session, "get")
     def test_can_build_csv_with_ids(self, mockget):
         importer = ScreendoorImporter(api_key="KEY", base_url="https://fake.tld")
         csv = importer.build_csv_from_data(LIST_FORMS[0], LIST_RESPONSES)
@@ -2234,7 +2235,7 @@ class ScreendoorTestCase(TestCase):
         parsed_csv = Dataset().load(csv)
         self.assertTrue("id" in parsed_csv.headers)
 
-    # @patch.object(requests, "get")
+    # @patch.object(requests.Session, "get")
     # def test_can_use_buildin_id_during_import(self, mockget):
     #     mockresponse = Mock()
     #     mockget.return_value = mockresponse
@@ -2246,3 +2247,177 @@ class ScreendoorTestCase(TestCase):
     #     print("Screendoor CSV", csv)
     #     self.assertTrue(len(csv))
     #     self.assertTrue(False)
+
+
+def make_page(rows, links=None):
+    response = Mock()
+    response.status_code = 200
+    response.json.return_value = rows
+    response.links = links or {}
+    return response
+
+
+class ScreendoorPagingTestCase(TestCase):
+    @patch.object(requests.Session, "get")
+    def test_fetches_pages_once_in_parallel(self, mockget):
+        base = "https://fake.tld/api/projects/1/responses"
+        pages = {}
+        for page in range(1, 6):
+            pages[page] = make_page([
+                dict(LIST_RESPONSES[0], id=page * 10 + i,
+                     form_id=6076 if i else 1)
+                for i in range(3)
+            ])
+        pages[1].links = {
+            "next": {"url": "%s?page=2" % base},
+            "last": {"url": "%s?page=5&per_page=3" % base},
+        }
+
+        def get(url, **kwargs):
+            return pages[int(dict(parse_qsl(urlsplit(url).query)).get(
+                "page", 1
+            ))]
+        mockget.side_effect = get
+
+        importer = ScreendoorImporter(
+            api_key="KEY", base_url="https://fake.tld", workers=3
+        )
+        responses = list(importer.get_responses(1, 6076))
+        self.assertEqual(mockget.call_count, 5)
+        # in page order, without other forms' responses
+        self.assertEqual(
+            [r["id"] for r in responses],
+            [p * 10 + i for p in range(1, 6) for i in (1, 2)]
+        )
+        # the form is filtered by on the server, too
+        first_url = mockget.call_args_list[0][0][0]
+        self.assertIn("form_id=6076", first_url)
+
+        mockget.reset_mock()
+        with patch.object(ScreendoorImporter, "get_form") as get_form:
+            get_form.return_value = LIST_FORMS[0]
+            csv = importer.build_csv(1, form_id=6076)
+        self.assertEqual(mockget.call_count, 5)
+        parsed_csv = Dataset().load(csv)
+        self.assertEqual(len(parsed_csv), 10)
+        self.assertIn("Responder email (ID: resp_email)", parsed_csv.headers)
+
+    @patch.object(requests.Session, "get")
+    def test_follows_next_links_without_page_count(self, mockget):
+        mockget.side_effect = [
+            make_page([{"id": 1, "form_id": 2}], links={
+                "next": {"url": "https://fake.tld/next"},
+            }),
+            make_page([{"id": 2, "form_id": 2}]),
+        ]
+        importer = ScreendoorImporter(
+            api_key="KEY", base_url="https://fake.tld", max_import_records=1
+        )
+        self.assertEqual(
+            [r["id"] for r in importer.get_responses(1, 2)], [1]
+        )
+
+    @patch.object(requests.Session, "get")
+    def test_incremental_sync_stops_at_high_water_mark(self, mockget):
+        def response(id, updated_at):
+            return {"id": id, "form_id": 2, "updated_at": updated_at}
+        mockget.side_effect = [
+            make_page([
+                response(5, "2019-05-04T10:00:00.000Z"),
+                response(2, "2019-05-03T10:00:00.000Z"),
+            ], links={"next": {"url": "https://fake.tld/next"}}),
+            make_page([
+                response(4, "2019-05-02T10:00:00.000Z"),
+                response(1, "2019-05-01T10:00:00.000Z"),
+            ], links={"next": {"url": "https://fake.tld/last"}}),
+            make_page([response(3, "2019-04-01T10:00:00.000Z")]),
+        ]
+        importer = ScreendoorImporter(
+            api_key="KEY", base_url="https://fake.tld"
+        )
+        since = {"updated_at": "2019-05-02T10:00:00.000Z", "id": 4}
+        responses = list(importer.get_responses(1, 2, since=since))
+        self.assertEqual([r["id"] for r in responses], [5, 2])
+        # the rest are older, so we didn't page through them
+        self.assertEqual(mockget.call_count, 2)
+        first_url = mockget.call_args_list[0][0][0]
+        self.assertIn("sort=updated_at", first_url)
+        self.assertIn("direction=desc", first_url)
+        self.assertEqual(importer.high_water, {
+            "updated_at": "2019-05-04T10:00:00.000Z", "id": 5,
+        })
+
+        # nothing new: the mark stays where it was
+        mockget.side_effect = [make_page([
+            response(5, "2019-05-04T10:00:00.000Z"),
+        ])]
+        responses = list(importer.get_responses(1, 2, since={
+            "updated_at": "2019-05-04T10:00:00.000Z", "id": 5,
+        }))
+        self.assertEqual(responses, [])
+        self.assertIsNone(importer.high_water)
+
+    @patch.object(requests.Session, "get")
+    def test_truncated_sync_is_picked_up_by_the_next_ones(self, mockget):
+        def response(id, day):
+            return {
+                "id": id, "form_id": 2,
+                "updated_at": "2019-05-%02dT10:00:00.000Z" % day,
+            }
+        # newest first, as asked for, with a few updated at the same time
+        responses = [
+            response(1, 9), response(2, 8), response(3, 8), response(4, 8),
+            response(5, 7),
+        ]
+        mockget.side_effect = lambda url, **kwargs: make_page(responses)
+        importer = ScreendoorImporter(
+            api_key="KEY", base_url="https://fake.tld", max_import_records=2
+        )
+        since = {"updated_at": "2019-05-06T10:00:00.000Z", "id": 6}
+        synced = []
+        for sync in range(4):
+            synced.append([
+                r["id"] for r in importer.get_responses(1, 2, since=since)
+            ])
+            since = importer.next_mark(since)
+        self.assertIn("direction=desc", mockget.call_args[0][0])
+        # two at a time, down to the old mark, then nothing new
+        self.assertEqual(synced, [[1, 2], [3, 4], [5], []])
+        self.assertEqual(since, {
+            "updated_at": "2019-05-09T10:00:00.000Z", "id": 2,
+        })
+
+        # a response changed in the meantime is synced once we're caught
+        # up, and a full sync cut short works down from the newest, too
+        responses.insert(0, response(5, 20))
+        self.assertEqual(
+            [r["id"] for r in importer.get_responses(1, 2, since=since)], [5]
+        )
+        self.assertEqual(list(importer.get_responses(1, 2)), responses[:2])
+        self.assertEqual(importer.next_mark()["backlog"], {
+            "after": None, "before": "2019-05-09T10:00:00.000Z",
+            "seen": [1],
+        })
+
+        # unless the API ignored the order: then we start over
+        responses.reverse()
+        list(importer.get_responses(1, 2))
+        self.assertTrue(importer.truncated)
+        self.assertIsNone(importer.next_mark())
+
+    @patch.object(requests.Session, "get")
+    def test_incremental_sync_filters_unordered_responses(self, mockget):
+        mockget.side_effect = [make_page([
+            {"id": 2, "form_id": 2, "updated_at": "2019-05-03T10:00:00Z"},
+            {"id": 4, "form_id": 2, "updated_at": "2019-05-04T10:00:00Z"},
+            {"id": 1, "form_id": 2, "updated_at": "2019-05-01T10:00:00Z"},
+            {"id": 5, "form_id": 2, "updated_at": "2019-05-05T10:00:00Z"},
+        ])]
+        importer = ScreendoorImporter(
+            api_key="KEY", base_url="https://fake.tld"
+        )
+        # the API ignored our sort, so older responses don't end the sync
+        responses = list(importer.get_responses(1, 2, since={
+            "updated_at": "2019-05-02T10:00:00Z", "id": 1,
+        }))
+        self.assertEqual([r["id"] for r in responses], [2, 4, 5])
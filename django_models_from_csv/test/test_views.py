@@ -3,7 +3,10 @@ from unittest import skip
 from unittest.mock import patch
 
 from django.contrib.auth.models import User
-from django.test import TestCase, Client, SimpleTestCase
+from django.http import HttpResponse
+from django.test import (
+    TestCase, Client, SimpleTestCase, override_settings,
+)
 from django.urls import reverse
 
 from django_models_from_csv import models as csv_models
@@ -12,6 +15,7 @@ from django_models_from_csv.commands.manage_py import (
 )
 from django_models_from_csv.models import DynamicModel, create_models
 from django_models_from_csv.utils.common import get_setting
+from django_models_from_csv.utils.csv import SpooledCSV
 
 # from django.db import DEFAULT_DB_ALIAS, connections, transaction
 
@@ -144,9 +148,9 @@ class BeginViewTestCase(ViewsTestCaseBase):
         response = c.get(reverse('csv_models:begin'))
         self.assertEqual(response.status_code, 302)
 
-    @patch("django_models_from_csv.utils.dynmodel.fetch_csv")
-    def test_can_start_new_csv_model(self, fetch_csv):
-        fetch_csv.return_value = self.csv
+    @patch("django_models_from_csv.utils.dynmodel.fetch_csv_sample")
+    def test_can_start_new_csv_model(self, fetch_csv_sample):
+        fetch_csv_sample.return_value = SpooledCSV([self.csv])
         ids = DynamicModel.objects.all().values("id")
         response = self.client.post(reverse('csv_models:begin'), {
             "csv_name": "TestSheet",
@@ -295,6 +299,7 @@ class RefineViewTestCase(ViewsTestCaseBase):
         response = c.get(to_url)
         self.assertEqual(response.status_code, 302)
 
+    @override_settings(CSV_MODELS_BACKGROUND_IMPORTS=True)
     @patch("django_models_from_csv.views.configuration.fetch_csv")
     def test_can_refine_existing_model(self, fetch_csv):
         fetch_csv.return_value = CSV
@@ -308,7 +313,14 @@ class RefineViewTestCase(ViewsTestCaseBase):
             "columns": json.dumps(self.columns),
         })
         next = get_setting("CSV_MODELS_WIZARD_REDIRECT_TO")
-        if next:
+        if get_setting("CSV_MODELS_BACKGROUND_IMPORTS"):
+            job = self.dynmodel.import_jobs.last()
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(response.url, reverse(
+                'csv_models:import-progress', args=[job.id]
+            ))
+            self.assertEqual(job.status, csv_models.ImportJob.QUEUED)
+        elif next:
             self.assertEqual(response.status_code, 302)
             self.assertTrue(response.url.startswith(next))
         else:
@@ -318,6 +330,29 @@ class RefineViewTestCase(ViewsTestCaseBase):
         self.assertEqual(self.dynmodel.columns[0]["type"], "datetime")
 
 
+    @override_settings(CSV_MODELS_BACKGROUND_IMPORTS=True)
+    @patch("django_models_from_csv.views.configuration.render")
+    def test_refine_during_running_import_keeps_form(self, render):
+        render.return_value = HttpResponse()
+        job = csv_models.ImportJob.enqueue(self.dynmodel)
+        to_url = reverse(
+            'csv_models:refine-and-import', args=[self.dynmodel.id]
+        )
+        self.columns[0]["type"] = "datetime"
+        response = self.client.post(to_url, {
+            "columns": json.dumps(self.columns),
+        })
+        self.assertEqual(response.status_code, 200)
+        context = render.call_args[0][2]
+        self.assertEqual(context["running_job"], job)
+        self.assertEqual(
+            context["form"].cleaned_data["columns"][0]["type"], "datetime"
+        )
+        # nothing was applied or queued
+        self.dynmodel.refresh_from_db()
+        self.assertEqual(self.dynmodel.columns[0]["type"], "text")
+        self.assertEqual(self.dynmodel.import_jobs.count(), 1)
+
 class ImportViewTestCase(ViewsTestCaseBase):
     def setUp(self):
         super(ImportViewTestCase, self).setUp()
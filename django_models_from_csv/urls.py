@@ -14,6 +14,11 @@ urlpatterns = [
          name='refine-and-import'),
     path('refine-and-import/<str:name>/', views.refine_and_import_by_name,
          name='refine-and-import'),
+    # Follow a queued (background) import
+    path('import-progress/<int:id>/', views.import_progress,
+         name='import-progress'),
+    path('import-status/<int:id>/', views.import_status,
+         name='import-status'),
 
     # endpoint for autocompleting tags
     url(r'^tag-autocomplete/$', views.TagAutocomplete.as_view(),
@@ -0,0 +1,126 @@
+"""
+Fast loading of rows into a dynamic model's table, skipping the ORM.
+
+This is meant for filling empty tables (a source's first import): on
+PostgreSQL rows are streamed in with COPY ... FROM STDIN, elsewhere
+they're inserted with executemany. Either way no model instances are
+created and no signals are sent, so callers are responsible for any
+bookkeeping (metadata records, etc) afterwards.
+"""
+import io
+import logging
+
+from django.core.management.color import no_style
+from django.db import connections
+
+from django_models_from_csv.utils.common import chunked
+
+
+logger = logging.getLogger(__name__)
+
+
+def copy_value(value):
+    """
+    Format a value for PostgreSQL's COPY text format.
+    """
+    if value is None:
+        return "\\N"
+    return str(value).replace(
+        "\\", "\\\\"
+    ).replace(
+        "\t", "\\t"
+    ).replace(
+        "\n", "\\n"
+    ).replace(
+        "\r", "\\r"
+    )
+
+
+def get_load_columns(Model, fields, using="default"):
+    """
+    Return the (quoted) table name, the list of (quoted) column names
+    and the model fields, for the primary key and the given fields.
+    """
+    qn = connections[using].ops.quote_name
+    model_fields = [Model._meta.pk] + [
+        Model._meta.get_field(f) for f in fields
+    ]
+    table = qn(Model._meta.db_table)
+    columns = [qn(f.column) for f in model_fields]
+    return table, columns, model_fields
+
+
+def prep_rows(rows, model_fields, connection):
+    """
+    Turn a dict of primary key => row dict into lists of values
+    ready to be written, in the order of `model_fields`.
+    """
+    pk_field = model_fields[0]
+    for pk, row in rows.items():
+        values = [pk_field.get_db_prep_save(pk, connection)]
+        for field in model_fields[1:]:
+            if field.name in row:
+                value = field.to_python(row[field.name])
+            else:
+                value = field.get_default()
+            values.append(field.get_db_prep_save(value, connection))
+        yield values
+
+
+def copy_rows(cursor, table, columns, rows):
+    """
+    Write rows (lists of values) to a table with COPY. This needs
+    the psycopg2 cursor underneath Django's.
+    """
+    data = io.StringIO()
+    for values in rows:
+        data.write("\t".join(copy_value(v) for v in values))
+        data.write("\n")
+    data.seek(0)
+    cursor.copy_expert("COPY %s (%s) FROM STDIN" % (
+        table, ", ".join(columns)
+    ), data)
+
+
+def insert_rows(cursor, table, columns, rows, batch_size=1000):
+    """
+    Write rows (lists of values) to a table with executemany.
+    """
+    sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+        table, ", ".join(columns), ", ".join(["%s"] * len(columns))
+    )
+    for batch in chunked(rows, batch_size):
+        cursor.executemany(sql, batch)
+
+
+def load_rows(Model, fields, rows, using="default"):
+    """
+    Insert rows (a dict of primary key => row dict, with the model
+    field names as keys) into the model's table. The rows must not
+    exist yet. This should be ran inside a transaction, since a
+    failure can leave some of the rows written.
+    """
+    if not rows:
+        return
+    connection = connections[using]
+    table, columns, model_fields = get_load_columns(Model, fields, using)
+    values = prep_rows(rows, model_fields, connection)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            copy_rows(cursor, table, columns, values)
+        else:
+            insert_rows(cursor, table, columns, values)
+
+
+def reset_sequences(Model, using="default"):
+    """
+    Since we write the primary keys ourselves, move the table's ID
+    sequence past them, so records created later don't collide.
+    """
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), [Model])
+    if not statements:
+        return
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
@@ -0,0 +1,249 @@
+"""
+Column-oriented coercion of raw CSV values into model values.
+
+Instead of converting a row at a time, a batch of rows is transposed
+into columns and each column is converted in one go with the function
+for its type. Values that can't be converted are stored as None and
+reported (with their row and column) so a whole batch can be checked
+before anything is written.
+"""
+from datetime import datetime
+from functools import lru_cache
+import logging
+
+from dateutil import parser as dt_parser
+
+from django_models_from_csv.utils.common import get_setting
+
+
+logger = logging.getLogger(__name__)
+
+
+# characters dropped from numbers: currency signs, thousand separators
+NUMBER_JUNK = ("$", ",")
+
+
+class CoercionError:
+    """
+    A value that couldn't be converted to its column's type. The row
+    number counts from 1, not including the header.
+    """
+    def __init__(self, row, column, value, column_type):
+        self.row = row
+        self.column = column
+        self.value = value
+        self.column_type = column_type
+
+    def __str__(self):
+        return "Row: %s, Column: %s, Error converting %r to %s" % (
+            self.row, self.column, self.value, self.column_type
+        )
+
+
+# Formats we try (with strptime, which is much faster than dateutil) for
+# date, datetime and time values before falling back to dateutil. Each
+# converter remembers the last format that worked, since values in a
+# column almost always share one. Two-digit years are left to dateutil,
+# which picks their century differently than strptime does.
+DATETIME_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S.%f%z",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M",
+    "%m/%d/%Y %I:%M:%S %p",
+    "%m/%d/%Y %I:%M %p",
+    "%m/%d/%Y",
+    "%Y/%m/%d",
+)
+TIME_FORMATS = (
+    "%H:%M:%S",
+    "%H:%M",
+    "%I:%M:%S %p",
+    "%I:%M %p",
+)
+
+
+def make_datetime_converter(out_format, formats, label):
+    """
+    Build a function converting raw CSV values to date/time strings in
+    `out_format`. Values are parsed with the column's detected strptime
+    format, falling back to the other known formats (and then to
+    dateutil) on a miss. Results are memoized, as exports tend to
+    repeat the same values a lot.
+    """
+    detected = [formats[0]]
+
+    def parse(val):
+        try:
+            return datetime.strptime(val, detected[0])
+        except ValueError:
+            pass
+        for fmt in formats:
+            try:
+                parsed = datetime.strptime(val, fmt)
+            except ValueError:
+                continue
+            detected[0] = fmt
+            return parsed
+        return dt_parser.parse(val)
+
+    @lru_cache(maxsize=get_setting("CSV_MODELS_DATE_CACHE_SIZE", 4096))
+    def convert(val):
+        if not val:
+            return None
+        try:
+            return parse(val).strftime(out_format)
+        except Exception as e:
+            logger.error("Error parsing %s: %s" % (label, e))
+            return None
+    return convert
+
+
+def to_float(val):
+    return float(val)
+
+
+def to_int(val):
+    try:
+        return int(val)
+    except ValueError:
+        # allow whole numbers written as floats, e.g. 1.0 or 1e3
+        number = float(val)
+        if not number.is_integer():
+            raise
+        return int(number)
+
+
+def drop_number_junk(value):
+    for junk in NUMBER_JUNK:
+        value = value.replace(junk, "")
+    return value
+
+
+def clean_numbers(values):
+    """
+    Drop the NUMBER_JUNK characters from a column of raw strings. The
+    column is joined and cleaned as a single string, which is a lot
+    faster than cleaning each value, unless a value spans lines.
+    """
+    joined = "\n".join(values)
+    if not any(junk in joined for junk in NUMBER_JUNK):
+        return values
+    cleaned = drop_number_junk(joined).split("\n")
+    if len(cleaned) != len(values):
+        return [drop_number_junk(val) for val in values]
+    return cleaned
+
+
+def number_coercer(convert, fast_convert):
+    """
+    Build a coercer converting a column of raw strings to numbers. The
+    whole column is first converted with `fast_convert` (a builtin,
+    e.g. float) in one go. Only if a value trips that up, e.g. a
+    blank with spaces or something that isn't a number, we go over the
+    values one by one with `convert` to find the ones that failed.
+    """
+    def coerce(values):
+        cleaned = clean_numbers(values)
+        try:
+            return [fast_convert(val) if val else None for val in cleaned], []
+        except (ValueError, OverflowError):
+            pass
+        coerced = []
+        failed = []
+        for ix, val in enumerate(cleaned):
+            val = val.strip()
+            if not val:
+                coerced.append(None)
+                continue
+            try:
+                coerced.append(convert(val))
+            except (ValueError, OverflowError):
+                coerced.append(None)
+                failed.append(ix)
+        return coerced, failed
+    return coerce
+
+
+def value_coercer(convert):
+    """
+    Turn a single-value converter, which returns None for values it
+    can't convert, into a column coercer.
+    """
+    def coerce(values):
+        coerced = list(map(convert, values))
+        failed = [
+            ix for ix, val in enumerate(coerced)
+            if val is None and values[ix].strip()
+        ]
+        return coerced, failed
+    return coerce
+
+
+def noop_coercer(values):
+    return list(values), []
+
+
+def get_column_coercers(headers, dynmodel):
+    """
+    Build a list of column coercers, one for each (model) header. A
+    coercer takes a list of raw CSV values and returns a tuple of the
+    converted values and the indexes of the values that failed.
+    """
+    type_coercers = {
+        "number": lambda: number_coercer(to_float, float),
+        "integer": lambda: number_coercer(to_int, int),
+        "datetime": lambda: value_coercer(make_datetime_converter(
+            "%Y-%m-%d %H:%M:%S", DATETIME_FORMATS, "datetime"
+        )),
+        "date": lambda: value_coercer(make_datetime_converter(
+            "%Y-%m-%d", DATETIME_FORMATS, "date"
+        )),
+        "time": lambda: value_coercer(make_datetime_converter(
+            "%H:%M:%S", TIME_FORMATS, "time"
+        )),
+    }
+    coercers = [noop_coercer] * len(headers)
+    types = [None] * len(headers)
+    for c in dynmodel.columns:
+        make_coercer = type_coercers.get(c.get("type"))
+        if not make_coercer:
+            continue
+        try:
+            ix = headers.index(c["name"])
+        except ValueError:
+            # Possibly a new column not in dynamic model description, ignore
+            continue
+        coercers[ix] = make_coercer()
+        types[ix] = c["type"]
+    return coercers, types
+
+
+def coerce_batch(rows, headers, coercers, types, first_row_number=1,
+                 errors=None):
+    """
+    Convert a batch of raw CSV rows (lists of strings, all as long as
+    the headers) into lists of model values, a column at a time.
+    Failed values become None and, if an `errors` list is given, a
+    CoercionError for each of them is added to it.
+    """
+    if not rows:
+        return []
+    columns = list(zip(*rows))
+    coerced_columns = []
+    for ix, (values, coerce) in enumerate(zip(columns, coercers)):
+        coerced, failed = coerce(list(values))
+        coerced_columns.append(coerced)
+        if errors is None:
+            continue
+        for row_ix in failed:
+            errors.append(CoercionError(
+                first_row_number + row_ix, headers[ix], values[row_ix],
+                types[ix],
+            ))
+    return [list(row) for row in zip(*coerced_columns)]
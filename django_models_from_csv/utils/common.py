@@ -1,3 +1,4 @@
+from itertools import islice
 import json
 import re
 
@@ -24,3 +25,16 @@ def http_response(data, code=200):
         json.dumps(data), status=code,
         content_type="application/json",
     )
+
+
+def chunked(iterable, size):
+    """
+    Break an iterable up into lists of (at most) size items. This
+    lets us work on large imports without holding them in memory.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -1,16 +1,153 @@
+import codecs
+import csv
+import hashlib
+import io
+from itertools import islice
 import re
+from tempfile import SpooledTemporaryFile
 
 from django.utils.translation import gettext_lazy as _
 
-import requests
 from tablib import Dataset
 
 from django_models_from_csv.exceptions import BadCSVError
+from django_models_from_csv.utils.common import get_setting
+from django_models_from_csv.utils.http import fetch, iter_chunks
 
 
 
 SHEETS_BASE = "https://docs.google.com/spreadsheet"
 
+# size of chunks read from remote CSVs and uploads
+CHUNK_SIZE = 64 * 1024
+
+LINE_END_RE = re.compile(r"\r\n|\n|\r")
+
+
+class SpooledCSV:
+    """
+    A CSV read in from a stream of chunks (bytes or text), kept in
+    memory or, once it grows past the CSV_MODELS_SPOOL_MAX_SIZE setting,
+    in a temporary file. The digest of the data is computed as it's
+    spooled. Iterating over this gives the lines of the CSV, so it can
+    be handed directly to csv.reader. Bytes are decoded with
+    `encoding`, or guessed at (see decode_chunks) without one.
+    """
+    def __init__(self, chunks, max_size=None, encoding=None):
+        if max_size is None:
+            max_size = get_setting("CSV_MODELS_SPOOL_MAX_SIZE", 5 * 1024 * 1024)
+        self.file = SpooledTemporaryFile(
+            max_size=max_size, mode="w+", encoding="utf-8", newline="",
+        )
+        hasher = hashlib.sha1()
+
+        def hashed(chunks):
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                hasher.update(chunk)
+                yield chunk
+
+        for text in decode_chunks(hashed(chunks), encoding=encoding):
+            self.file.write(text)
+        self.file.seek(0)
+        self.digest = hasher.hexdigest()
+
+    def peek(self, size=1024):
+        """
+        Return the first size characters of the CSV, without
+        affecting iteration.
+        """
+        position = self.file.tell()
+        self.file.seek(0)
+        data = self.file.read(size)
+        self.file.seek(position)
+        return data
+
+    def __iter__(self):
+        self.file.seek(0)
+        return iter(self.file)
+
+    def close(self):
+        self.file.close()
+
+
+def csv_rows(csv_data):
+    """
+    Return an iterator of rows (lists of strings, the first being
+    the header) for either a CSV string or any iterable of CSV lines
+    (a file, a SpooledCSV, etc).
+    """
+    if isinstance(csv_data, str):
+        csv_data = io.StringIO(csv_data, newline="")
+    return csv.reader(csv_data)
+
+
+def decode_chunks(chunks, encoding=None, fallback="cp1252"):
+    """
+    Decode a stream of chunks (bytes or text, which is passed through)
+    into text. Without an `encoding` (e.g., the server didn't declare
+    a charset), the bytes are decoded as UTF-8 until some that aren't
+    valid UTF-8 turn up, and as `fallback` from there on: spreadsheets
+    exported as "Latin-1" are usually Windows-1252. Bytes that still
+    can't be decoded are replaced instead of failing the import.
+    """
+    if encoding:
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    else:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            yield chunk
+            continue
+        try:
+            yield decoder.decode(chunk)
+        except UnicodeDecodeError:
+            # bytes held back from the previous chunks, then this one
+            pending = decoder.getstate()[0] + chunk
+            decoder = codecs.getincrementaldecoder(fallback)(
+                errors="replace"
+            )
+            yield decoder.decode(pending)
+    try:
+        yield decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        # the data ended in the middle of a UTF-8 sequence
+        yield decoder.getstate()[0].decode(fallback, errors="replace")
+
+
+def iter_lines(chunks, encoding=None):
+    """
+    Turn a stream of chunks (bytes or text) into lines of text, with
+    their line endings, for csv.reader. See decode_chunks for how the
+    bytes are decoded.
+    """
+    pending = ""
+    for chunk in decode_chunks(chunks, encoding=encoding):
+        pending += chunk
+        start = 0
+        for match in LINE_END_RE.finditer(pending):
+            # a \r ending the chunk could be the start of a \r\n
+            if match.end() == len(pending) and match.group() == "\r":
+                break
+            yield pending[start:match.end()]
+            start = match.end()
+        pending = pending[start:]
+    start = 0
+    for match in LINE_END_RE.finditer(pending):
+        yield pending[start:match.end()]
+        start = match.end()
+    if pending[start:]:
+        yield pending[start:]
+
+
+def clean_csv_header(header):
+    """
+    Remove characters from a CSV header that will break building
+    the database table. See clean_csv_headers.
+    """
+    return re.sub("[,\"'\n]", "", header)
+
 
 def extract_key_from_csv_url(url):
     """
@@ -34,7 +171,7 @@ def clean_csv_headers(csv):
     doesn't like header columns with these chars in it.
     """
     data = Dataset().load(csv, format="csv")
-    headers = [re.sub("[,\"'\n]", "", h) for h in data.headers]
+    headers = [clean_csv_header(h) for h in data.headers]
 
     new_data = Dataset(headers=headers)
     for row in data:
@@ -42,6 +179,130 @@ def clean_csv_headers(csv):
     return new_data.export("csv")
 
 
+def iter_clean_csv(csv_data):
+    """
+    Streaming version of clean_csv_headers: takes a CSV string or any
+    iterable of CSV lines and yields the lines of the same CSV, with
+    the headers cleaned up.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for ix, row in enumerate(csv_rows(csv_data)):
+        if ix == 0:
+            row = [clean_csv_header(h) for h in row]
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def get_csv_export_url(csv_url):
+    """
+    Convert Google Sheet share links into CSV export URLs. Other
+    URLs are returned as-is.
+    """
+    if csv_url.startswith(SHEETS_BASE):
+        key = extract_key_from_csv_url(csv_url)
+        return '{0}/ccc?key={1}&output=csv'.format(
+            SHEETS_BASE, key
+        )
+    return csv_url
+
+
+def get_declared_encoding(response):
+    """
+    Return the charset a response's Content-Type declares, or None if
+    it doesn't declare a known one. (requests' own `encoding` assumes
+    ISO-8859-1 for any text/* type without a charset.)
+    """
+    content_type = response.headers.get("Content-Type") or ""
+    match = re.search(r"charset=[\"']?([\w.:-]+)", content_type, re.I)
+    if not match:
+        return None
+    try:
+        return codecs.lookup(match.group(1)).name
+    except LookupError:
+        return None
+
+
+def check_csv_status(response, csv_url):
+    """
+    Raise if the server answered with an error (e.g., a 404, or a 5xx
+    that fetch gave up retrying) instead of the CSV.
+    """
+    if response.status_code >= 400:
+        response.close()
+        raise BadCSVError("HTTP %s fetching %s" % (
+            response.status_code, csv_url
+        ))
+
+
+def check_csv_response(data):
+    """
+    Raise if we got a HTML page (login page, error page, etc)
+    instead of a CSV.
+    """
+    if re.match(r"^\s*<!DOCTYPE html>", data, re.M|re.I):
+        raise BadCSVError(_("Error importing from CSV URL."))
+
+
+def fetch_csv_if_changed(csv_url, validators=None):
+    """
+    Stream a CSV (see fetch_csv for supported URLs) into a SpooledCSV,
+    doing a conditional request using the ETag and Last-Modified values
+    (`validators`, a dict) we saw on a previous fetch. Returns a tuple
+    of the SpooledCSV, or None if the server told us it hasn't changed,
+    and the new validators dict.
+    """
+    validators = validators or {}
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    r = fetch(get_csv_export_url(csv_url), headers=headers, stream=True)
+    if r.status_code == 304:
+        r.close()
+        return None, validators
+    check_csv_status(r, csv_url)
+
+    spooled = SpooledCSV(
+        iter_chunks(r, CHUNK_SIZE), encoding=get_declared_encoding(r),
+    )
+    check_csv_response(spooled.peek())
+    new_validators = {
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+    }
+    return spooled, new_validators
+
+
+def fetch_csv_sample(csv_url, max_rows=None):
+    """
+    Stream the start of a CSV (see fetch_csv for supported URLs) into
+    a SpooledCSV, with its headers cleaned up: the header and the first
+    `max_rows` rows (CSV_MODELS_INFERENCE_MAX_ROWS by default, 0 reads
+    them all), which is as far as column inference looks. The rest of
+    the source isn't downloaded.
+    """
+    if max_rows is None:
+        max_rows = get_setting("CSV_MODELS_INFERENCE_MAX_ROWS", 100000)
+    r = fetch(get_csv_export_url(csv_url), stream=True)
+    check_csv_status(r, csv_url)
+    try:
+        lines = iter_clean_csv(iter_lines(
+            r.iter_content(CHUNK_SIZE), encoding=get_declared_encoding(r),
+        ))
+        if max_rows:
+            lines = islice(lines, max_rows + 1)
+        sample = SpooledCSV(lines)
+    finally:
+        r.close()
+    check_csv_response(sample.peek())
+    return sample
+
+
 # NOTE: InvalidDimensions
 def fetch_csv(csv_url):
     """
@@ -53,14 +314,10 @@ def fetch_csv(csv_url):
 
     ... and return the corresponding CSV.
     """
-    url = csv_url
-    if csv_url.startswith(SHEETS_BASE):
-        key = extract_key_from_csv_url(csv_url)
-        url = '{0}/ccc?key={1}&output=csv'.format(
-            SHEETS_BASE, key
-        )
-    r = requests.get(url)
-    data = r.text
-    if re.match(r"^\s*<!DOCTYPE html>", data, re.M|re.I):
-        raise BadCSVError(_("Error importing from CSV URL."))
+    r = fetch(get_csv_export_url(csv_url))
+    check_csv_status(r, csv_url)
+    data = "".join(decode_chunks(
+        [r.content], encoding=get_declared_encoding(r),
+    ))
+    check_csv_response(data)
     return clean_csv_headers(data)
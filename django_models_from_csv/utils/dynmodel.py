@@ -1,55 +1,29 @@
 from functools import wraps
 import logging
 import re
-from io import StringIO
 
-from django.db import connections, transaction
-from tablib import Dataset
+from django.core.files import File
 
-from django_models_from_csv.commands.csvsql import run_csvsql
-from django_models_from_csv.commands.manage_py import run_inspectdb
 from django_models_from_csv.exceptions import (
     UniqueColumnError, DataSourceExistsError, NoPrivateSheetCredentialsError,
 )
 from django_models_from_csv.models import DynamicModel
-from django_models_from_csv.utils.common import get_setting, slugify
-from django_models_from_csv.utils.csv import fetch_csv, clean_csv_headers
+from django_models_from_csv.utils.common import slugify
+from django_models_from_csv.utils.csv import (
+    fetch_csv_sample, csv_rows, iter_clean_csv, SpooledCSV, CHUNK_SIZE,
+)
 from django_models_from_csv.utils.models_py import (
-    fix_models_py, extract_field_declaration_args_eval,
+    extract_field_declaration_args_eval,
     extract_field_type, extract_fields
 )
 from django_models_from_csv.utils.screendoor import ScreendoorImporter
 from django_models_from_csv.utils.google_sheets import PrivateSheetImporter
+from django_models_from_csv.utils.inference import infer_columns
 
 
 logger = logging.getLogger(__name__)
 
 
-CSV_MODELS_TEMP_DB = get_setting(
-    "CSV_MODELS_TEMP_DB"
-)
-
-
-@transaction.atomic(using=CSV_MODELS_TEMP_DB)
-def execute_sql(sql, params=None):
-    """
-    Run a SQL query against our secondary in-memory database. Returns
-    the table name, if this was a CREATE TABLE command, otherwise just
-    returns None.
-    """
-    conn = connections[CSV_MODELS_TEMP_DB]
-    cursor = conn.cursor()
-    if params is None:
-        cursor.execute(sql)
-    else:
-        cursor.execute(sql, params)
-    matches = re.findall("CREATE TABLE ([^ ]+) \\(", sql)
-    if not matches:
-        return None
-    table_name = matches[0]
-    return table_name
-
-
 def require_unique_name(f):
     @wraps(f)
     def unique_name_wrapper(*args, **kwargs):
@@ -62,11 +36,15 @@ def require_unique_name(f):
 
 def csv_precheck(csv_data):
     """
-    Do some basic sanity checks on a CSV.
+    Do some basic sanity checks on a CSV (a string or any iterable of
+    CSV lines). Only the header row is read.
     """
-    data = Dataset().load(csv_data, format="csv")
+    try:
+        headers = next(csv_rows(csv_data))
+    except StopIteration:
+        headers = []
     unique_names = []
-    for header in data.headers:
+    for header in headers:
         if header in unique_names:
             raise UniqueColumnError(header)
         unique_names.append(header)
@@ -119,25 +97,18 @@ def from_csv(name, csv_data, **kwargs):
     """
     Create a dynamic model from some CSV data (a string of a CSV).
     The model is given a specified name and is populated with the
-    attributes found in kwargs.
+    attributes found in kwargs. Column names and types are inferred
+    from a sample of the rows.
     """
     logger.debug("New model from CSV:\n %s" % name)
     csv_precheck(csv_data)
-    # build SQL from CSV
-    sql = run_csvsql(csv_data)
-    logger.debug("SQL: %s" % sql)
-    # create these tables in our DB
-    table_name = execute_sql(sql)
-    logger.debug("table_name: %s" % table_name)
-    # build models.py from this DB
-    models_py = run_inspectdb(table_name=table_name)
-    logger.debug("models_py: %s" % models_py)
-    # # wipe the temporary table
-    # logger.debug("Dropping temporary table '%s'" % (table_name))
-    # execute_sql("DROP TABLE %s", [table_name])
-    fixed_models_py = fix_models_py(models_py)
-    logger.debug("fixed_models_py: %s" % fixed_models_py)
-    return from_models_py(name, fixed_models_py, **kwargs)
+    columns = infer_columns(csv_data)
+    logger.info("from_csv Columns: %s" % columns)
+    return DynamicModel.objects.create(
+        name=name,
+        columns=columns,
+        **kwargs
+    )
 
 
 @require_unique_name
@@ -146,17 +117,24 @@ def from_csv_file(filename, file):
     Import a file from an upload, using its filename as the data
     source name.
     """
-    csv = clean_csv_headers(file.read().decode("utf-8"))
     name = filename
     no_ext = re.findall(r"^(.*)\.csv$", name)
     if no_ext:
         name = no_ext[0]
-    dynmodel = from_csv(slugify(name), csv)
-    with StringIO() as fio:
-        fio.write(csv)
-        dynmodel.csv_file.save(name, fio)
+    # the upload is streamed through a (possibly on-disk) spool, so
+    # large files never have to be held in memory
+    upload = SpooledCSV(file.chunks(chunk_size=CHUNK_SIZE))
+    try:
+        csv = SpooledCSV(iter_clean_csv(upload))
+    finally:
+        upload.close()
+    try:
+        dynmodel = from_csv(slugify(name), csv)
+        dynmodel.csv_file.save(name, File(csv.file))
         dynmodel.save()
         return dynmodel
+    finally:
+        csv.close()
 
 
 @require_unique_name
@@ -165,10 +143,15 @@ def from_csv_url(name, csv_url):
     Build a dynamic model from a CSV URL. This supports Google
     Sheets share URLs and normal remote CSVs.
     """
-    csv = fetch_csv(csv_url)
-    return from_csv(name, csv, **dict(
-        csv_url=csv_url
-    ))
+    # only what inference needs is fetched, the whole source gets
+    # checked against the columns afterwards (see validate_source)
+    csv = fetch_csv_sample(csv_url)
+    try:
+        return from_csv(name, csv, **dict(
+            csv_url=csv_url
+        ))
+    finally:
+        csv.close()
 
 
 @require_unique_name
@@ -17,7 +17,11 @@ logger = logging.getLogger(__name__)
 
 
 class PrivateSheetImporter:
-    SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
+    SCOPES = [
+        "https://www.googleapis.com/auth/spreadsheets.readonly",
+        # used to check the last modified time of a sheet
+        "https://www.googleapis.com/auth/drive.metadata.readonly",
+    ]
 
     def __init__(self, credentials):
         """
@@ -41,6 +45,7 @@ class PrivateSheetImporter:
         # TODO: catch authentication error, return friendly msg. (we
         #       might we need to do this above as well)
         self.service = discovery.build("sheets", "v4", credentials=creds)
+        self.creds = creds
 
     def get_sheet_information(self, sheet_id):
         """
@@ -139,6 +144,24 @@ class PrivateSheetImporter:
         except HttpError as e:
             raise BadCSVError(_("Bad URL or permission denied to sheet."))
 
+    def get_modified_time(self, sheet_url):
+        """
+        Return the time a sheet was last modified (an RFC 3339 string)
+        using the Google Drive API. Returns None if this information
+        isn't available, e.g., the Drive API isn't enabled for the
+        service account's project.
+        """
+        sheet_id = extract_key_from_csv_url(sheet_url)
+        try:
+            drive = discovery.build("drive", "v3", credentials=self.creds)
+            return drive.files().get(
+                fileId=sheet_id, fields="modifiedTime",
+                supportsAllDrives=True,
+            ).execute().get("modifiedTime")
+        except Exception as e:
+            logger.warning("Unable to get sheet modified time: %s" % e)
+            return None
+
     def get_csv_from_url(self, sheet_url):
         """
         Return a CSV (text data) from a protected Google sheet URL.
@@ -0,0 +1,123 @@
+"""
+Shared HTTP fetching for the data source importers (CSV URLs,
+Screendoor's API).
+
+Requests go through a pooled requests Session (one per thread and
+process, as sessions aren't safe to share between them), so paginated
+API calls reuse their connections. Every request has connect and read
+timeouts, and requests that fail with a connection error, a timeout,
+a 429 or a 5xx response are retried with jittered exponential backoff.
+Responses can be streamed, see `iter_chunks`.
+"""
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django_models_from_csv.utils.common import get_setting
+
+
+logger = logging.getLogger(__name__)
+
+
+# response statuses worth trying again
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_local = threading.local()
+
+
+def get_session():
+    """
+    Return this thread's Session, building it if needed (or if this
+    is a forked process that inherited its parent's).
+    """
+    session = getattr(_local, "session", None)
+    if session is not None and _local.pid == os.getpid():
+        return session
+    pool_size = get_setting("CSV_MODELS_HTTP_POOL_SIZE", 10)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    _local.session = session
+    _local.pid = os.getpid()
+    return session
+
+
+def get_timeout():
+    """
+    The (connect, read) timeouts, in seconds, for our requests.
+    """
+    return (
+        get_setting("CSV_MODELS_HTTP_CONNECT_TIMEOUT", 10),
+        get_setting("CSV_MODELS_HTTP_READ_TIMEOUT", 60),
+    )
+
+
+def retry_delay(attempt, response=None):
+    """
+    Seconds to wait before retrying a request: a random amount up to
+    an exponentially growing limit (so that many clients retrying at
+    once get spread out), or what the server asked for, if it sent a
+    Retry-After header (in seconds).
+    """
+    max_delay = get_setting("CSV_MODELS_HTTP_MAX_BACKOFF", 60)
+    retry_after = response is not None and response.headers.get(
+        "Retry-After"
+    )
+    if retry_after and retry_after.isdigit():
+        return min(int(retry_after), max_delay)
+    backoff = get_setting("CSV_MODELS_HTTP_BACKOFF", 1)
+    return random.uniform(0, min(backoff * 2 ** attempt, max_delay))
+
+
+def fetch(url, headers=None, stream=False, retries=None):
+    """
+    GET a URL. Connection errors, timeouts and retryable responses
+    (see RETRY_STATUSES) are retried up to `retries` times (defaults
+    to the CSV_MODELS_HTTP_RETRIES setting). After that, the last
+    error is raised or the last response returned, so callers need to
+    check its status. Returns a requests Response, with its body not
+    read yet if `stream` is set.
+    """
+    if retries is None:
+        retries = get_setting("CSV_MODELS_HTTP_RETRIES", 3)
+    session = get_session()
+    attempt = 0
+    while True:
+        try:
+            response = session.get(
+                url, headers=headers, stream=stream, timeout=get_timeout(),
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= retries:
+                raise
+            logger.warning("Error fetching %s, retrying: %s" % (url, e))
+            time.sleep(retry_delay(attempt))
+            attempt += 1
+            continue
+        if response.status_code not in RETRY_STATUSES or attempt >= retries:
+            return response
+        logger.warning("Got HTTP %s fetching %s, retrying" % (
+            response.status_code, url
+        ))
+        response.close()
+        time.sleep(retry_delay(attempt, response=response))
+        attempt += 1
+
+
+def iter_chunks(response, chunk_size):
+    """
+    Iterate over the (decompressed) body of a streamed response in
+    chunks of bytes, closing the response afterwards.
+    """
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            yield chunk
+    finally:
+        response.close()
@@ -1,13 +1,26 @@
-import importlib
+from collections import Counter, OrderedDict
+import hashlib
+import json
 import logging
 
-from dateutil import parser as dt_parser
+from django.apps import apps
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
 from import_export.resources import (
     ModelResource, ModelDeclarativeMetaclass,
 )
 from tablib import Dataset
 
+from django_models_from_csv.schema import ModelSchemaEditor
+from django_models_from_csv.utils.coercion import (
+    coerce_batch, get_column_coercers,
+)
+from django_models_from_csv.utils.bulk_load import load_rows, reset_sequences
+from django_models_from_csv.utils.common import chunked, get_setting
+from django_models_from_csv.utils.csv import clean_csv_header, csv_rows
+from django_models_from_csv.utils.pipeline import Pipeline
+
 
 logger = logging.getLogger(__name__)
 
@@ -36,164 +49,708 @@ def modelresource_factory(model, resource_class=ModelResource, extra_attrs=None)
     return metaclass(class_name, (resource_class,), class_attrs)
 
 
-# TODO: handle invaliddimensions from dataset.load
+def iter_import_rows(csv, dynmodel, batch_size=None, errors=None):
+    """
+    Take a fetched CSV (a string, or any iterable of CSV lines like a
+    file or SpooledCSV) and lazily turn it into row dicts, keyed by
+    model field name, with values converted for the model's column
+    types. Rows are read and converted in batches of `batch_size`
+    (see coerce_batch), so memory use doesn't depend on the size of
+    the CSV. Values that failed to convert are added to `errors`,
+    if given.
+
+    For sources without an ID column, an "id" matching the row
+    number is added.
+    """
+    if batch_size is None:
+        batch_size = get_setting("CSV_MODELS_IMPORT_BATCH_SIZE", 500)
+
+    rows = csv_rows(csv)
+    try:
+        headers = next(rows)
+    except StopIteration:
+        return
+
+    # Turn our CSV columns into model columns. Try the header as-is
+    # first, then with the characters that break table creation removed
+    model_headers = []
+    for header in headers:
+        model_header = dynmodel.csv_header_to_model_header(header)
+        if not model_header:
+            model_header = dynmodel.csv_header_to_model_header(
+                clean_csv_header(header)
+            )
+        model_headers.append(model_header or header)
+
+    add_id = bool(dynmodel.csv_url or dynmodel.csv_file)
+    coercers, types = get_column_coercers(model_headers, dynmodel)
+    n_headers = len(model_headers)
+
+    def padded_rows():
+        for row in rows:
+            # skip blank lines, pad short rows, drop extra cells
+            if not row:
+                continue
+            if len(row) < n_headers:
+                row += [""] * (n_headers - len(row))
+            yield row[:n_headers]
+
+    row_number = 0
+    for batch in chunked(padded_rows(), batch_size):
+        values = coerce_batch(
+            batch, model_headers, coercers, types,
+            first_row_number=row_number + 1, errors=errors,
+        )
+        for row_values in values:
+            row_number += 1
+            data = {}
+            if add_id:
+                data["id"] = row_number
+            data.update(zip(model_headers, row_values))
+            yield data
+
+
 def import_records_list(csv, dynmodel):
     """
     Take a fetched CSV and turn it into a tablib Dataset, with
     a row ID column and all headers translated to model field names.
     """
-    data = Dataset().load(csv, format="csv")
-    # add an ID column matching the row number
-    if dynmodel.csv_url or dynmodel.csv_file:
-        data.insert_col(0, col=[i+1 for i in range(len(data))], header="id")
-    # # screendoor: use the builtin ID field
-    # elif dynmodel.csv_url:
-    #     # data.insert_col(0, col=[i+1 for i in range(len(data))], header="id")
-
-    # Turn our CSV columns into model columns
-    for i in range(len(data.headers)):
-        header = data.headers[i]
-        model_header = dynmodel.csv_header_to_model_header(header)
-        if model_header and header != model_header:
-            data.headers[i] = model_header
-
-    datetime_ixs = []
-    date_ixs = []
-    number_ixs = []
-    for c in dynmodel.columns:
-        c_type = c.get("type")
-        type_ixs = None
-        if c_type and c_type == "datetime":
-            type_ixs = datetime_ixs
-        elif c_type and c_type == "date":
-            type_ixs = date_ixs
-        elif c_type and c_type == "number":
-            type_ixs = number_ixs
-        else:
+    data = None
+    for row in iter_import_rows(csv, dynmodel):
+        if data is None:
+            data = Dataset(headers=list(row.keys()))
+        data.append(list(row.values()))
+    return data if data is not None else Dataset()
+
+
+class ImportReport(list):
+    """
+    The outcome of an import. This is the list of errors encountered
+    (so callers can keep treating it as such) with counts of how many
+    rows were inserted, updated or skipped because they hadn't
+    changed since the last import. If the whole source was unchanged
+    and the import was skipped, `skipped` is set.
+
+    Values that couldn't be converted to their column's type are
+    imported as empty values. They're not errors, but they're kept in
+    `warnings` (as CoercionErrors, which have the row and column of
+    each value).
+
+    For a dry run (see `preview_records`) `dry_run` is set, the counts
+    are of what the import would do and `column_changes` has the number
+    of updated rows each column would change in. When an import
+    replaces all of the records (see `replace_records`), `deleted` is
+    the number of records that were no longer in the source. If the
+    source was already being imported by someone else, `locked` is set
+    (see DynamicModel.import_data).
+
+    `pipeline_failures` counts the rows the data pipeline couldn't
+    process (e.g., redaction failed). They're imported, but not taken
+    as up to date, so the next import processes them again.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.warnings = []
+        self.column_changes = Counter()
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.pipeline_failures = 0
+        self.skipped = False
+        self.locked = False
+        self.dry_run = False
+
+    @property
+    def failed_rows(self):
+        """
+        Number of rows with values that couldn't be converted.
+        """
+        return len({e.row for e in self.warnings})
+
+    def summary(self):
+        if self.skipped:
+            return "skipped: unchanged"
+        if self.locked:
+            return "skipped: already importing"
+        summary = "inserted: %s, updated: %s, unchanged: %s, errors: %s" % (
+            self.inserted, self.updated, self.unchanged, len(self)
+        )
+        if self.deleted:
+            summary = "%s, deleted: %s" % (summary, self.deleted)
+        if self.warnings:
+            summary = "%s, warnings: %s" % (summary, len(self.warnings))
+        if self.pipeline_failures:
+            summary = "%s, pipeline failures: %s" % (
+                summary, self.pipeline_failures
+            )
+        if self.dry_run:
+            summary = "dry run, %s" % summary
+        return summary
+
+
+def log_warnings(dynmodel, report, limit=20):
+    """
+    Log (the first `limit` of) the values an import couldn't convert.
+    """
+    for warning in report.warnings[:limit]:
+        logger.warning("%s: %s" % (dynmodel.name, warning))
+
+
+def columns_fingerprint(dynmodel):
+    """
+    Hash the parts of the import configuration that affect how a row
+    ends up stored: the column descriptions and the data pipeline.
+    Changing either of these invalidates all stored row fingerprints.
+    """
+    config = [
+        dynmodel.columns,
+        list(getattr(settings, "DATA_PIPELINE", [])),
+    ]
+    return hashlib.sha1(
+        json.dumps(config, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def row_fingerprint(row, fields, salt=""):
+    """
+    Build a compact hash of a row's (normalized) values, in the
+    order of the given fields.
+    """
+    values = [salt] + [row.get(f) for f in fields]
+    return hashlib.sha1(
+        json.dumps(values, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def get_stored_fingerprints(dynmodel, pks):
+    """
+    Return a dict of record ID (as string) => fingerprint for the
+    given primary keys.
+    """
+    RecordFingerprint = apps.get_model(
+        "django_models_from_csv", "RecordFingerprint"
+    )
+    return dict(RecordFingerprint.objects.filter(
+        dynmodel=dynmodel, record_id__in=[str(pk) for pk in pks]
+    ).values_list("record_id", "fingerprint"))
+
+
+def store_fingerprints(dynmodel, fingerprints):
+    """
+    Replace the stored fingerprints for the given records. Takes a
+    dict of primary key => fingerprint.
+    """
+    if not fingerprints:
+        return
+    RecordFingerprint = apps.get_model(
+        "django_models_from_csv", "RecordFingerprint"
+    )
+    record_ids = [str(pk) for pk in fingerprints.keys()]
+    with transaction.atomic():
+        RecordFingerprint.objects.filter(
+            dynmodel=dynmodel, record_id__in=record_ids
+        ).delete()
+        RecordFingerprint.objects.bulk_create([
+            RecordFingerprint(
+                dynmodel=dynmodel, record_id=str(pk), fingerprint=fp
+            ) for pk, fp in fingerprints.items()
+        ])
+
+
+def get_importable_fields(Model, column_names):
+    """
+    Return the names of the concrete (non-ID) model fields that
+    can be written during an import.
+    """
+    fields = []
+    for field in Model._meta.concrete_fields:
+        if field.primary_key or field.name not in column_names:
             continue
+        fields.append(field.name)
+    return fields
+
 
-        name = c["name"]
+def key_rows_by_pk(batch, Model, errors):
+    """
+    Key a list of row dicts by their (converted) primary key. Later
+    rows with the same ID win, same as running them through one by
+    one. Rows with unusable IDs are reported in errors and dropped.
+    """
+    pk_field = Model._meta.pk
+    rows = OrderedDict()
+    for row in batch:
         try:
-            ix = data.headers.index(name)
-        except ValueError:
-            # Possibly a new column not in dynamic model description, ignore
+            pk = pk_field.to_python(row.get("id"))
+        except Exception as e:
+            logger.error("Error creating: %s" % str(e))
+            errors.append("Row: %s, Error creating: %s" % (row.get("id"), e))
             continue
-        type_ixs.append(ix)
-
-    newdata = Dataset(headers=data.headers)
-    for row in data:
-        newrow = []
-        for i in range(len(row)):
-            val = row[i]
-            if i in datetime_ixs:
-                if not val:
-                    newrow.append(None)
-                    continue
-                try:
-                    val = dt_parser.parse(val).strftime("%Y-%m-%d %H:%M:%S")
-                except Exception as e:
-                    logger.error("Error parsing datetime: %s" % e)
-                    newrow.append(None)
-                    continue
-            elif i in date_ixs:
-                if not val:
-                    newrow.append(None)
-                    continue
-                try:
-                    val = dt_parser.parse(val).strftime("%Y-%m-%d")
-                except Exception as e:
-                    logger.error("Error parsing date: %s" % e)
-                    newrow.append(None)
-                    continue
-            elif i in number_ixs:
-                val = val.replace("$", "").replace(",", "")
-            newrow.append(val)
-        newdata.append(newrow)
-    return newdata
+        rows[pk] = row
+    return rows
+
+
+def import_rows_individually(rows, Model, fields, existing):
+    """
+    Fallback for a batch that failed to bulk import: save each row
+    on its own so we can tell the user exactly which rows are broken.
+
+    Returns a tuple of the successfully saved objects and a list
+    of errors.
+    """
+    objects = []
+    errors = []
+    for pk, row in rows.items():
+        obj_data = {f: row[f] for f in row.keys() if f in fields}
+        if pk in existing:
+            try:
+                with transaction.atomic():
+                    obj = Model.objects.get(pk=pk)
+                    for field, value in obj_data.items():
+                        setattr(obj, field, value)
+                    obj.save()
+            except Exception as e:
+                logger.error("Error updating: %s" % str(e))
+                errors.append("Row: %s, Error updating: %s" % (pk, e))
+                continue
+        else:
+            try:
+                with transaction.atomic():
+                    obj = Model.objects.create(id=pk, **obj_data)
+            except Exception as e:
+                logger.error("Error creating: %s" % str(e))
+                errors.append("Row: %s, Error creating: %s" % (pk, e))
+                continue
+        objects.append(obj)
+    return objects, errors
+
+
+def import_batch(rows, Model, fields, existing):
+    """
+    Import rows (a dict of primary key => row dict) into the specified
+    model using a bulk insert for the new rows and a bulk update for
+    the existing ones (primary keys found in `existing`), all in a
+    single transaction.
+
+    If the batch fails to write (bad values, constraint errors, etc)
+    we fall back to importing it row by row in order to collect the
+    per-row errors.
+
+    Returns a tuple of the imported objects and a list of errors.
+    """
+    to_create = []
+    to_update = []
+    update_fields = set()
+    for pk, row in rows.items():
+        obj_data = {f: row[f] for f in row.keys() if f in fields}
+        obj = Model(pk=pk, **obj_data)
+        if pk in existing:
+            update_fields.update(obj_data.keys())
+            to_update.append(obj)
+        else:
+            to_create.append(obj)
+
+    try:
+        with transaction.atomic():
+            if to_create:
+                Model.objects.bulk_create(to_create)
+            if to_update and update_fields:
+                Model.objects.bulk_update(to_update, list(update_fields))
+    except Exception as e:
+        logger.warning("Bulk import failed, retrying by row: %s" % e)
+        return import_rows_individually(rows, Model, fields, existing)
+
+    return to_create + to_update, []
+
+
+def bulk_load_batch(rows, Model, fields):
+    """
+    Write a batch of new rows (a dict of primary key => row dict) with
+    the fastest method the database has (see utils.bulk_load). If that
+    fails, e.g. because of a bad value, fall back to `import_batch`
+    so we get the errors for individual rows.
+
+    Returns a tuple of the primary keys written and a list of errors.
+    """
+    try:
+        with transaction.atomic():
+            load_rows(Model, fields, rows)
+    except Exception as e:
+        logger.warning("Bulk load failed, falling back to import: %s" % e)
+        objects, errors = import_batch(rows, Model, fields, set())
+        return [obj.pk for obj in objects], errors
+    return list(rows.keys()), []
+
+
+def import_records_batch(batch, Model, dynmodel, fields, salt, pipeline,
+                         report, bulk_load=False):
+    """
+    Import one batch of rows (see `import_records`), adding the
+    outcome to the report. Returns the number of rows processed.
+
+    Blank metadata records are attached to the written records that
+    don't have one yet, all at once. With `bulk_load`, new rows are
+    written without going through the ORM (see `bulk_load_batch`) and
+    their metadata is left for after the whole load.
+    """
+    from collaborative import signals
+
+    # we can only track fingerprints for saved data sources
+    use_fingerprints = dynmodel.pk is not None
+
+    rows = key_rows_by_pk(batch, Model, report)
+    existing = set(Model.objects.filter(
+        pk__in=list(rows.keys())
+    ).values_list("pk", flat=True))
+
+    # find the rows whose content changed since the last import.
+    # rows that were deleted from the table get re-created
+    fingerprints = {
+        pk: row_fingerprint(row, fields, salt=salt)
+        for pk, row in rows.items()
+    }
+    stored = {}
+    if use_fingerprints:
+        stored = get_stored_fingerprints(dynmodel, rows.keys())
+    changed = OrderedDict()
+    for pk, row in rows.items():
+        if pk in existing and stored.get(str(pk)) == fingerprints[pk]:
+            report.unchanged += 1
+            continue
+        changed[pk] = row
+
+    # This runs the data pipeline. Each step is passed the batch
+    # of data rows (dicts), optionally modifies them and returns the
+    # rows it failed on, if any. Those have to go through it again
+    # next time, so they don't get a fingerprint
+    changed_pks = list(changed.keys())
+    failed_pks = {
+        changed_pks[ix] for ix in pipeline.run(
+            changed.values(), columns=dynmodel.columns
+        )
+    }
+    report.pipeline_failures += len(failed_pks)
+
+    if bulk_load and not existing:
+        saved_pks, batch_errors = bulk_load_batch(changed, Model, fields)
+        objects = []
+    else:
+        objects, batch_errors = import_batch(changed, Model, fields, existing)
+        saved_pks = [obj.pk for obj in objects]
+    report += batch_errors
+
+    for pk in saved_pks:
+        if pk in existing:
+            report.updated += 1
+        else:
+            report.inserted += 1
+
+    if use_fingerprints:
+        store_fingerprints(dynmodel, {
+            pk: fingerprints[pk] for pk in saved_pks
+            if pk not in failed_pks
+        })
+
+    # bulk_create doesn't fire post_save, so link up metadata here
+    if objects:
+        signals.attach_blank_meta_to_records(Model, pks=saved_pks)
+
+    return len(batch)
 
 
 # TODO: handle errors here. this happens on refine import
 #       and also during refresh data sources command
-def import_records(csv, Model, dynmodel):
+def import_records(csv, Model, dynmodel, batch_size=None, progress=None):
     """
     Take a fetched CSV, parse it into user rows for
     insertion and attempt to import the data into the
-    specified model.
+    specified model. The CSV can be a string or any iterable
+    of CSV lines (see `iter_import_rows`).
+
+    Rows are streamed and processed in batches of `batch_size`
+    (defaults to the CSV_MODELS_IMPORT_BATCH_SIZE setting). For each
+    batch we look up which records already exist and the fingerprints
+    of their values from the last import, skip the rows that haven't
+    changed and bulk write the rest (see `import_batch`). After each
+    batch, `progress` (if given) is called with the stage ("importing")
+    and the number of rows processed so far.
+
+    If the model's table is empty (a first import), rows are written
+    directly to the database, using COPY on PostgreSQL, in larger
+    batches (CSV_MODELS_BULK_LOAD_BATCH_SIZE, unless `batch_size` is
+    given) and their metadata records are created afterwards with a
+    single statement. Set CSV_MODELS_BULK_LOAD to False to turn this
+    off.
 
     This performs a pre-import routine which will return
     failure information we can display and let the user fix
-    the dynmodel before trying again. On success this function
-    returns None.
+    the dynmodel before trying again. Returns an ImportReport,
+    which is empty (falsy) when no errors occurred.
 
     TODO: Only show N number of errors. If there are more,
     tell the user more errors have been supressed and to
     fix the ones listed before continuing. We don't want
     to overwhelm the user with error messages.
     """
-    dataset = import_records_list(csv, dynmodel)
+    from collaborative import signals
+
     column_names = [c.get("name") for c in dynmodel.columns]
     logger.debug("Column names: %s" % str(column_names))
-    # logger.debug("Dataset: %s" % dataset)
+    fields = get_importable_fields(Model, column_names)
+    salt = columns_fingerprint(dynmodel)
 
-    # Do headers check
-    errors = []
-    for row in dataset.dict:
-        # This runs the data pipeline. Assumes each step is passed
-        # a data row (dict), optionally modifies it, returns nothing
-        for pipeline in getattr(settings, "DATA_PIPELINE", []):
-            module = importlib.import_module(pipeline)
-            module.run(row, columns=dynmodel.columns)
-
-        # logger.debug("Importing: %s" % str(row))
-        # 1. check fields, any extra fields are thrown out?
-        #    or is this done above?
-        # 2. get or create by ID
-        obj = None
-        try:
-            obj = Model.objects.get(pk=row["id"])
-        except Model.DoesNotExist:
-            pass
-
-        # logger.debug("Found object? %s" % obj)
-
-        # update all fieds found in our model columns, but
-        # leave out the id field (already attached to obj above)
-        if obj is not None:
-            for field in row.keys():
-                if field == "id" or field not in column_names:
-                    continue
-                # logger.debug("updating field=%s value=%s" % (field, row[field]))
-                setattr(obj, field, row[field])
-            try:
-                obj.save()
-            except Exception as e:
-                logger.error("Error updating: %s" % str(e))
-                errors.append("Row: %s, Error updating: %s" % (
-                    obj.id, e
-                ))
-                continue
+    # loading into an empty table can skip the ORM entirely
+    bulk_load = get_setting("CSV_MODELS_BULK_LOAD", True) and (
+        not Model.objects.exists()
+    )
+    if batch_size is None and bulk_load:
+        batch_size = get_setting("CSV_MODELS_BULK_LOAD_BATCH_SIZE", 10000)
+    elif batch_size is None:
+        batch_size = get_setting("CSV_MODELS_IMPORT_BATCH_SIZE", 500)
 
-        # create new using similar strategy, but we went
-        # to include the id field
-        else:
-            obj_data = {}
-            for field in row.keys():
-                if field != "id" and field not in column_names:
-                    continue
-                # logger.debug("creating field=%s value=%s" % (field, row[field]))
-                obj_data[field] = row[field]
+    report = ImportReport()
+    rows_processed = 0
+    rows = iter_import_rows(
+        csv, dynmodel, batch_size=batch_size, errors=report.warnings,
+    )
+    # metadata is attached a batch at a time, not by the per-record
+    # post_save signal (see import_records_batch)
+    with Pipeline() as pipeline, signals.suppress_meta_signals():
+        for batch in chunked(rows, batch_size):
+            rows_processed += import_records_batch(
+                batch, Model, dynmodel, fields, salt, pipeline, report,
+                bulk_load=bulk_load,
+            )
+            if progress:
+                progress("importing", rows_processed)
 
-            try:
-                obj = Model.objects.create(**obj_data)
-                obj.save()
-            except Exception as e:
-                logger.error("Error creating: %s" % str(e))
-                errors.append("Row: %s, Error creating: %s" % (
-                    obj_data.get("id"), e
+    if bulk_load and report.inserted:
+        reset_sequences(Model)
+        signals.attach_blank_meta_to_records(Model)
+
+    logger.info("Import of %s complete. %s" % (
+        dynmodel.name, report.summary()
+    ))
+    log_warnings(dynmodel, report)
+    return report
+
+
+def swap_in_staging(Model, StagingModel, fields, dynmodel, report):
+    """
+    Replace the contents of the model's table with the staging table's,
+    in a single transaction. Records that are in both keep their
+    primary keys, so metadata pointing at them stays linked. Records
+    that aren't in the staging table are deleted through the ORM, so
+    their metadata gets unlinked as usual.
+    """
+    RecordFingerprint = apps.get_model(
+        "django_models_from_csv", "RecordFingerprint"
+    )
+    qn = connection.ops.quote_name
+    columns = ", ".join(
+        qn(Model._meta.get_field(f).column)
+        for f in [Model._meta.pk.name] + fields
+    )
+    with transaction.atomic():
+        # this goes through the ORM, so related records get cleaned up
+        _, deleted = Model.objects.exclude(
+            pk__in=StagingModel.objects.values("pk")
+        ).delete()
+        report.deleted = deleted.get(Model._meta.label, 0)
+        report.updated = Model.objects.count()
+        # foreign key constraints are deferred until the commit, by
+        # which point the kept records are back in place
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM %s" % qn(Model._meta.db_table))
+            cursor.execute("INSERT INTO %s (%s) SELECT %s FROM %s" % (
+                qn(Model._meta.db_table), columns, columns,
+                qn(StagingModel._meta.db_table),
+            ))
+            report.inserted = cursor.rowcount - report.updated
+        # every record was rewritten, so the stored fingerprints no
+        # longer tell us anything
+        RecordFingerprint.objects.filter(dynmodel=dynmodel).delete()
+
+
+def replace_records(csv, Model, StagingModel, dynmodel, batch_size=None,
+                    progress=None):
+    """
+    Replace all of a model's records with the ones in a fetched CSV.
+
+    Rows are bulk loaded (see utils.bulk_load) into a staging table,
+    built from the same description as the model (see
+    models.construct_staging_model), while the model's table stays
+    as it was. Only if every row made it into the staging table, the
+    contents of the two are swapped in one transaction (see
+    `swap_in_staging`). Otherwise the errors are reported and the
+    model's table is left untouched. Either way, the staging table
+    is dropped afterwards.
+
+    Returns an ImportReport, counting the kept records as updated and
+    the ones no longer in the source as deleted.
+    """
+    from collaborative import signals
+
+    if batch_size is None:
+        batch_size = get_setting("CSV_MODELS_BULK_LOAD_BATCH_SIZE", 10000)
+
+    column_names = [c.get("name") for c in dynmodel.columns]
+    fields = get_importable_fields(Model, column_names)
+
+    schema_editor = ModelSchemaEditor()
+    staging_table = StagingModel._meta.db_table
+    if staging_table in connection.introspection.table_names():
+        # left over from an import that didn't get to clean up
+        schema_editor.drop_table(StagingModel)
+    schema_editor.create_table(StagingModel)
+
+    report = ImportReport()
+    rows_processed = 0
+    try:
+        rows = iter_import_rows(
+            csv, dynmodel, batch_size=batch_size,
+            errors=report.warnings,
+        )
+        with Pipeline() as pipeline:
+            for batch in chunked(rows, batch_size):
+                keyed = key_rows_by_pk(batch, StagingModel, report)
+                report.pipeline_failures += len(pipeline.run(
+                    keyed.values(), columns=dynmodel.columns
                 ))
-                continue
+                try:
+                    with transaction.atomic():
+                        load_rows(StagingModel, fields, keyed)
+                except Exception as e:
+                    logger.error("Error loading rows %s-%s: %s" % (
+                        rows_processed + 1, rows_processed + len(batch), e
+                    ))
+                    report.append("Rows: %s-%s, Error loading: %s" % (
+                        rows_processed + 1, rows_processed + len(batch), e
+                    ))
+                rows_processed += len(batch)
+                if progress:
+                    progress("importing", rows_processed)
+
+        if report:
+            logger.info("Replace of %s aborted. %s" % (
+                dynmodel.name, report.summary()
+            ))
+            return report
+
+        if progress:
+            progress("replacing", rows_processed)
+        swap_in_staging(Model, StagingModel, fields, dynmodel, report)
+        reset_sequences(Model)
+        signals.attach_blank_meta_to_records(Model)
+    finally:
+        schema_editor.drop_table(StagingModel)
+
+    logger.info("Replace of %s complete. %s" % (
+        dynmodel.name, report.summary()
+    ))
+    log_warnings(dynmodel, report)
+    return report
+
+
+def normalize_value(field, value):
+    """
+    Convert an imported value into what the field would store, so it
+    can be compared against a stored value.
+    """
+    if value is None:
+        return None
+    try:
+        return field.to_python(value)
+    except ValidationError:
+        return value
+
+
+def preview_records_batch(batch, Model, dynmodel, fields, salt, report,
+                          PreviewModel=None):
+    """
+    Compare one batch of rows (see `preview_records`) against the
+    stored records, adding the outcome to the report. This takes two
+    queries, no matter the size of the batch. Returns the number of
+    rows processed.
+    """
+    if PreviewModel is None:
+        PreviewModel = Model
+    rows = key_rows_by_pk(batch, PreviewModel, report)
+    # columns which aren't in the table yet have nothing stored
+    table_fields = {f.name for f in Model._meta.concrete_fields}
+    stored_rows = {
+        row["pk"]: row for row in Model.objects.filter(
+            pk__in=list(rows.keys())
+        ).values("pk", *[f for f in fields if f in table_fields])
+    }
+    stored_fingerprints = {}
+    if dynmodel.pk is not None:
+        stored_fingerprints = get_stored_fingerprints(dynmodel, rows.keys())
+
+    model_fields = {f: PreviewModel._meta.get_field(f) for f in fields}
+    for pk, row in rows.items():
+        stored = stored_rows.get(pk)
+        if stored is None:
+            report.inserted += 1
+            continue
+        fingerprint = row_fingerprint(row, fields, salt=salt)
+        if stored_fingerprints.get(str(pk)) == fingerprint:
+            report.unchanged += 1
+            continue
+        changed = [
+            f for f in fields if f in row and normalize_value(
+                model_fields[f], row[f]
+            ) != normalize_value(model_fields[f], stored.get(f))
+        ]
+        if not changed:
+            report.unchanged += 1
+            continue
+        report.updated += 1
+        report.column_changes.update(changed)
+    return len(batch)
+
+
+def preview_records(csv, Model, dynmodel, batch_size=None, progress=None,
+                    PreviewModel=None):
+    """
+    A dry run of `import_records`: stream the CSV and compare its rows,
+    a batch at a time, against the existing records by primary key
+    without writing anything. Returns an ImportReport with the number
+    of rows that would be inserted, updated or left unchanged, the
+    values that fail to convert and, in `column_changes`, how many
+    rows would change in each column.
+
+    To preview an import with columns that haven't been applied to the
+    table yet, pass a model built from them as `PreviewModel` (see
+    construct_preview_model). Its fields are used to convert and
+    compare the values, the stored records are read through `Model`.
+
+    Rows that the import would send through the data pipeline (e.g.
+    redaction) are compared before the pipeline runs, so columns it
+    modifies can show up as changed.
+    """
+    if batch_size is None:
+        batch_size = get_setting("CSV_MODELS_IMPORT_BATCH_SIZE", 500)
+
+    column_names = [c.get("name") for c in dynmodel.columns]
+    fields = get_importable_fields(PreviewModel or Model, column_names)
+    salt = columns_fingerprint(dynmodel)
 
-        from collaborative import signals
-        signals.attach_blank_meta_to_record(Model, obj)
+    report = ImportReport()
+    report.dry_run = True
+    rows_processed = 0
+    rows = iter_import_rows(
+        csv, dynmodel, batch_size=batch_size, errors=report.warnings,
+    )
+    for batch in chunked(rows, batch_size):
+        rows_processed += preview_records_batch(
+            batch, Model, dynmodel, fields, salt, report,
+            PreviewModel=PreviewModel,
+        )
+        if progress:
+            progress("previewing", rows_processed)
 
-    return errors
+    logger.info("Preview of %s import. %s" % (
+        dynmodel.name, report.summary()
+    ))
+    return report
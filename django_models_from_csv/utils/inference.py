@@ -0,0 +1,346 @@
+"""
+Infer a dynamic model's column descriptions straight from CSV data.
+
+We look at a sample of the rows and, for each column, count how many
+of its (non-blank) values look like each of the types we support.
+The most specific type that enough of the values agree with wins,
+falling back to text. The result is the `columns` JSON that
+DynamicModel expects, built in a single pass over the sample.
+
+The sample is the first rows of the source plus a random (reservoir)
+sample of the rows after those, so building a model from a very large
+source doesn't mean parsing all of it. Since a sample can miss the odd
+value, find_contradicted_columns checks every row against the inferred
+types afterwards; this is ran as a background job.
+"""
+import logging
+import random
+import re
+
+from dateutil import parser as dt_parser
+from django.core.management.commands.inspectdb import (
+    Command as InspectDBCommand
+)
+
+from django_models_from_csv.utils.common import get_setting
+from django_models_from_csv.utils.csv import clean_csv_header, csv_rows
+
+
+logger = logging.getLogger(__name__)
+
+
+INTEGER_RE = re.compile(r"^[-+]?\$?(0|[1-9]\d{0,2}(,\d{3})+|[1-9]\d*)$")
+# no leading zeros, those are usually codes (ZIPs, IDs) and not numbers
+NUMBER_RE = re.compile(
+    r"^[-+]?\$?(0|[1-9]\d{0,2}(,\d{3})+|[1-9]\d*)?(\.\d+)?([eE][-+]?\d+)?$"
+)
+DATE_PATTERN = (
+    r"(\d{4}[-/]\d{1,2}[-/]\d{1,2}|\d{1,2}[-/]\d{1,2}[-/](\d{4}|\d{2}))"
+)
+TIME_PATTERN = r"\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?(\s*[aApP]\.?[mM]\.?)?"
+DATE_RE = re.compile(r"^%s$" % DATE_PATTERN)
+TIME_RE = re.compile(r"^%s$" % TIME_PATTERN)
+DATETIME_RE = re.compile(
+    r"^%s([ T]%s(Z|\s*[-+]\d{2}:?\d{2})?)?$" % (DATE_PATTERN, TIME_PATTERN)
+)
+
+
+def parses_as_date(value):
+    try:
+        dt_parser.parse(value)
+    except (ValueError, OverflowError):
+        return False
+    return True
+
+
+def is_integer(value):
+    if not INTEGER_RE.match(value):
+        return False
+    # stay within what an IntegerField can hold on every database
+    number = int(value.replace("$", "").replace(",", ""))
+    return -2147483648 <= number <= 2147483647
+
+
+def is_number(value):
+    # the regex allows an empty match on the digits, so make sure
+    # there's at least one digit in there
+    return bool(NUMBER_RE.match(value)) and any(c.isdigit() for c in value)
+
+
+def is_date(value):
+    return bool(DATE_RE.match(value)) and parses_as_date(value)
+
+
+def is_datetime(value):
+    # dates without a time are fine in a datetime column, they
+    # get imported as midnight
+    return bool(DATETIME_RE.match(value)) and parses_as_date(value)
+
+
+def is_time(value):
+    return bool(TIME_RE.match(value)) and parses_as_date(value)
+
+
+# Checked in order, the first type that enough values match wins.
+# Specific types come before the more general ones that also match
+# their values (integer before number, date before datetime).
+TYPE_CHECKS = (
+    ("integer", is_integer),
+    ("number", is_number),
+    ("date", is_date),
+    ("datetime", is_datetime),
+    ("time", is_time),
+)
+
+
+def infer_column_type(values, confidence=None):
+    """
+    Pick a column type for a list of (non-blank) sample values. A type
+    is picked when the fraction of values matching it is at least
+    `confidence` (CSV_MODELS_INFERENCE_CONFIDENCE, by default all of
+    them). Returns a tuple of the type name and that fraction.
+    """
+    if confidence is None:
+        confidence = get_setting("CSV_MODELS_INFERENCE_CONFIDENCE", 1.0)
+    if not values:
+        return "text", 1.0
+    # bail out of a type as soon as it can't reach the threshold
+    max_misses = int(len(values) * (1 - confidence))
+    for type_name, check in TYPE_CHECKS:
+        matches = 0
+        misses = 0
+        for value in values:
+            if check(value):
+                matches += 1
+            else:
+                misses += 1
+                if misses > max_misses:
+                    break
+        if misses <= max_misses:
+            return type_name, matches / len(values)
+    return "text", 1.0
+
+
+def can_import_number(value):
+    try:
+        float(value.replace("$", "").replace(",", ""))
+    except ValueError:
+        return False
+    return True
+
+
+def can_import_integer(value):
+    try:
+        int(value.replace("$", "").replace(",", ""))
+    except ValueError:
+        return False
+    return True
+
+
+# When validating, a value only contradicts its column's type if the
+# importer can't convert it. This is looser than what we require of
+# the values when inferring a type (for example, any date the parser
+# understands is fine, not only the common formats).
+TYPE_VALIDATORS = {
+    "integer": can_import_integer,
+    "number": can_import_number,
+    "date": parses_as_date,
+    "datetime": parses_as_date,
+    "time": parses_as_date,
+}
+
+
+def sample_rows(rows, head_size=None, reservoir_size=None, max_rows=None,
+                rng=None):
+    """
+    Take an iterator of CSV rows (without the header) and return a
+    sample of them: the first `head_size` rows plus a uniform random
+    sample of `reservoir_size` rows from the rest. Only the first
+    `max_rows` rows are looked at, which keeps sampling from a huge
+    source fast. Set it to 0 to read the whole source.
+
+    The defaults come from the CSV_MODELS_INFERENCE_SAMPLE_SIZE,
+    CSV_MODELS_INFERENCE_RESERVOIR_SIZE and
+    CSV_MODELS_INFERENCE_MAX_ROWS settings.
+    """
+    if head_size is None:
+        head_size = get_setting("CSV_MODELS_INFERENCE_SAMPLE_SIZE", 1000)
+    if reservoir_size is None:
+        reservoir_size = get_setting(
+            "CSV_MODELS_INFERENCE_RESERVOIR_SIZE", 1000
+        )
+    if max_rows is None:
+        max_rows = get_setting("CSV_MODELS_INFERENCE_MAX_ROWS", 100000)
+    rng = rng or random.Random()
+
+    head = []
+    reservoir = []
+    n_seen = 0
+    for row in rows:
+        if not row:
+            continue
+        if max_rows and n_seen >= max_rows:
+            break
+        n_seen += 1
+        if len(head) < head_size:
+            head.append(row)
+            continue
+        # Algorithm R: the nth row of the rest replaces a random
+        # sampled one with probability reservoir_size / n
+        n_rest = n_seen - len(head)
+        if len(reservoir) < reservoir_size:
+            reservoir.append(row)
+            continue
+        ix = rng.randrange(n_rest)
+        if ix < reservoir_size:
+            reservoir[ix] = row
+    return head + reservoir
+
+
+def headers_to_field_names(headers):
+    """
+    Turn a list of CSV headers into a list of usable, unique model
+    field names. This follows the naming inspectdb would give the
+    columns, plus the shortening and de-duplication we apply to
+    every field name. Headers that can't be used as a field (the
+    ID/primary key, which Django creates itself) get None.
+    """
+    MAX_HSIZE = get_setting("CSV_MODELS_MAX_HEADER_LENGTH", 40)
+    inspectdb = InspectDBCommand()
+    used_column_names = []
+    dedupe_fields = {}
+    names = []
+    for header in headers:
+        field, _, _ = inspectdb.normalize_col_name(
+            header or "field", used_column_names, False
+        )
+        used_column_names.append(field)
+
+        if field in ["id", "pk"]:
+            logger.debug("Skipping id or pk header: %s" % header)
+            names.append(None)
+            continue
+
+        # shorten field names
+        if len(field) > MAX_HSIZE:
+            field = field[:MAX_HSIZE]
+
+        # fields cannot end w/ underscore
+        while field[-1] == "_":
+            field = field[:-1]
+
+        # Dedupe the field names. second dupe gets _2 added, etc
+        if field in dedupe_fields:
+            dedupe_fields[field] += 1
+            field += "_%s" % dedupe_fields[field]
+        else:
+            dedupe_fields[field] = 1
+
+        names.append(field)
+    return names
+
+
+def infer_columns(csv_data, **sample_kwargs):
+    """
+    Build the columns description for a dynamic model from some CSV
+    data (a string or any iterable of CSV lines). The column types
+    are inferred from a sample of the rows, see sample_rows for the
+    supported keyword arguments.
+    """
+    rows = csv_rows(csv_data)
+    try:
+        headers = next(rows)
+    except StopIteration:
+        return []
+
+    samples = [[] for _ in headers]
+    for row in sample_rows(rows, **sample_kwargs):
+        for ix in range(len(headers)):
+            value = row[ix].strip() if ix < len(row) else ""
+            if value:
+                samples[ix].append(value)
+
+    columns = []
+    names = headers_to_field_names(headers)
+    for header, name, values in zip(headers, names, samples):
+        if name is None:
+            continue
+        column_type, confidence = infer_column_type(values)
+        logger.debug("Inferred column %s: %s (%.2f)" % (
+            name, column_type, confidence
+        ))
+        columns.append({
+            "name": name,
+            "original_name": header,
+            "type": column_type,
+            # rows outside of the sample can have empty cells in
+            # any column
+            "attrs": {"blank": True, "null": True},
+            "searchable": True,
+            "filterable": False,
+        })
+    return columns
+
+
+def find_contradicted_columns(csv_data, columns, max_examples=5,
+                              progress=None):
+    """
+    Stream through all the rows of a CSV and check that every value
+    can be imported as the type of its column. Returns a list of the columns with values
+    that don't fit their type, with the number of such values and (up
+    to `max_examples`) example rows:
+
+        [{"name": "amount", "original_name": "Amount", "type": "number",
+          "count": 2, "examples": [{"row": 1201, "value": "n/a"}, ...]}]
+
+    Rows are numbered from 1, not counting the header. If given,
+    `progress` is called with "validating" and the number of rows
+    checked so far, every few thousand rows.
+    """
+    rows = csv_rows(csv_data)
+    try:
+        headers = next(rows)
+    except StopIteration:
+        return []
+
+    by_original_name = {
+        c.get("original_name", c["name"]): c for c in columns
+    }
+    checks = []
+    for ix, header in enumerate(headers):
+        column = by_original_name.get(header)
+        if not column:
+            column = by_original_name.get(clean_csv_header(header))
+        check = column and TYPE_VALIDATORS.get(column["type"])
+        if check:
+            checks.append((ix, column, check))
+
+    found = {}
+    row_number = 0
+    for row in rows:
+        if not row:
+            continue
+        row_number += 1
+        if progress and not row_number % 5000:
+            progress("validating", row_number)
+        for ix, column, check in checks:
+            value = row[ix].strip() if ix < len(row) else ""
+            if not value or check(value):
+                continue
+            name = column["name"]
+            if name not in found:
+                found[name] = {
+                    "name": name,
+                    "original_name": column.get("original_name", name),
+                    "type": column["type"],
+                    "count": 0,
+                    "examples": [],
+                }
+            found[name]["count"] += 1
+            if len(found[name]["examples"]) < max_examples:
+                found[name]["examples"].append({
+                    "row": row_number, "value": value,
+                })
+    if progress:
+        progress("validating", row_number)
+    return list(found.values())
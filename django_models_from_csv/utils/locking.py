@@ -0,0 +1,128 @@
+"""
+Per-source locks, so that a data source is only imported by one
+process at a time (the clock, a worker running import jobs, a web
+request, etc).
+
+On PostgreSQL these are session-level advisory locks, which the
+database releases if the holding process dies. Elsewhere, a
+SourceLock row is created for the source, holding a lease which gets
+extended while the import makes progress and which others can take
+over once it has expired.
+"""
+from datetime import timedelta
+import logging
+import time
+import uuid
+
+from django.apps import apps
+from django.db import connection, IntegrityError, transaction
+from django.utils import timezone
+
+from django_models_from_csv.utils.common import get_setting
+
+
+logger = logging.getLogger(__name__)
+
+
+# first half of our advisory lock keys, the second is the source's ID
+ADVISORY_LOCK_NAMESPACE = 0x43535600
+
+
+class ImportLock:
+    """
+    Lock on importing a data source. Use `acquire`, which doesn't wait
+    for the lock if someone else has it, and `release`.
+    """
+    def __init__(self, dynmodel, lease=None):
+        self.dynmodel = dynmodel
+        if lease is None:
+            lease = get_setting("CSV_MODELS_IMPORT_LOCK_LEASE", 60 * 60)
+        self.lease = lease
+        self.holder = uuid.uuid4().hex
+        self.acquired = False
+        self.renewed = None
+        self.use_advisory = connection.vendor == "postgresql"
+
+    def acquire(self):
+        """
+        Try to take the lock. Returns whether we got it.
+        """
+        if self.use_advisory:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", [
+                    ADVISORY_LOCK_NAMESPACE, self.dynmodel.pk
+                ])
+                self.acquired = cursor.fetchone()[0]
+        else:
+            self.acquired = self.acquire_row()
+        if self.acquired:
+            self.renewed = time.monotonic()
+        else:
+            logger.info("%s is already being imported" % self.dynmodel.name)
+        return self.acquired
+
+    def acquire_row(self):
+        SourceLock = apps.get_model("django_models_from_csv", "SourceLock")
+        now = timezone.now()
+        expires = now + timedelta(seconds=self.lease)
+        # take over a lease whose holder is gone
+        taken_over = SourceLock.objects.filter(
+            dynmodel=self.dynmodel, expires__lte=now
+        ).update(holder=self.holder, expires=expires)
+        if taken_over:
+            logger.warning("Took over expired lock on %s" % (
+                self.dynmodel.name
+            ))
+            return True
+        try:
+            with transaction.atomic():
+                SourceLock.objects.create(
+                    dynmodel=self.dynmodel, holder=self.holder,
+                    expires=expires,
+                )
+        except IntegrityError:
+            return False
+        return True
+
+    def renew(self):
+        """
+        Extend the lease, if half of it has passed since we last did.
+        Advisory locks don't expire, so there's nothing to do for them.
+        """
+        if not self.acquired or self.use_advisory:
+            return
+        if time.monotonic() - self.renewed < self.lease / 2:
+            return
+        SourceLock = apps.get_model("django_models_from_csv", "SourceLock")
+        SourceLock.objects.filter(
+            dynmodel=self.dynmodel, holder=self.holder
+        ).update(expires=timezone.now() + timedelta(seconds=self.lease))
+        self.renewed = time.monotonic()
+
+    def release(self):
+        if not self.acquired:
+            return
+        if self.use_advisory:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s, %s)", [
+                    ADVISORY_LOCK_NAMESPACE, self.dynmodel.pk
+                ])
+        else:
+            SourceLock = apps.get_model(
+                "django_models_from_csv", "SourceLock"
+            )
+            SourceLock.objects.filter(
+                dynmodel=self.dynmodel, holder=self.holder
+            ).delete()
+        self.acquired = False
+
+    def renewing(self, progress=None):
+        """
+        Wrap an import progress callback so that progress also renews
+        our lease.
+        """
+        def wrapped(stage, rows_processed):
+            self.renew()
+            if progress:
+                progress(stage, rows_processed)
+        return wrapped
@@ -8,47 +8,6 @@ from django_models_from_csv.models import TYPE_TO_FIELDNAME
 logger = logging.getLogger(__name__)
 
 
-def fix_models_py(models_py):
-    """
-    The output of inspectdb is pretty messy, so here we trim down
-    some of the mess, add mandatory ID field and fix the bad
-    conversion to CharField (we use TextField instead).
-    """
-    lines = models_py.split("\n")
-    fixed_lines = []
-    for line in lines:
-        # Postgres TextFields are preferable. No performance
-        # hit compared to CharField and we don't need to
-        # specify a max length
-        line = line.replace(
-            "CharField", "TextField"
-        )
-
-        # Strip out comments. They're super long and repetitive
-        try:
-            comment_ix = line.index("#")
-        except ValueError as e:
-            comment_ix = -1
-        if comment_ix == 0:
-            continue
-        elif comment_ix != -1:
-            line = line[0:comment_ix]
-
-        # Skip the managed part. We're going to actually
-        # use a managed model, derived from the auto-generated
-        # models.py
-        if "class Meta:" in line:
-            continue
-        elif "managed = False" in line:
-            continue
-        elif "db_table = " in line:
-            continue
-
-        fixed_lines.append(line)
-
-    return "\n".join(fixed_lines)
-
-
 def extract_fields(models_py):
     """
     Take a models.py string and extract the lines that
@@ -0,0 +1,143 @@
+"""
+Run imported rows through the data pipeline (the DATA_PIPELINE setting).
+
+Each pipeline entry is the import path of a module which modifies
+rows in place. Modules can work on a batch of rows at a time:
+
+    def run_batch(rows, columns=None):
+        ...
+
+or, the original way, on a single row at a time:
+
+    def run(row, columns=None):
+        ...
+
+Modules only providing `run` are called once per row in the batch.
+A module that couldn't process some rows (e.g., a redaction service
+failed) reports them: `run_batch` returns the positions of those rows
+in the batch and `run` returns False. These rows still get imported,
+but aren't taken as up to date, so the next import runs them through
+the pipeline again.
+A module can also set `EXECUTOR` to have its batches split up and ran
+in parallel, using DATA_PIPELINE_WORKERS workers: "thread" suits steps
+which wait on I/O (e.g., calling an API), "process" is only worth it
+for steps whose work per row costs much more than sending the rows to
+another process and back. Cheap steps should leave it out.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import importlib
+import logging
+
+from django.conf import settings
+
+from django_models_from_csv.utils.common import get_setting
+
+
+logger = logging.getLogger(__name__)
+
+
+EXECUTORS = {
+    "thread": ThreadPoolExecutor,
+    "process": ProcessPoolExecutor,
+}
+
+
+def run_stage(module, rows, columns=None):
+    """
+    Run rows through a pipeline module. Returns the set of positions
+    of the rows it couldn't process.
+    """
+    if hasattr(module, "run_batch"):
+        return set(module.run_batch(rows, columns=columns) or ())
+    return {
+        ix for ix, row in enumerate(rows)
+        if module.run(row, columns=columns) is False
+    }
+
+
+def run_stage_chunk(path, rows, columns=None):
+    """
+    Run part of a batch through a pipeline module inside a worker.
+    Returns the rows, since in a process pool we don't have access
+    to the originals, and the positions of the failed ones.
+    """
+    failed = run_stage(
+        importlib.import_module(path), rows, columns=columns
+    )
+    return rows, failed
+
+
+def split(rows, n):
+    size = -(-len(rows) // n)
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+
+class Pipeline:
+    """
+    The configured data pipeline. The pipeline modules are loaded
+    once, and any worker pools are kept around for the life of the
+    pipeline, so one of these should be used for a whole import.
+    """
+    def __init__(self, paths=None, workers=None):
+        if paths is None:
+            paths = getattr(settings, "DATA_PIPELINE", [])
+        self.stages = [
+            (path, importlib.import_module(path)) for path in paths
+        ]
+        self.workers = workers or get_setting("DATA_PIPELINE_WORKERS", 4)
+        self.pools = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_pool(self, executor):
+        if executor not in self.pools:
+            Executor = EXECUTORS[executor]
+            self.pools[executor] = Executor(max_workers=self.workers)
+        return self.pools[executor]
+
+    def run_parallel(self, path, executor, rows, columns=None):
+        pool = self.get_pool(executor)
+        chunks = split(rows, self.workers)
+        results = pool.map(
+            run_stage_chunk,
+            [path] * len(chunks), chunks, [columns] * len(chunks),
+        )
+        failed = set()
+        offset = 0
+        for chunk, (result, chunk_failed) in zip(chunks, results):
+            for row, new_row in zip(chunk, result):
+                if row is not new_row:
+                    row.clear()
+                    row.update(new_row)
+            failed.update(offset + ix for ix in chunk_failed)
+            offset += len(chunk)
+        return failed
+
+    def run(self, rows, columns=None):
+        """
+        Run a batch of rows (dicts) through each pipeline module in
+        turn, modifying them in place. Returns the set of positions
+        of the rows some module couldn't process.
+        """
+        rows = list(rows)
+        failed = set()
+        if not rows:
+            return failed
+        for path, module in self.stages:
+            executor = getattr(module, "EXECUTOR", None)
+            if executor not in EXECUTORS or len(rows) < 2:
+                failed.update(run_stage(module, rows, columns=columns))
+                continue
+            failed.update(
+                self.run_parallel(path, executor, rows, columns=columns)
+            )
+        return failed
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+        self.pools = {}
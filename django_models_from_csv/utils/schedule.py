@@ -0,0 +1,112 @@
+"""
+Per-source refresh scheduling.
+
+Each data source keeps its refresh interval and the time of its next
+refresh in its "schedule" attr. The interval adapts to how often the
+source actually changes: it's halved every time a refresh finds new
+data and doubled when a refresh finds nothing new or fails, staying
+between CSV_MODELS_REFRESH_MIN_INTERVAL and
+CSV_MODELS_REFRESH_MAX_INTERVAL (in seconds). The clock runs
+refresh_data_sources --due every minute, which only refreshes the
+sources whose time has come.
+
+A source whose refresh failed CSV_MODELS_REFRESH_MAX_FAILURES times in
+a row (the source couldn't be fetched or imported at all, the refresh
+crashed or timed out) is marked "dead" and no longer refreshed, until
+it's imported again. Errors in some of the rows only back off.
+"""
+from datetime import datetime, timedelta
+import logging
+
+from django.utils import timezone
+
+from django_models_from_csv.utils.common import get_setting
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_interval_bounds():
+    return (
+        get_setting("CSV_MODELS_REFRESH_MIN_INTERVAL", 5 * 60),
+        get_setting("CSV_MODELS_REFRESH_MAX_INTERVAL", 24 * 60 * 60),
+    )
+
+
+def get_schedule(dynmodel):
+    """
+    Return a source's schedule: a dict with the refresh "interval" (in
+    seconds), the time of the "next_run" (as an ISO string, or None
+    if it's never been scheduled) and the number of "failures" in a
+    row.
+    """
+    schedule = {
+        "interval": get_setting("CSV_MODELS_REFRESH_INTERVAL", 15 * 60),
+        "next_run": None,
+        "failures": 0,
+    }
+    schedule.update(dynmodel.get_attr("schedule") or {})
+    return schedule
+
+
+def is_due(dynmodel, now=None):
+    next_run = get_schedule(dynmodel)["next_run"]
+    if not next_run:
+        return True
+    return datetime.fromisoformat(next_run) <= (now or timezone.now())
+
+
+def next_interval(interval, changed, failed):
+    """
+    Tighten the interval when a source changed, back off (doubling it)
+    when it didn't or when its refresh failed.
+    """
+    min_interval, max_interval = get_interval_bounds()
+    if failed or not changed:
+        interval = interval * 2
+    else:
+        interval = interval / 2
+    return int(min(max(interval, min_interval), max_interval))
+
+
+def outcome_changed(outcome):
+    """
+    Whether a refresh outcome (see refresh_data_sources) wrote anything.
+    """
+    if outcome.get("skipped"):
+        return False
+    return any(outcome.get(count) for count in (
+        "inserted", "updated", "deleted"
+    ))
+
+
+def update_schedule(dynmodel, outcome, now=None):
+    """
+    Work out a source's next refresh from the outcome of the last one
+    and store it in the "schedule" attr, marking the source "dead"
+    once it failed too many times in a row. Returns the new schedule.
+    """
+    # the refresh itself may have changed the attrs (e.g., "source")
+    dynmodel.refresh_from_db(fields=["attrs"])
+    dynmodel.attrs = dynmodel.attrs or {}
+    schedule = get_schedule(dynmodel)
+    failed = bool(outcome.get("failed"))
+    schedule["interval"] = next_interval(
+        schedule["interval"], outcome_changed(outcome),
+        failed or bool(outcome.get("errors")),
+    )
+    schedule["failures"] = schedule["failures"] + 1 if failed else 0
+    max_failures = get_setting("CSV_MODELS_REFRESH_MAX_FAILURES", 10)
+    if max_failures and schedule["failures"] >= max_failures:
+        logger.warning("Refreshing %s failed %s times in a row, stopping "
+                       "its refreshes" % (dynmodel.name, schedule["failures"]))
+        dynmodel.attrs["dead"] = True
+    schedule["next_run"] = (
+        (now or timezone.now()) + timedelta(seconds=schedule["interval"])
+    ).isoformat()
+    logger.debug("Next refresh of %s in %ss" % (
+        dynmodel.name, schedule["interval"]
+    ))
+    dynmodel.attrs["schedule"] = schedule
+    dynmodel.save_attrs()
+    return schedule
@@ -1,61 +1,247 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
 import logging
 import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
-import requests
 from tablib import Dataset
 
+from django_models_from_csv.utils.common import get_setting
+from django_models_from_csv.utils.http import fetch
+
 
 logger = logging.getLogger(__name__)
 
 
 class ScreendoorImporter:
     def __init__(self, api_key=None, base_url="https://screendoor.dobt.co",
-                 per_page=100, max_import_records=None):
+                 per_page=100, max_import_records=None, workers=None):
         self.api_key = api_key
         self.base_url = base_url
         self.per_page = per_page
         # stop importing records after this number of records
         # so we don't get 504
         self.max_import_records = max_import_records
+        # number of pages of responses fetched at the same time
+        if workers is None:
+            workers = get_setting("CSV_MODELS_SCREENDOOR_WORKERS", 4)
+        self.workers = workers
+        # the latest update ("updated_at" and "id") among the responses
+        # we've handed out, see get_responses
+        self.high_water = None
+        # whether we stopped at max_import_records
+        self.truncated = False
+        # whether the responses came newest-updated first, and the
+        # "updated_at" of the oldest ones we've handed out (and their IDs)
+        self.in_order = True
+        self.oldest = None
+        self.oldest_ids = []
 
     def get_form(self, project_id, form_id=None):
         if not form_id:
             url = "%s/api/projects/%s/forms?v=1&api_key=%s" % (
                 self.base_url, project_id, self.api_key
             )
-            response = requests.get(url)
+            response = fetch(url)
             data = response.json()
             return data[0]
         else:
             url = "%s/api/projects/%s/forms/%s?v=1&api_key=%s" % (
                 self.base_url, project_id, form_id, self.api_key
             )
-            response = requests.get(url)
+            response = fetch(url)
             return response.json()
 
-    def get_responses(self, project_id, form_id):
-        url = "%s/api/projects/%s/responses?v=1&api_key=%s&per_page=%s" % (
-            self.base_url, project_id, self.api_key, self.per_page
-        )
+    def get_page_url(self, url, page):
+        """
+        Change the page number in a responses page URL.
+        """
+        parts = urlsplit(url)
+        query = [(k, v) for k, v in parse_qsl(parts.query) if k != "page"]
+        query.append(("page", str(page)))
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+    def get_page_count(self, response):
+        """
+        Find the number of pages from the first page's Link: last
+        header. Returns None if there isn't one.
+        """
+        last_url = response.links.get("last", {}).get("url")
+        if not last_url:
+            return None
+        page = dict(parse_qsl(urlsplit(last_url).query)).get("page")
+        return int(page) if page and page.isdigit() else None
+
+    def get_pages(self, url):
+        """
+        Yield the JSON data of every page of responses, in order. Once
+        the first page tells us how many there are, the rest are fetched
+        with up to `workers` requests at a time. Without a page count
+        we follow the next links, one page at a time.
+        """
+        response = fetch(url)
+        yield response.json()
+        n_pages = self.get_page_count(response)
+        if n_pages is None:
+            url = response.links.get("next", {}).get("url")
+            while url:
+                response = fetch(url)
+                yield response.json()
+                url = response.links.get("next", {}).get("url")
+            return
+
+        def fetch_page(page):
+            return fetch(self.get_page_url(url, page)).json()
+
+        pages = iter(range(2, n_pages + 1))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # keep a window of pages in flight, handing them out in order
+            in_flight = deque(
+                executor.submit(fetch_page, page)
+                for page in islice(pages, self.workers)
+            )
+            try:
+                while in_flight:
+                    data = in_flight.popleft().result()
+                    page = next(pages, None)
+                    if page is not None:
+                        in_flight.append(executor.submit(fetch_page, page))
+                    yield data
+            finally:
+                # we stopped early, don't wait for pages nobody wants
+                for future in in_flight:
+                    future.cancel()
+
+    def is_newer(self, row, since):
+        """
+        Whether a response was created or updated after the `since`
+        high water mark. Screendoor's timestamps are all UTC ISO 8601
+        strings, so they compare as strings.
+        """
+        if not since:
+            return True
+        updated_at = row.get("updated_at")
+        if updated_at and since.get("updated_at"):
+            return updated_at > since["updated_at"]
+        return row.get("id", 0) > (since.get("id") or 0)
+
+    def update_high_water(self, row):
+        high_water = self.high_water or {"updated_at": None, "id": None}
+        updated_at = row.get("updated_at")
+        if updated_at and (not high_water["updated_at"] or
+                           updated_at > high_water["updated_at"]):
+            high_water["updated_at"] = updated_at
+        row_id = row.get("id")
+        if row_id is not None and (high_water["id"] is None or
+                                   row_id > high_water["id"]):
+            high_water["id"] = row_id
+        self.high_water = high_water
+        if updated_at and (not self.oldest or updated_at < self.oldest):
+            self.oldest = updated_at
+            self.oldest_ids = []
+        if updated_at and updated_at == self.oldest:
+            self.oldest_ids.append(row_id)
+
+    def get_responses(self, project_id, form_id, since=None):
+        """
+        Yield the responses of a form. The form is passed along to the
+        API to filter by, but in case it's ignored we also skip other
+        forms' responses here.
+
+        With `since`, a high water mark from a previous sync (see
+        `high_water`), only the responses created or updated after it
+        are yielded. We ask for the most recently updated responses
+        first and stop paging at the first older one, as long as the
+        API has kept to that order (otherwise we go through them all).
 
-        # get all pages. first page response has a Link header with
-        # a list of next, pref, first, last URLs. Keep getting these
-        # until no more pages exist. (stolen from Ken's electionland code)
+        If the mark has a "backlog" (see next_mark), an earlier sync
+        stopped at max_import_records, and we carry on with the
+        responses it didn't get to: the ones updated after the
+        backlog's "after" mark, up to its "before" time (less the ones
+        updated at that time it already imported, its "seen" IDs).
+        """
+        query = [
+            ("v", 1), ("api_key", self.api_key),
+            ("per_page", self.per_page), ("form_id", form_id),
+        ]
+        # newest first, so a sync cut short by max_import_records can
+        # pick up where it stopped
+        if since or self.max_import_records:
+            query += [("sort", "updated_at"), ("direction", "desc")]
+        url = "%s/api/projects/%s/responses?%s" % (
+            self.base_url, project_id, urlencode(query)
+        )
+        self.high_water = None
+        self.truncated = False
+        self.in_order = True
+        self.oldest = None
+        self.oldest_ids = []
+        backlog = (since or {}).get("backlog")
         records = 0
-        all_data = []
-        while url:
-            response = requests.get(url)
-            for row in response.json():
-                if self.max_import_records and records > self.max_import_records:
+        last_updated = None
+        for page in self.get_pages(url):
+            for row in page:
+                if row.get("form_id") != form_id:
+                    continue
+                updated_at = row.get("updated_at")
+                if not updated_at or (
+                        last_updated and updated_at > last_updated):
+                    self.in_order = False
+                last_updated = updated_at
+                if backlog:
+                    # the newer ones were imported by the sync that
+                    # left the backlog, or are left for after it
+                    if updated_at and (
+                            updated_at > backlog["before"] or
+                            updated_at == backlog["before"] and
+                            row.get("id") in backlog["seen"]):
+                        continue
+                    if not self.is_newer(row, backlog["after"]):
+                        if self.in_order:
+                            return
+                        continue
+                elif since and not self.is_newer(row, since):
+                    if self.in_order:
+                        return
+                    continue
+                if self.max_import_records and \
+                        records >= self.max_import_records:
                     logger.warn("Maximum records imported. Skipping remaining.")
-                    break
-                if row.get("form_id") == form_id:
-                    records += 1
-                    yield row
-            url = response.links.get('next', {}).get('url', None)
+                    self.truncated = True
+                    return
+                records += 1
+                self.update_high_water(row)
+                yield row
 
-        # filter down responses to correct form
-        return [d for d in all_data if d.get("form_id") == form_id]
+    def next_mark(self, since=None):
+        """
+        The high water mark for the next sync, once get_responses has
+        gone through the responses changed since `since`.
+
+        A sync that stopped at max_import_records, with the responses
+        newest first, leaves a "backlog" in the mark: the next syncs
+        go over the older responses this one didn't get to (working
+        down from the oldest one it imported) before moving on to the
+        ones changed since. Returns None when the next sync has to go
+        over all of the responses again.
+        """
+        backlog = (since or {}).get("backlog")
+        if backlog:
+            mark = {"updated_at": since["updated_at"], "id": since["id"]}
+        else:
+            mark = self.high_water or since
+        if not self.truncated:
+            return mark
+        if not self.in_order or not self.oldest:
+            return None
+        seen = self.oldest_ids
+        if backlog and backlog["before"] == self.oldest:
+            seen = backlog["seen"] + seen
+        return dict(mark, backlog={
+            "after": backlog["after"] if backlog else since,
+            "before": self.oldest, "seen": seen,
+        })
 
     def get_header_maps(self, form_data):
         header_map = {}
@@ -71,7 +257,11 @@ class ScreendoorImporter:
             data.get("id")
         )
 
-    def build_csv_from_data(self, form_data, project_id, form_id):
+    def build_csv_from_data(self, form_data, responses):
+        """
+        Build a CSV from a form and an iterable of its responses (see
+        get_responses), going over the responses once.
+        """
         id_to_label = self.get_header_maps(form_data)
         headers = ["id"]
         for c in id_to_label.values():
@@ -80,11 +270,11 @@ class ScreendoorImporter:
         # responder information, not included in the form fields, is
         # collected by screendoor. we want to extract this and append it
         # to the fields. also, don't explode on empty responses here.
-        response_data = self.get_responses(project_id, form_id)
-        first_response = response_data.__next__()
+        responses = iter(responses)
+        first_response = next(responses, None)
         if not first_response:
-            logger.errror("No records found for Screendoor import!.")
-            return
+            logger.error("No records found for Screendoor import!.")
+            return Dataset(headers=headers).export("csv")
 
         first_responder = first_response.get("responder", {})
         if "email" in first_responder:
@@ -93,8 +283,7 @@ class ScreendoorImporter:
             headers.append("Responder name (ID: resp_name)")
 
         data = Dataset(headers=headers)
-        response_data = self.get_responses(project_id, form_id)
-        for response_info in response_data:
+        for response_info in chain([first_response], responses):
             response = response_info.get("responses", {})
             row_id = response_info["id"]
             row = [row_id]
@@ -154,16 +343,20 @@ class ScreendoorImporter:
 
         return data.export("csv")
 
-    def build_csv(self, project_id, form_id=None):
+    def build_csv(self, project_id, form_id=None, since=None):
         """
         Take our screendoor project ID and (optionally) form ID and
         build a CSV, using the labels from the form. This can then be
         fed into the normal CSV->model system for table building.
 
         If you don't supply a form_id, the first form in the
-        project will be pulled.
+        project will be pulled. With `since`, only the responses
+        changed after that high water mark are included (see
+        get_responses). Afterwards, next_mark gives the mark for the
+        next sync.
         """
         form_data = self.get_form(project_id, form_id=form_id)
         if not form_id:
             form_id = form_data["id"]
-        return self.build_csv_from_data(form_data, project_id, form_id)
+        responses = self.get_responses(project_id, form_id, since=since)
+        return self.build_csv_from_data(form_data, responses)
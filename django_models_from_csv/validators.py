@@ -11,6 +11,7 @@ COLUMN_TYPES = (
     ("time", "Only time field"),
     ("datetime", "Date and time field"),
     ("number", "Number field"),
+    ("integer", "Whole number field"),
     # ("foreignkey", "Associated Table"),
     ("tagging", "Tags field"),
 )
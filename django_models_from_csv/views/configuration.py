@@ -13,13 +13,15 @@ from requests.exceptions import ConnectionError
 from django_models_from_csv import models
 from django_models_from_csv.exceptions import GenericCSVError
 from django_models_from_csv.forms import SchemaRefineForm
-from django_models_from_csv.utils.common import get_setting, slugify
+from django_models_from_csv.utils.common import (
+    get_setting, http_response, slugify,
+)
 from django_models_from_csv.utils.csv import fetch_csv
 from django_models_from_csv.utils.dynmodel import (
     from_csv_url, from_screendoor, from_private_sheet,
     from_csv_file,
 )
-from django_models_from_csv.models import CredentialStore
+from django_models_from_csv.models import CredentialStore, ImportJob
 
 
 logger = logging.getLogger(__name__)
@@ -44,6 +46,17 @@ def get_service_account_email(credential_model):
     return credentials.get("client_email")
 
 
+def can_import_in_background(dynmodel, csv_file=None):
+    """
+    Whether a source can be imported by a queued ImportJob. Workers
+    can't read files uploaded to the web process, so uploaded CSVs
+    are always imported inside the request.
+    """
+    if not get_setting("CSV_MODELS_BACKGROUND_IMPORTS", False):
+        return False
+    return not csv_file and not dynmodel.csv_file
+
+
 @login_required
 def begin(request):
     """
@@ -209,9 +222,37 @@ def begin(request):
                 "errors": err_msg,
                 **context
             })
+
+        # Column types were inferred from a sample of the data, check
+        # them against all of it while the user refines the columns.
+        # Uploads are imported inside the request (see
+        # can_import_in_background), which reports any bad values itself
+        if not dynmodel.csv_file:
+            ImportJob.enqueue(dynmodel, kind=ImportJob.VALIDATE)
         return redirect('csv_models:refine-and-import', dynmodel.id)
 
 
+def preview_import(request, dynmodel, refine_form, csv_file=None):
+    """
+    Render the refine page along with a dry run of the import with the
+    refined columns (see DynamicModel.import_data). The columns aren't
+    saved, nothing changes until the user imports.
+    """
+    context = {
+        "form": refine_form,
+        "dynmodel": dynmodel,
+    }
+    try:
+        context["preview"] = dynmodel.import_data(
+            csv_file=csv_file, dry_run=True,
+        )
+    except Exception as e:
+        if not isinstance(e, GenericCSVError):
+            raise e
+        context["error_message"] = e.render()
+    return render(request, 'refine-and-import.html', context)
+
+
 @login_required
 def refine_and_import(request, id):
     """
@@ -223,6 +264,15 @@ def refine_and_import(request, id):
     Then we do the import. On success, this redirects to the URL
     specified by the CSV_MODELS_WIZARD_REDIRECT_TO setting if
     it exists.
+
+    When CSV_MODELS_BACKGROUND_IMPORTS is enabled, the import of
+    non-file sources is queued as an ImportJob instead and the user is
+    sent to a page that follows its progress. If the source is already
+    being imported, nothing is saved and the form is shown again with
+    a link to that import.
+
+    Submitting with "preview" shows what the import would change with
+    the refined columns, without saving them or importing anything.
     """
     dynmodel = get_object_or_404(models.DynamicModel, id=id)
     if request.method == "GET":
@@ -232,6 +282,7 @@ def refine_and_import(request, id):
         return render(request, 'refine-and-import.html', {
             "form": refine_form,
             "dynmodel": dynmodel,
+            "contradicted_columns": dynmodel.get_validation(),
         })
     elif  request.method == "POST":
         refine_form = SchemaRefineForm(request.POST)
@@ -247,6 +298,26 @@ def refine_and_import(request, id):
         # CSV File Upload (update)
         csv_file = request.FILES.get("csv_file_upload")
 
+        if request.POST.get("preview"):
+            return preview_import(request, dynmodel, refine_form, csv_file)
+
+        # altering the table under an import that's already running
+        # would break it, so keep the refined columns in the form and
+        # point the user at that import instead of starting another one
+        running_job = ImportJob.find_active(dynmodel)
+        if running_job and not csv_file:
+            return render(request, 'refine-and-import.html', {
+                "form": refine_form,
+                "dynmodel": dynmodel,
+                "running_job": running_job,
+            })
+
+        if can_import_in_background(dynmodel, csv_file):
+            # Alter the DB, the import itself happens in the worker
+            dynmodel.save()
+            job = ImportJob.enqueue(dynmodel, force=True)
+            return redirect("csv_models:import-progress", job.id)
+
         errors = None
         try:
             max_import_records = None
@@ -258,6 +329,7 @@ def refine_and_import(request, id):
             errors = dynmodel.import_data(
                 max_import_records=max_import_records,
                 csv_file=csv_file,
+                force=True,
             )
         except Exception as e:
             if not isinstance(e, GenericCSVError):
@@ -290,7 +362,7 @@ def refine_and_import(request, id):
 
         return render(request, "import-complete.html", {
             "dynmodel": dynmodel,
-            "n_records": Model.objects.count(),
+            "n_records": dynmodel.get_model().objects.count(),
         })
 
 
@@ -300,6 +372,56 @@ def refine_and_import_by_name(request, name):
     return refine_and_import(request, dynmodel.id)
 
 
+@login_required
+def import_progress(request, id):
+    """
+    Show the progress of a queued import. The page polls the
+    import_status endpoint and, once the job is done, moves on to
+    the same place a synchronous import would have. Failed jobs
+    go back to the refine page with their errors.
+    """
+    job = get_object_or_404(ImportJob, id=id)
+    dynmodel = job.dynmodel
+    if job.status == ImportJob.FAILED:
+        refine_form = SchemaRefineForm({
+            "columns": dynmodel.columns
+        })
+        return render(request, 'refine-and-import.html', {
+            "form": refine_form,
+            "dynmodel": dynmodel,
+            "errors": job.errors,
+        })
+
+    if job.status == ImportJob.DONE:
+        next = get_setting("CSV_MODELS_WIZARD_REDIRECT_TO")
+        if next:
+            return redirect(next)
+        return render(request, "import-complete.html", {
+            "dynmodel": dynmodel,
+            "n_records": dynmodel.get_model().objects.count(),
+        })
+
+    return render(request, "import-progress.html", {
+        "job": job,
+        "dynmodel": dynmodel,
+    })
+
+
+@login_required
+def import_status(request, id):
+    """
+    JSON status of a queued import, polled by the progress page.
+    """
+    job = get_object_or_404(ImportJob, id=id)
+    return http_response({
+        "status": job.status,
+        "stage": job.stage,
+        "rows_processed": job.rows_processed,
+        "errors": job.errors,
+        "finished": job.is_finished,
+    })
+
+
 @login_required
 def import_data(request, id):
     """
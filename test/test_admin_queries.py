@@ -0,0 +1,65 @@
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from collaborative.admin import AdminMetaAutoRegistration
+from django_models_from_csv.models import DynamicModel
+
+
+class AdminListQueriesTestCase(SimpleTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        self.dynmodel = DynamicModel.objects.create(
+            name="AdminQueriesSheet",
+            columns=[{
+                "name": "name",
+                "type": "text",
+                "original_name": "Enter your name",
+            }]
+        )
+        self.Model = self.dynmodel.get_model()
+        self.user = User.objects.create_superuser(
+            "admin-queries", "admin-queries@example.com", "password"
+        )
+
+    def tearDown(self):
+        self.user.delete()
+        for name in ("adminqueriessheetcontactmetadata",
+                     "adminqueriessheetmetadata", "adminqueriessheet"):
+            DynamicModel.objects.get(name=name).delete()
+
+    def add_records(self, n):
+        for i in range(n):
+            record = self.Model.objects.create(name="record %s" % i)
+            # blank metadata gets attached on create
+            record.metadata.first().tags.add("tag %s" % i)
+
+    def render_list(self):
+        # the status, assignee and tags columns are only shown
+        # once there are records with metadata
+        AdminMetaAutoRegistration().register(names=["adminqueriessheet"])
+        model_admin = admin.site._registry[self.Model]
+        request = RequestFactory().get("/")
+        request.user = self.user
+        list_display = model_admin.get_list_display(request)
+        getters = [
+            getattr(model_admin, name) for name in list_display
+            if isinstance(name, str) and name.startswith("metadata_")
+        ]
+        self.assertTrue(getters)
+        with CaptureQueriesContext(connection) as queries:
+            for obj in model_admin.get_queryset(request):
+                for getter in getters:
+                    getter(obj)
+        return len(queries)
+
+    def test_list_queries_dont_grow_with_rows(self):
+        self.add_records(2)
+        # warm up the content type and widget caches
+        self.render_list()
+        n_queries = self.render_list()
+        self.add_records(8)
+        self.assertEqual(self.render_list(), n_queries)
@@ -0,0 +1,111 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+from collaborative.signals import (
+    attach_blank_meta_to_records, suppress_meta_signals,
+)
+
+from django_models_from_csv.models import DynamicModel
+from django_models_from_csv.utils.importing import import_records
+
+
+class BulkLoadTestCase(SimpleTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        self.dynmodel = DynamicModel.objects.create(
+            name="BulkLoadSheet",
+            csv_url="fake.url/to/sheet",
+            columns=[{
+                "name": "name",
+                "type": "text",
+                "original_name": "Name",
+            }, {
+                "name": "amount",
+                "type": "integer",
+                "original_name": "Amount",
+                "attrs": {"blank": True, "null": True},
+            }]
+        )
+        self.Model = self.dynmodel.get_model()
+        self.csv = "name,amount\n" + "".join(
+            "record %s,%s\n" % (i, i) for i in range(25)
+        )
+
+    def tearDown(self):
+        for name in ("bulkloadsheetcontactmetadata", "bulkloadsheetmetadata",
+                     "bulkloadsheet"):
+            DynamicModel.objects.get(name=name).delete()
+
+    @patch("django_models_from_csv.utils.importing.import_batch")
+    def test_first_import_is_bulk_loaded(self, import_batch):
+        report = import_records(self.csv, self.Model, self.dynmodel)
+        self.assertFalse(import_batch.called)
+        self.assertEqual(report.inserted, 25)
+        self.assertEqual(self.Model.objects.count(), 25)
+        self.assertEqual(self.Model.objects.get(id=25).amount, 24)
+        # every record got its blank metadata
+        for record in self.Model.objects.all():
+            self.assertEqual(record.metadata.count(), 1)
+            self.assertEqual(record.metadata.first().status, 0)
+        # and new records don't collide with the loaded IDs
+        record = self.Model.objects.create(name="another")
+        self.assertEqual(record.id, 26)
+        self.assertEqual(record.metadata.count(), 1)
+
+    def test_reimport_goes_through_the_orm(self):
+        import_records(self.csv, self.Model, self.dynmodel)
+        csv = self.csv.replace("record 3,3", "record 3,300")
+        csv += "record 25,25\n"
+        with patch("django_models_from_csv.utils.importing.load_rows") as load:
+            report = import_records(csv, self.Model, self.dynmodel)
+        self.assertFalse(load.called)
+        self.assertEqual(report.inserted, 1)
+        self.assertEqual(report.updated, 1)
+        self.assertEqual(self.Model.objects.get(id=4).amount, 300)
+        self.assertEqual(self.Model.objects.get(id=26).metadata.count(), 1)
+
+    def test_bad_batch_falls_back_to_import(self):
+        with patch("django_models_from_csv.utils.importing.load_rows",
+                   side_effect=ValueError("bad value")):
+            report = import_records(self.csv, self.Model, self.dynmodel)
+        self.assertEqual(report.inserted, 25)
+        self.assertEqual(self.Model.objects.count(), 25)
+        self.assertEqual(self.Model.objects.get(id=1).metadata.count(), 1)
+
+    def test_reimport_attaches_metadata_per_batch(self):
+        import_records(self.csv, self.Model, self.dynmodel)
+        csv = self.csv + "".join(
+            "record %s,%s\n" % (i, i) for i in range(25, 35)
+        )
+        meta_table = "%smetadata" % self.Model._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            report = import_records(csv, self.Model, self.dynmodel)
+        self.assertEqual(report.inserted, 10)
+        meta_inserts = [
+            q for q in queries.captured_queries
+            if q["sql"].startswith('INSERT INTO "%s"' % meta_table)
+        ]
+        self.assertEqual(len(meta_inserts), 1)
+        for record in self.Model.objects.filter(id__gt=25):
+            self.assertEqual(record.metadata.count(), 1)
+
+    def test_suppressed_signal_and_set_based_attach(self):
+        with suppress_meta_signals():
+            first = self.Model.objects.create(name="first")
+            second = self.Model.objects.create(name="second")
+        self.assertEqual(first.metadata.count(), 0)
+        attach_blank_meta_to_records(self.Model, pks=[first.pk])
+        self.assertEqual(first.metadata.count(), 1)
+        self.assertEqual(second.metadata.count(), 0)
+        # records that already have metadata are left alone
+        attach_blank_meta_to_records(self.Model)
+        self.assertEqual(first.metadata.count(), 1)
+        self.assertEqual(second.metadata.count(), 1)
+        # outside of the block the signal works as before
+        self.assertEqual(
+            self.Model.objects.create(name="third").metadata.count(), 1
+        )
@@ -0,0 +1,55 @@
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+from collaborative.export import collaborative_modelresource_factory
+from django_models_from_csv.models import DynamicModel
+
+
+class ExportTestCase(SimpleTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        self.dynmodel = DynamicModel.objects.create(
+            name="ExportSheet",
+            columns=[{
+                "name": "name",
+                "type": "text",
+                "original_name": "Enter your name",
+            }]
+        )
+        self.Model = self.dynmodel.get_model()
+        self.Resource = collaborative_modelresource_factory(model=self.Model)
+
+    def tearDown(self):
+        for name in ("exportsheetcontactmetadata", "exportsheetmetadata",
+                     "exportsheet"):
+            DynamicModel.objects.get(name=name).delete()
+
+    def add_records(self, n):
+        for i in range(n):
+            record = self.Model.objects.create(name="record %s" % i)
+            # blank metadata gets attached on create
+            metadata = record.metadata.first()
+            metadata.status = 1
+            metadata.save()
+            metadata.tags.add("tag %s" % i)
+
+    def test_streamed_csv_matches_export(self):
+        self.add_records(3)
+        queryset = self.Model.objects.order_by("id")
+        data = self.Resource().export(queryset)
+        streamed = "".join(self.Resource().export_csv(queryset))
+        self.assertEqual(streamed, data.csv)
+        self.assertIn("metadata__tags", streamed.splitlines()[0])
+        self.assertIn("tag 2", streamed)
+
+    def test_export_queries_dont_grow_with_rows(self):
+        self.add_records(2)
+        with CaptureQueriesContext(connection) as queries:
+            list(self.Resource().export_csv(self.Model.objects.all()))
+        n_queries = len(queries)
+        self.add_records(8)
+        with CaptureQueriesContext(connection) as queries:
+            list(self.Resource().export_csv(self.Model.objects.all()))
+        self.assertEqual(len(queries), n_queries)
@@ -0,0 +1,106 @@
+import json
+import re
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from collaborative.data_pipeline import google_redactor
+
+
+CREDENTIALS = json.dumps({"project_id": "fake-project"})
+
+
+class FakeDLP:
+    """
+    Stands in for google.cloud.dlp.DlpServiceClient, masking anything
+    that looks like an email address.
+    """
+    def __init__(self):
+        self.requests = []
+
+    def project_path(self, project):
+        return "projects/%s" % project
+
+    def mask(self, value):
+        return re.sub(r"\S+@\S+", lambda m: "*" * len(m.group()), value)
+
+    def deidentify_content(self, parent, inspect_config=None,
+                           deidentify_config=None, item=None):
+        self.requests.append(item)
+        if "value" in item:
+            return SimpleNamespace(item=SimpleNamespace(
+                value=self.mask(item["value"])
+            ))
+        rows = []
+        for row in item["table"]["rows"]:
+            value = row["values"][0]["string_value"]
+            rows.append(SimpleNamespace(values=[
+                SimpleNamespace(string_value=self.mask(value))
+            ]))
+        return SimpleNamespace(item=SimpleNamespace(
+            table=SimpleNamespace(rows=rows)
+        ))
+
+
+class GoogleRedactorTestCase(SimpleTestCase):
+    def setUp(self):
+        self.dlp = FakeDLP()
+        self.columns = [
+            {"name": "email", "redact": True},
+            {"name": "name"},
+        ]
+
+    def test_redacts_marked_columns_in_batches(self):
+        redactor = google_redactor.Redactor(
+            CREDENTIALS, dlp=self.dlp, batch_size=2, max_workers=2
+        )
+        rows = [
+            {"email": "a@example.com", "name": "a@example.com"},
+            {"email": "contact b@example.com", "name": "b"},
+            {"email": "a@example.com", "name": "c"},
+            {"email": "c@example.com", "name": "d"},
+            {"email": None, "name": "e"},
+        ]
+        redactor.redact_rows(rows, self.columns)
+        self.assertEqual(rows[0]["email"], "*************")
+        self.assertEqual(rows[1]["email"], "contact *************")
+        self.assertEqual(rows[2]["email"], "*************")
+        self.assertIsNone(rows[4]["email"])
+        # unmarked columns are left alone
+        self.assertEqual(rows[0]["name"], "a@example.com")
+        # three unique values, two per request
+        self.assertEqual(len(self.dlp.requests), 2)
+        n_sent = sum(len(r["table"]["rows"]) for r in self.dlp.requests)
+        self.assertEqual(n_sent, 3)
+
+    def test_dlp_errors_leave_values(self):
+        def fail(*args, **kwargs):
+            raise ValueError("quota exceeded")
+        self.dlp.deidentify_content = fail
+        redactor = google_redactor.Redactor(CREDENTIALS, dlp=self.dlp)
+        rows = [
+            {"email": "a@example.com", "name": "a"},
+            {"email": "", "name": "b"},
+        ]
+        failed = redactor.redact_rows(rows, self.columns)
+        self.assertEqual(rows[0]["email"], "a@example.com")
+        # so they can be retried on the next import
+        self.assertEqual(failed, [0])
+
+    @patch("collaborative.data_pipeline.google_redactor.get_redactor")
+    def test_run_redacts_single_row(self, get_redactor):
+        get_redactor.return_value = google_redactor.Redactor(
+            CREDENTIALS, dlp=self.dlp
+        )
+        row = {"email": "a@example.com", "name": "a"}
+        google_redactor.run(row, columns=self.columns)
+        self.assertEqual(row["email"], "*************")
+        self.assertEqual(len(self.dlp.requests), 1)
+
+    @patch("collaborative.data_pipeline.google_redactor.get_redactor")
+    def test_run_without_credentials(self, get_redactor):
+        get_redactor.return_value = None
+        row = {"email": "a@example.com", "name": "a"}
+        google_redactor.run(row, columns=self.columns)
+        self.assertEqual(row["email"], "a@example.com")
@@ -0,0 +1,137 @@
+from unittest.mock import patch
+
+from django.apps import apps
+from django.db import connection
+from django.test import SimpleTestCase
+
+from django_models_from_csv.models import (
+    DynamicModel, RecordFingerprint, construct_preview_model,
+    construct_staging_model,
+)
+from django_models_from_csv.utils.csv import SpooledCSV
+
+
+class ReplaceRecordsTestCase(SimpleTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        self.dynmodel = DynamicModel.objects.create(
+            name="ReplaceSheet",
+            csv_url="https://fake.url/replace.csv",
+            columns=[{
+                "name": "name",
+                "type": "text",
+                "original_name": "Name",
+            }, {
+                "name": "amount",
+                "type": "integer",
+                "original_name": "Amount",
+                "attrs": {"blank": True, "null": True},
+            }]
+        )
+        self.Model = self.dynmodel.get_model()
+        self.csv = "name,amount\n" + "".join(
+            "record %s,%s\n" % (i, i) for i in range(5)
+        )
+        self.source = self.csv
+        patcher = patch(
+            "django_models_from_csv.models.fetch_csv_if_changed",
+            side_effect=lambda *a, **kw: (SpooledCSV([self.source]), {})
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dynmodel.import_data()
+        for record in self.Model.objects.all():
+            metadata = record.metadata.first()
+            metadata.notes = "note %s" % record.pk
+            metadata.save()
+
+    def tearDown(self):
+        for name in ("replacesheetcontactmetadata", "replacesheetmetadata",
+                     "replacesheet"):
+            DynamicModel.objects.get(name=name).delete()
+
+    def staging_exists(self):
+        return "%s_staging" % self.Model._meta.db_table in (
+            connection.introspection.table_names()
+        )
+
+    def test_replace_swaps_in_source_and_keeps_metadata(self):
+        # record 2 (ID 3) was changed and the last two were removed
+        csv = self.csv.replace("record 2,2", "record 2,200")
+        csv = "\n".join(csv.splitlines()[:4]) + "\n"
+        self.source = csv
+        report = self.dynmodel.import_data(replace=True)
+        self.assertFalse(report)
+        self.assertEqual(report.deleted, 2)
+        self.assertEqual(report.updated, 3)
+        self.assertEqual(report.inserted, 0)
+        self.assertEqual(
+            list(self.Model.objects.order_by("id").values_list(
+                "amount", flat=True
+            )), [0, 1, 200]
+        )
+        self.assertEqual(
+            self.Model.objects.get(id=3).metadata.first().notes, "note 3"
+        )
+        MetaModel = self.Model._meta.get_field("metadata").related_model
+        # metadata of removed records is kept, but unlinked
+        self.assertEqual(MetaModel.objects.count(), 5)
+        self.assertEqual(
+            MetaModel.objects.filter(metadata__isnull=True).count(), 2
+        )
+        self.assertFalse(RecordFingerprint.objects.filter(
+            dynmodel=self.dynmodel
+        ).exists())
+        self.assertFalse(self.staging_exists())
+
+        # new records get metadata, and IDs after the loaded ones
+        self.source = csv + "record 3,3\n"
+        report = self.dynmodel.import_data(replace=True)
+        self.assertEqual(report.inserted, 1)
+        self.assertEqual(self.Model.objects.get(id=4).metadata.count(), 1)
+        self.assertGreater(self.Model.objects.create(name="another").id, 4)
+
+    @patch("django_models_from_csv.utils.importing.load_rows")
+    def test_failed_replace_leaves_table_untouched(self, load_rows):
+        load_rows.side_effect = ValueError("bad batch")
+        self.source = self.csv.replace("record 1,1", "record 1,100")
+        report = self.dynmodel.import_data(replace=True)
+        self.assertEqual(len(report), 1)
+        self.assertTrue(report[0].startswith("Rows: 1-5, Error loading"))
+        self.assertEqual(self.Model.objects.get(id=2).amount, 1)
+        self.assertEqual(self.Model.objects.count(), 5)
+        self.assertFalse(self.staging_exists())
+
+    def test_unconvertible_values_dont_abort_replace(self):
+        self.source = self.csv.replace("record 1,1", "x,y")
+        report = self.dynmodel.import_data(replace=True)
+        self.assertFalse(report)
+        self.assertEqual(len(report.warnings), 1)
+        self.assertIsNone(self.Model.objects.get(id=2).amount)
+        self.assertEqual(self.Model.objects.count(), 5)
+
+    def test_refresh_mode_attr(self):
+        self.dynmodel.attrs["refresh_mode"] = "replace"
+        self.dynmodel.save_attrs()
+        self.source = "name,amount\nonly,1\n"
+        report = self.dynmodel.import_data()
+        self.assertEqual(report.deleted, 4)
+        self.assertEqual(self.Model.objects.count(), 1)
+
+    def test_staging_model_stays_out_of_the_app_registry(self):
+        registered = dict(apps.all_models["django_models_from_csv"])
+        metadata = DynamicModel.objects.get(name="replacesheetmetadata")
+        Staging = construct_staging_model(metadata)
+        Preview = construct_preview_model(metadata)
+        self.assertEqual(
+            dict(apps.all_models["django_models_from_csv"]), registered
+        )
+        # the metadata's foreign key still points at the source's model,
+        # whose records still have their own metadata
+        for Model in (Staging, Preview):
+            field = Model._meta.get_field("metadata")
+            self.assertIs(field.related_model, self.Model)
+        self.assertIs(
+            self.Model.metadata.rel.related_model, metadata.get_model()
+        )